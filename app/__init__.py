@@ -8,6 +8,7 @@ from .routes import routes_bp
 from .auth import auth_bp
 from .auto_post import auto_post_bp
 from .scheduler import init_app
+from . import rate_limiter
 from config import Config
 from flask_migrate import Migrate
 import openai
@@ -15,7 +16,11 @@ import os
 
 csrf = CSRFProtect()  # ✅ CSRF保護インスタンス生成
 
-def create_app():
+def create_app(start_scheduler=None):
+    """
+    start_scheduler: 定期処理のスケジューラーを起動するか（省略時は SCHEDULER_ENABLED）。
+    通常は app/scheduler_worker.py だけが起動し、Web・記事生成ワーカー・manage.py では起動しない。
+    """
     app = Flask(__name__)
     app.config.from_object(Config)
 
@@ -27,6 +32,7 @@ def create_app():
     login_manager.init_app(app)
     csrf.init_app(app)
     Migrate(app, db)
+    rate_limiter.init_app(app)
 
     login_manager.login_view = 'auth.login'
 
@@ -35,8 +41,11 @@ def create_app():
     app.register_blueprint(auth_bp, url_prefix="/auth")
     app.register_blueprint(auto_post_bp)
 
-    # ✅ スケジューラー初期化（定期処理）
-    init_app(app)
+    # ✅ スケジューラー初期化（定期処理、起動するプロセスだけ）
+    if start_scheduler is None:
+        start_scheduler = app.config["SCHEDULER_ENABLED"]
+    if start_scheduler:
+        init_app(app)
 
     # ✅ ログインユーザー読込関数
     @login_manager.user_loader
@@ -1,11 +1,435 @@
 # 📄 app/article_generator.py
 
 import os
+import re
+import json
+import asyncio
 import traceback
-from openai import OpenAI
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from sqlalchemy import update, or_
+from openai import OpenAI, AsyncOpenAI, DefaultHttpxClient, DefaultAsyncHttpxClient
 from .models import db, ScheduledPost
+from .rate_limiter import RateLimitedTransport, AsyncRateLimitedTransport
+from .job_queue import mark_generated
+from .image_keywords import local_image_keyword, remember_image_keyword, fallback_image_keyword
+from .llm_cache import complete, complete_async, refreshing, is_refreshing
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+def create_openai_client(base_url=None):
+    """
+    レート制限付きの OpenAI クライアント（呼び出し枠は全ワーカーで共有し、枠が空くまで待つ）。
+    429・5xx・タイムアウトの再送は RateLimitedTransport が行うので、SDK 側の再試行（max_retries）は切って重ねない。
+    """
+    return OpenAI(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        base_url=base_url,
+        max_retries=0,
+        http_client=DefaultHttpxClient(transport=RateLimitedTransport()),
+    )
+
+def create_async_openai_client():
+    """create_openai_client の AsyncOpenAI 版（イベントループごとに生成する）"""
+    return AsyncOpenAI(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        max_retries=0,
+        http_client=DefaultAsyncHttpxClient(transport=AsyncRateLimitedTransport()),
+    )
+
+client = create_openai_client()
+
+# 投稿登録時にタイトル欄へ入れている仮の値（この値の間はタイトル未生成とみなす）
+TITLE_PLACEHOLDER = "生成中..."
+
+def has_generated_title(post):
+    return bool(post.title) and post.title != TITLE_PLACEHOLDER
+
+def checkpoint_title(post_id, title):
+    """
+    生成したタイトルを本文より先に保存する。本文生成に失敗して再試行するときは
+    has_generated_title で保存済みのタイトルから再開し、タイトルを作り直さない。
+    呼び出し元のセッションとは別の接続で書くので、asyncio.to_thread で別スレッドから呼んでもよい。
+    """
+    with db.engine.begin() as conn:
+        conn.execute(
+            update(ScheduledPost)
+            .where(
+                ScheduledPost.id == post_id,
+                ScheduledPost.status == "生成中",
+                or_(ScheduledPost.title.is_(None), ScheduledPost.title.in_(("", TITLE_PLACEHOLDER))),
+            )
+            .values(title=title)
+        )
+
+def clean_title(title):
+    return re.sub(r'^[0-9\.\-ー①-⑩]+[\.\s）)]*|[「」\"]', '', title).strip()
+
+def enhance_h2_tags(content):
+    return re.sub(r'(<h2.*?>)', r'\1<span style="font-size: 1.5em; font-weight: bold;">', content).replace("</h2>", "</span></h2>")
+
+def build_image_keyword_messages(title):
+    prompt = f"""
+以下の日本語タイトルに対して、
+Pixabayで画像を探すのに最適な英語の2〜3語の検索キーワードを生成してください。
+抽象的すぎる単語（life, business など）は避けてください。
+写真としてヒットしやすい「モノ・場所・情景・体験・風景」などを選んでください。
+
+タイトル: {title}"""
+    return [{
+        "role": "system", 
+        "content": "あなたはPixabay用の画像検索キーワード生成の専門家です。"
+    }, {
+        "role": "user", 
+        "content": prompt
+    }]
+
+def generate_image_keyword_from_title(title, client):
+    """画像検索キーワード（辞書で変換できないタイトルだけ LLM で生成し、結果を保存する）"""
+    keywords = local_image_keyword(title)
+    if keywords:
+        return keywords
+    try:
+        keywords = complete(
+            client, "image_keyword",
+            model="gpt-4-turbo",
+            messages=build_image_keyword_messages(title),
+            temperature=0.5,
+            max_tokens=50
+        ).strip()
+        remember_image_keyword(title, keywords)
+        return keywords
+    except Exception as e:
+        print("❌ 画像キーワード生成エラー:", e)
+        return fallback_image_keyword(title)
+
+# ---------------------
+# 見出し構成 → セクション並列生成（generation_mode="outline"）
+# ---------------------
+def build_outline_messages(prompt_body, title):
+    body_prompt = prompt_body.replace("{{title}}", title)
+    prompt = f"""
+以下の記事タイトルと執筆指示をもとに、記事の見出し（H2）構成を作成してください。
+見出しは4〜7個、各見出しは本文を書かずに短いテキストのみとしてください。
+出力はJSONの文字列配列のみとし、説明文は付けないでください。
+例: ["見出し1", "見出し2", "見出し3", "見出し4"]
+
+タイトル: {title}
+
+執筆指示:
+{body_prompt}"""
+    return [
+        {"role": "system", "content": "あなたはSEOに強い日本語記事の構成作家です。"},
+        {"role": "user", "content": prompt}
+    ]
+
+def parse_text_list(text):
+    """JSON配列のレスポンスを文字列リストに変換（JSON以外の箇条書き・番号付きリストにも対応）"""
+    text = text.strip()
+    match = re.search(r'\[.*\]', text, re.S)
+    if match:
+        try:
+            items = json.loads(match.group(0))
+            return [str(item).strip() for item in items if str(item).strip()]
+        except ValueError:
+            pass
+    items = []
+    for line in text.splitlines():
+        line = re.sub(r'<[^>]+>', '', line)
+        line = re.sub(r'^\s*(?:[-*・#]+|\d+[\.\)）])\s*', '', line).strip()
+        if line:
+            items.append(line)
+    return items
+
+def parse_outline(text):
+    """見出し構成のレスポンスを見出しリストに変換"""
+    return parse_text_list(text)
+
+def build_section_messages(prompt_body, title, heading, headings):
+    body_prompt = prompt_body.replace("{{title}}", title)
+    outline = "\n".join(f"- {h}" for h in headings)
+    prompt = f"""
+以下の執筆指示に従って書かれる記事「{title}」のうち、見出し「{heading}」のセクション本文だけをHTMLで書いてください。
+- <h2> 見出しタグは出力しないでください（小見出しが必要なら <h3> を使用）
+- 他の見出しの内容と重複しないようにしてください
+- 前置きや締めの挨拶は不要です
+
+記事全体の見出し構成:
+{outline}
+
+執筆指示:
+{body_prompt}"""
+    return [
+        {"role": "system", "content": "あなたはSEOライターです。"},
+        {"role": "user", "content": prompt}
+    ]
+
+def stitch_sections(headings, sections):
+    """見出しとセクション本文を結合し、既存の本文と同じ h2 装飾をかける"""
+    html = "\n\n".join(f"<h2>{heading}</h2>\n{section.strip()}" for heading, section in zip(headings, sections))
+    return enhance_h2_tags(html)
+
+def _outline_or_none(text):
+    headings = parse_outline(text)
+    return headings if len(headings) >= 2 else None
+
+def generate_body_by_outline(client, prompt_body, title, max_workers=6):
+    """
+    見出し構成を1回で生成し、各セクションをスレッドで並列生成して結合する（同期版）。
+    見出しが取れなかった場合は None を返し、呼び出し側は通常の本文生成に切り替える。
+    """
+    outline = complete(
+        client, "outline",
+        model="gpt-4-turbo",
+        messages=build_outline_messages(prompt_body, title),
+        temperature=0.5,
+        max_tokens=400,
+    )
+    headings = _outline_or_none(outline)
+    if not headings:
+        print("⚠️ 見出し構成を取得できませんでした → 通常生成に切替")
+        return None
+
+    app = current_app._get_current_object()  # スレッドでもキャッシュの設定・DBを使えるように引き継ぐ
+    refresh = is_refreshing()  # 再生成中ならスレッドでもキャッシュを使わない
+
+    def write_section(heading):
+        with app.app_context(), refreshing(refresh):
+            return complete(
+                client, "section",
+                model="gpt-4-turbo",
+                messages=build_section_messages(prompt_body, title, heading, headings),
+                temperature=0.7,
+                max_tokens=1000,
+            ).strip()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        sections = list(executor.map(write_section, headings))
+    return stitch_sections(headings, sections)
+
+async def generate_body_by_outline_async(async_client, prompt_body, title):
+    """generate_body_by_outline の AsyncOpenAI 版（セクションは asyncio.gather で同時生成）"""
+    outline = await complete_async(
+        async_client, "outline",
+        model="gpt-4-turbo",
+        messages=build_outline_messages(prompt_body, title),
+        temperature=0.5,
+        max_tokens=400,
+    )
+    headings = _outline_or_none(outline)
+    if not headings:
+        print("⚠️ 見出し構成を取得できませんでした → 通常生成に切替")
+        return None
+
+    async def write_section(heading):
+        section = await complete_async(
+            async_client, "section",
+            model="gpt-4-turbo",
+            messages=build_section_messages(prompt_body, title, heading, headings),
+            temperature=0.7,
+            max_tokens=1000,
+        )
+        return section.strip()
+
+    sections = await asyncio.gather(*(write_section(h) for h in headings))
+    return stitch_sections(headings, sections)
+
+# ---------------------
+# タイトル・本文生成（ワーカー用）
+# ---------------------
+def build_title_messages(prompt_title, keyword):
+    title_prompt = prompt_title.replace("{{keyword}}", keyword)
+    return [{
+        "role": "system",
+        "content": "あなたはSEOの専門家です。"
+    }, {
+        "role": "user",
+        "content": title_prompt
+    }]
+
+def build_body_messages(prompt_body, title):
+    body_prompt = prompt_body.replace("{{title}}", title)
+    return [{
+        "role": "system",
+        "content": "あなたはSEOライターです。"
+    }, {
+        "role": "user",
+        "content": body_prompt
+    }]
+
+def generate_title(client, prompt_title, keyword):
+    """タイトル生成: {{keyword}} を埋め込んだプロンプトから1行目をタイトルとして返す"""
+    raw_title = complete(
+        client, "title",
+        model="gpt-4-turbo",
+        messages=build_title_messages(prompt_title, keyword),
+        temperature=0.7,
+        max_tokens=150
+    ).strip().split("\n")[0]
+    return clean_title(raw_title)
+
+def generate_body(client, prompt_body, title, generation_mode="standard", max_workers=6):
+    """本文生成: {{title}} を埋め込んだプロンプトから本文HTMLを返す"""
+    if generation_mode == "outline":
+        content = generate_body_by_outline(client, prompt_body, title, max_workers)
+        if content:
+            return content
+
+    body = complete(
+        client, "body",
+        model="gpt-4-turbo",
+        messages=build_body_messages(prompt_body, title),
+        temperature=0.7,
+        max_tokens=3200
+    )
+    return enhance_h2_tags(body.strip())
+
+async def generate_title_async(async_client, prompt_title, keyword):
+    """generate_title の AsyncOpenAI 版"""
+    raw_title = (await complete_async(
+        async_client, "title",
+        model="gpt-4-turbo",
+        messages=build_title_messages(prompt_title, keyword),
+        temperature=0.7,
+        max_tokens=150
+    )).strip().split("\n")[0]
+    return clean_title(raw_title)
+
+async def generate_body_async(async_client, prompt_body, title, generation_mode="standard"):
+    """generate_body の AsyncOpenAI 版"""
+    if generation_mode == "outline":
+        content = await generate_body_by_outline_async(async_client, prompt_body, title)
+        if content:
+            return content
+
+    body = await complete_async(
+        async_client, "body",
+        model="gpt-4-turbo",
+        messages=build_body_messages(prompt_body, title),
+        temperature=0.7,
+        max_tokens=3200
+    )
+    return enhance_h2_tags(body.strip())
+
+# ---------------------
+# タイトル・本文・画像キーワードの一括生成（generation_mode="structured"）
+# ---------------------
+def build_structured_messages(prompt_title, prompt_body, keyword, title=None):
+    """title を渡した場合（タイトル割り当て済み）はタイトルを固定して本文・画像キーワードを生成させる"""
+    title_prompt = prompt_title.replace("{{keyword}}", keyword)
+    body_prompt = prompt_body.replace("{{title}}", title or "（上記の指示で決めたタイトル）")
+    if title:
+        title_prompt = f"タイトルは「{title}」をそのまま使用してください。"
+    prompt = f"""
+以下の2つの指示に従って、記事のタイトルと本文を作成してください。
+さらに、タイトルに合う写真をPixabayで探すための英語の検索キーワード（2〜3語）も作成してください。
+抽象的すぎる単語（life, business など）は避け、「モノ・場所・情景・体験・風景」などを選んでください。
+
+出力は次のキーを持つJSONオブジェクトのみとしてください。
+{{"title": "タイトル（1行）", "body": "本文（HTML）", "image_keywords": "english keywords"}}
+
+## タイトルの指示
+{title_prompt}
+
+## 本文の指示
+{body_prompt}"""
+    return [
+        {"role": "system", "content": "あなたはSEOの専門家であり、SEOライターです。出力は必ずJSONで返します。"},
+        {"role": "user", "content": prompt}
+    ]
+
+def parse_structured_article(text):
+    """
+    一括生成のJSONを検証して {"title", "body", "image_keywords"} を返す。
+    必須項目が欠けている・JSONとして読めない場合は None（呼び出し側は3回呼び出しに切り替える）。
+    """
+    try:
+        data = json.loads(text)
+    except (TypeError, ValueError):
+        match = re.search(r'\{.*\}', text or "", re.S)
+        if not match:
+            return None
+        try:
+            data = json.loads(match.group(0))
+        except ValueError:
+            return None
+    if not isinstance(data, dict):
+        return None
+
+    title = data.get("title")
+    body = data.get("body")
+    image_keywords = data.get("image_keywords")
+    if isinstance(image_keywords, list):
+        image_keywords = " ".join(str(k) for k in image_keywords)
+    if not isinstance(title, str) or not isinstance(body, str):
+        return None
+
+    title = clean_title(title.strip().split("\n")[0])
+    body = body.strip()
+    if not title or len(body) < 200:
+        return None
+
+    return {
+        "title": title,
+        "body": enhance_h2_tags(body),
+        "image_keywords": image_keywords.strip() if isinstance(image_keywords, str) and image_keywords.strip() else "nature",
+    }
+
+def generate_structured_article(client, prompt_title, prompt_body, keyword):
+    """タイトル・本文・画像キーワードを1回のJSON出力で生成する。失敗時は None"""
+    try:
+        result = parse_structured_article(complete(
+            client, "structured",
+            model="gpt-4-turbo",
+            messages=build_structured_messages(prompt_title, prompt_body, keyword),
+            temperature=0.7,
+            max_tokens=3600,
+            response_format={"type": "json_object"},
+        ))
+    except Exception as e:
+        print("❌ 一括生成エラー:", e)
+        return None
+    if not result:
+        print("⚠️ 一括生成の結果を解析できませんでした → 3回呼び出しに切替")
+    return result
+
+async def generate_structured_article_async(async_client, prompt_title, prompt_body, keyword):
+    """generate_structured_article の AsyncOpenAI 版"""
+    try:
+        result = parse_structured_article(await complete_async(
+            async_client, "structured",
+            model="gpt-4-turbo",
+            messages=build_structured_messages(prompt_title, prompt_body, keyword),
+            temperature=0.7,
+            max_tokens=3600,
+            response_format={"type": "json_object"},
+        ))
+    except Exception as e:
+        print("❌ 一括生成エラー:", e)
+        return None
+    if not result:
+        print("⚠️ 一括生成の結果を解析できませんでした → 3回呼び出しに切替")
+    return result
+
+async def generate_image_keyword_from_title_async(title, async_client):
+    """
+    generate_image_keyword_from_title の AsyncOpenAI 版（asyncワーカー用）
+    保存済みキーワードの読み書き（DB）は asyncio.to_thread で行う。
+    """
+    keywords = await asyncio.to_thread(local_image_keyword, title)
+    if keywords:
+        return keywords
+    try:
+        keywords = (await complete_async(
+            async_client, "image_keyword",
+            model="gpt-4-turbo",
+            messages=build_image_keyword_messages(title),
+            temperature=0.5,
+            max_tokens=50
+        )).strip()
+        await asyncio.to_thread(remember_image_keyword, title, keywords)
+        return keywords
+    except Exception as e:
+        print("❌ 画像キーワード生成エラー:", e)
+        return fallback_image_keyword(title)
 
 def generate_article_for_post(post_id):
     """
@@ -23,36 +447,59 @@ def generate_article_for_post(post_id):
         post.status = "生成中"
         db.session.commit()
 
-        # 🔹 タイトル生成（プロンプトから）
-        title_prompt = post.prompt_title.replace("{{keyword}}", post.keyword)
-        title_res = client.chat.completions.create(
-            model="gpt-4-turbo",
-            messages=[
-                {"role": "system", "content": "あなたはSEOに強い日本語記事のタイトル作成者です。"},
-                {"role": "user", "content": title_prompt}
-            ],
-            temperature=0.7,
-            max_tokens=150,
-        )
-        title = title_res.choices[0].message.content.strip().split("\n")[0]
-        post.title = title
+        # 🔹 structured モードはタイトルと本文を1回で生成（失敗時は通常の生成）
+        if post.generation_mode == "structured":
+            structured = generate_structured_article(client, post.prompt_title, post.prompt_body, post.keyword)
+            if structured:
+                post.title = structured["title"]
+                post.body = structured["body"]
+                mark_generated(post)
+                db.session.commit()
+                print(f"✅ 記事生成完了: {post.title}")
+                return True
+
+        # 🔹 タイトル生成（プロンプトから。前回本文の生成に失敗していれば保存済みのタイトルを使う）
+        if has_generated_title(post):
+            title = post.title
+        else:
+            title_prompt = post.prompt_title.replace("{{keyword}}", post.keyword)
+            title = complete(
+                client, "title",
+                model="gpt-4-turbo",
+                messages=[
+                    {"role": "system", "content": "あなたはSEOに強い日本語記事のタイトル作成者です。"},
+                    {"role": "user", "content": title_prompt}
+                ],
+                temperature=0.7,
+                max_tokens=150,
+            ).strip().split("\n")[0]
+            post.title = title
+            db.session.commit()
+
+        # 🔹 本文生成（outline モードは見出し構成 → セクション並列生成）
+        body = None
+        if post.generation_mode == "outline":
+            body = generate_body_by_outline(
+                client, post.prompt_body, title, current_app.config["OUTLINE_SECTION_CONCURRENCY"]
+            )
 
         # 🔹 本文生成（{{title}} を埋め込み）
-        body_prompt = post.prompt_body.replace("{{title}}", title)
-        body_res = client.chat.completions.create(
-            model="gpt-4-turbo",
-            messages=[
-                {"role": "system", "content": "あなたはSEOに強い日本語ライターです。"},
-                {"role": "user", "content": body_prompt}
-            ],
-            temperature=0.7,
-            max_tokens=3200,
-        )
-        body = body_res.choices[0].message.content.strip()
+        if not body:
+            body_prompt = post.prompt_body.replace("{{title}}", title)
+            body = complete(
+                client, "body",
+                model="gpt-4-turbo",
+                messages=[
+                    {"role": "system", "content": "あなたはSEOに強い日本語ライターです。"},
+                    {"role": "user", "content": body_prompt}
+                ],
+                temperature=0.7,
+                max_tokens=3200,
+            ).strip()
 
         # 🔹 保存
         post.body = body
-        post.status = "生成完了"
+        mark_generated(post)
         db.session.commit()
         print(f"✅ 記事生成完了: {title}")
 
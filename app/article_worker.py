@@ -1,60 +1,69 @@
 import os
 import sys
 import time
-import re
+import asyncio
 import traceback
 from datetime import datetime
 import pytz
-from openai import OpenAI
 
 # 🔧 Render環境対応のパス追加
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from app import create_app
 from app.models import db, ScheduledPost, GenerationControl
-from app.image_search import search_images
+from app.image_search import search_images, search_images_async
+from app import metrics
+from app.job_queue import (
+    clear_claim,
+    mark_generated,
+    release_claim,
+    start_heartbeat,
+    generation_window_filters,
+    report_at_risk,
+)
+from app.fair_share import claim_fair_share, report_queue_depths
+from app.priority_jobs import start_priority_lane
+from app.article_generator import (
+    create_openai_client,
+    create_async_openai_client,
+    has_generated_title,
+    checkpoint_title,
+    generate_title,
+    generate_body,
+    generate_image_keyword_from_title,
+    generate_structured_article,
+    generate_title_async,
+    generate_body_async,
+    generate_image_keyword_from_title_async,
+    generate_structured_article_async,
+)
+from app.generation_pipeline import run_pipeline
+from app.title_batch import prefetch_sibling_titles, prefetch_sibling_titles_async
+from app.batch_generation import realtime_filters
+from app.http_client import aclose_async_client, report_connection_reuse
+from app.image_cache import report_image_cache
+from app.image_keywords import report_image_keywords
+from app.llm_cache import report_llm_cache
 
 app = create_app()
 
-def clean_title(title):
-    return re.sub(r'^[0-9\.\-ー①-⑩]+[\.\s）)]*|[「」\"]', '', title).strip()
-
-def enhance_h2_tags(content):
-    return re.sub(r'(<h2.*?>)', r'\1<span style="font-size: 1.5em; font-weight: bold;">', content).replace("</h2>", "</span></h2>")
-
-def generate_image_keyword_from_title(title, client):
-    prompt = f"""
-以下の日本語タイトルに対して、
-Pixabayで画像を探すのに最適な英語の2〜3語の検索キーワードを生成してください。
-抽象的すぎる単語（life, business など）は避けてください。
-写真としてヒットしやすい「モノ・場所・情景・体験・風景」などを選んでください。
-
-タイトル: {title}"""
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4-turbo",
-            messages=[{
-                "role": "system", 
-                "content": "あなたはPixabay用の画像検索キーワード生成の専門家です。"
-            }, {
-                "role": "user", 
-                "content": prompt
-            }],
-            temperature=0.5,
-            max_tokens=50
-        )
-        return response.choices[0].message.content.strip()
-    except Exception as e:
-        print("❌ 画像キーワード生成エラー:", e)
-        return "nature"
-
 def run_worker():
     with app.app_context():
         print("🚀 Worker 実行中...")
-        client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        client = create_openai_client()
         now = datetime.utcnow()
 
-        posts = ScheduledPost.query.filter_by(status="生成中").order_by(ScheduledPost.created_at).limit(5).all()
+        # 同じキーワードの兄弟投稿は、タイトルを1回の呼び出しでまとめて生成しておく
+        if app.config["TITLE_PREPASS_GROUPS"]:
+            prefetch_sibling_titles(client, app.config["TITLE_PREPASS_GROUPS"])
+
+        # 投稿予定時刻が近い順に、生成期間（GENERATION_LEAD_HOURS）に入った投稿だけを処理する
+        report_at_risk()
+        # 他ワーカーと同じ投稿を取り合わないよう、対象を確保してから処理する
+        # （ユーザーごとに重み付きで枠を配分し、大量登録した1人に枠を占有させない）
+        filters = [ScheduledPost.status == "生成中"] + generation_window_filters() + realtime_filters()
+        report_queue_depths(filters)
+        posts = claim_fair_share(filters, limit=5)
 
         if not posts:
             print("✅ 生成対象の投稿はありません")
@@ -63,57 +72,51 @@ def run_worker():
         for post in posts:
             try:
                 print(f"📝 生成処理開始: {post.keyword}")
+                started = time.monotonic()
 
                 # 停止フラグを確認
                 control = GenerationControl.query.filter_by(user_id=post.user_id).first()
                 if control and control.stop_flag:
                     print("🛑 停止フラグ検出 → スキップ")
+                    release_claim(post.id)
                     continue
 
                 # プロンプト未設定チェック
                 if not post.prompt_title or not post.prompt_body:
                     print(f"⚠️ プロンプト未設定（post_id={post.id}）→ スキップ")
                     post.status = "生成失敗"
+                    clear_claim(post)
                     db.session.commit()
                     continue
 
-                # タイトル生成
-                title_prompt = post.prompt_title.replace("{{keyword}}", post.keyword)
-                title_res = client.chat.completions.create(
-                    model="gpt-4-turbo",
-                    messages=[{
-                        "role": "system", 
-                        "content": "あなたはSEOの専門家です。"
-                    }, {
-                        "role": "user", 
-                        "content": title_prompt
-                    }],
-                    temperature=0.7,
-                    max_tokens=150
-                )
-                raw_title = title_res.choices[0].message.content.strip().split("\n")[0]
-                title = clean_title(raw_title)
-                print("✅ タイトル生成成功:", title)
+                # structured モードはタイトル・本文・画像キーワードを1回で生成（失敗時は3回呼び出し）
+                structured = None
+                if post.generation_mode == "structured":
+                    structured = generate_structured_article(client, post.prompt_title, post.prompt_body, post.keyword)
 
-                # 本文生成
-                body_prompt = post.prompt_body.replace("{{title}}", title)
-                body_res = client.chat.completions.create(
-                    model="gpt-4-turbo",
-                    messages=[{
-                        "role": "system", 
-                        "content": "あなたはSEOライターです。"
-                    }, {
-                        "role": "user", 
-                        "content": body_prompt
-                    }],
-                    temperature=0.7,
-                    max_tokens=3200
-                )
-                content = enhance_h2_tags(body_res.choices[0].message.content.strip())
-                print("✅ 本文生成成功")
+                if structured:
+                    title = structured["title"]
+                    content = structured["body"]
+                    image_kw = structured["image_keywords"]
+                    print("✅ 一括生成成功:", title)
+                else:
+                    # タイトル生成（一括生成で割り当て済みならそれを使う）
+                    if has_generated_title(post):
+                        title = post.title
+                    else:
+                        title = generate_title(client, post.prompt_title, post.keyword)
+                        checkpoint_title(post.id, title)
+                    print("✅ タイトル生成成功:", title)
+
+                    # 本文生成（outline モードは見出し構成 → セクション並列生成）
+                    content = generate_body(
+                        client, post.prompt_body, title, post.generation_mode, app.config["OUTLINE_SECTION_CONCURRENCY"]
+                    )
+                    print("✅ 本文生成成功")
+
+                    image_kw = generate_image_keyword_from_title(title, client)
 
                 # 画像検索
-                image_kw = generate_image_keyword_from_title(title, client)
                 image_urls = search_images(image_kw, num_images=1)
                 featured_image = image_urls[0] if image_urls else None
                 print("✅ 画像取得成功:", featured_image or "なし")
@@ -122,8 +125,10 @@ def run_worker():
                 post.title = title
                 post.body = content
                 post.featured_image = featured_image
-                post.status = "生成完了"
+                mark_generated(post)
+                clear_claim(post)
                 db.session.commit()
+                metrics.observe("generation.duration", time.monotonic() - started)
                 print("✅ 保存完了")
 
                 time.sleep(2)
@@ -132,9 +137,169 @@ def run_worker():
                 print("❌ エラー発生:", e)
                 traceback.print_exc()
                 db.session.rollback()
+                release_claim(post.id)
+
+# ---------------------
+# asyncモード（AsyncOpenAI で複数記事を同時生成）
+# ---------------------
+async def generate_post_async(post_id, client, semaphore):
+    """
+    1件分の記事生成（タイトル → 本文 → 画像）を AsyncOpenAI で行う。
+    DB操作は await を挟まずに完結させ、他のコルーチンとセッションを取り合わないようにする。
+    戻り値: 生成完了まで進んだら True
+    """
+    async with semaphore:
+        post = db.session.get(ScheduledPost, post_id)
+        if not post or post.status != "生成中":
+            release_claim(post_id)
+            return False
+
+        # await の間に他コルーチンの commit/rollback で属性が失効するため、必要な値は先に取り出す
+        keyword = post.keyword
+        prompt_title = post.prompt_title
+        prompt_body = post.prompt_body
+        generation_mode = post.generation_mode
+        existing_title = post.title if has_generated_title(post) else None
+
+        try:
+            print(f"📝 生成処理開始: {keyword}")
+            started = time.monotonic()
+
+            # 停止フラグを確認
+            control = GenerationControl.query.filter_by(user_id=post.user_id).first()
+            if control and control.stop_flag:
+                print("🛑 停止フラグ検出 → スキップ")
+                release_claim(post_id)
+                return False
+
+            # プロンプト未設定チェック
+            if not prompt_title or not prompt_body:
+                print(f"⚠️ プロンプト未設定（post_id={post_id}）→ スキップ")
+                post.status = "生成失敗"
+                clear_claim(post)
+                db.session.commit()
+                return False
+
+            # structured モードはタイトル・本文・画像キーワードを1回で生成（失敗時は3回呼び出し）
+            structured = None
+            if generation_mode == "structured":
+                structured = await generate_structured_article_async(client, prompt_title, prompt_body, keyword)
+
+            if structured:
+                title = structured["title"]
+                content = structured["body"]
+                image_kw = structured["image_keywords"]
+                print("✅ 一括生成成功:", title)
+            else:
+                # タイトル生成（一括生成で割り当て済みならそれを使う）
+                title = existing_title
+                if not title:
+                    title = await generate_title_async(client, prompt_title, keyword)
+                    await asyncio.to_thread(checkpoint_title, post_id, title)
+                print("✅ タイトル生成成功:", title)
+
+                # 本文生成
+                content = await generate_body_async(client, prompt_body, title, generation_mode)
+                print("✅ 本文生成成功")
+
+                image_kw = await generate_image_keyword_from_title_async(title, client)
+
+            # 画像検索（イベントループの共有 AsyncClient で呼ぶ）
+            image_urls = await search_images_async(image_kw, num_images=1)
+            featured_image = image_urls[0] if image_urls else None
+            print("✅ 画像取得成功:", featured_image or "なし")
+
+            # DB更新（生成中に他ワーカーや手動操作でステータスが変わっていないか確認）
+            post = db.session.get(ScheduledPost, post_id)
+            if not post or post.status != "生成中":
+                print(f"⚠️ ステータス変更済みのため保存をスキップ（post_id={post_id}）")
+                release_claim(post_id)
+                return False
+            post.title = title
+            post.body = content
+            post.featured_image = featured_image
+            mark_generated(post)
+            clear_claim(post)
+            db.session.commit()
+            metrics.observe("generation.duration", time.monotonic() - started)
+            print(f"✅ 保存完了（post_id={post_id}）")
+            return True
+
+        except Exception as e:
+            print(f"❌ エラー発生（post_id={post_id}）:", e)
+            traceback.print_exc()
+            db.session.rollback()
+            release_claim(post_id)
+            return False
+
+async def run_worker_async(client):
+    """
+    生成中の投稿をまとめて取得し、WORKER_CONCURRENCY 件まで同時に生成する。
+    戻り値: 生成完了になった件数
+    """
+    with app.app_context():
+        print("🚀 Worker（async）実行中...")
+        concurrency = app.config["WORKER_CONCURRENCY"]
+        batch_size = app.config["WORKER_ASYNC_BATCH_SIZE"]
+
+        # 同じキーワードの兄弟投稿は、タイトルを1回の呼び出しでまとめて生成しておく
+        if app.config["TITLE_PREPASS_GROUPS"]:
+            await prefetch_sibling_titles_async(client, app.config["TITLE_PREPASS_GROUPS"])
+
+        # 停止中ユーザーの投稿でバッチが埋まらないよう、取得時点で除外する
+        # 投稿予定時刻が近い順に、生成期間（GENERATION_LEAD_HOURS）に入った投稿だけを処理する
+        # ユーザーごとに重み付きで枠を配分し、大量登録した1人に枠を占有させない
+        report_at_risk(concurrency)
+        stopped_users = db.session.query(GenerationControl.user_id).filter(GenerationControl.stop_flag.is_(True))
+        filters = (
+            [ScheduledPost.status == "生成中", ScheduledPost.user_id.notin_(stopped_users)]
+            + generation_window_filters() + realtime_filters()
+        )
+        report_queue_depths(filters)
+        posts = claim_fair_share(filters, limit=batch_size)
+        post_ids = [post.id for post in posts]
+
+        if not post_ids:
+            print("✅ 生成対象の投稿はありません")
+            return 0
+
+        if app.config.get("WORKER_MODE") == "pipeline":
+            # タイトル → {本文, 画像キーワード→Pixabay} → 保存 のステージ並列で処理
+            done = await run_pipeline(app, client, post_ids, concurrency)
+        else:
+            semaphore = asyncio.Semaphore(concurrency)
+            results = await asyncio.gather(*(generate_post_async(post_id, client, semaphore) for post_id in post_ids))
+            done = sum(1 for ok in results if ok)
+        print(f"📊 今回の生成: {done}/{len(post_ids)} 件完了（同時実行数: {concurrency}）")
+        return done
+
+async def worker_loop_async():
+    # AsyncOpenAI の接続プールはイベントループに紐づくため、ループ内で1度だけ生成する
+    client = create_async_openai_client()
+    idle_seconds = app.config["WORKER_IDLE_SECONDS"]
+    try:
+        while True:
+            done = await run_worker_async(client)
+            report_connection_reuse()
+            report_image_cache()
+            report_image_keywords()
+            report_llm_cache()
+            if not done:
+                print(f"⏳ 次回チェックまで{idle_seconds}秒待機...")
+                await asyncio.sleep(idle_seconds)
+    finally:
+        await aclose_async_client()
 
 if __name__ == "__main__":
-    while True:
-        run_worker()
-        print("⏳ 次回チェックまで30秒待機...")
-        time.sleep(30)
+    # 確保中の投稿のリースを定期的に延長（このプロセスが落ちればリーパーが回収する）
+    start_heartbeat(app)
+    # 即時投稿・再生成のジョブは一括生成を待たずに別スレッドで処理
+    start_priority_lane(app)
+
+    if app.config.get("WORKER_MODE") in ("async", "pipeline"):
+        asyncio.run(worker_loop_async())
+    else:
+        while True:
+            run_worker()
+            print("⏳ 次回チェックまで30秒待機...")
+            time.sleep(30)
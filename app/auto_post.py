@@ -18,12 +18,14 @@ def auto_post():
 
     title_prompt = ''
     body_prompt = ''
+    generation_mode = "standard"
 
     if form.template_id.data:
         selected_template = PromptTemplate.query.get(form.template_id.data)
         if selected_template:
             title_prompt = selected_template.title_prompt
             body_prompt = selected_template.body_prompt
+            generation_mode = selected_template.generation_mode
 
     if form.validate_on_submit():
         # 🔹 入力データの取得
@@ -93,7 +95,8 @@ def auto_post():
                     site_id=site.id,
                     genre="",  # 使用しないため空文字
                     prompt_title=title_prompt,
-                    prompt_body=body_prompt
+                    prompt_body=body_prompt,
+                    generation_mode=generation_mode
                 )
                 db.session.add(post)
 
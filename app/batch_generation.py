@@ -0,0 +1,301 @@
+# 📄 app/batch_generation.py
+
+import json
+import importlib
+import traceback
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import update, or_, and_
+from .models import db, ScheduledPost, GenerationControl, GenerationBatch
+from .image_search import search_images
+from .job_queue import now_jst, claim_posts, clear_claim, release_claim, mark_generated
+from .article_generator import (
+    create_openai_client,
+    has_generated_title,
+    build_structured_messages,
+    parse_structured_article,
+)
+
+# 投稿予定が十分先（BATCH_MIN_LEAD_HOURS 以上）の記事は、OpenAI Batch API（半額・24時間以内に完了）で
+# まとめて生成する。流れ:
+#   submit_batch: 対象を確保 → JSONL を作成・アップロード → バッチ作成（投稿に batch_id を記録）
+#   poll_batches: バッチの状態を更新 → 完了したら結果を投稿に反映 → 反映できなかった投稿は通常生成に戻す
+# 投稿の確保はワーカーIDを "batch:<id>"、リースを BATCH_LEASE_HOURS にして行うので、
+# 途中でプロセスが落ちてもリーパーが回収して通常生成に戻る。
+# 結果の反映中（applying）はバッチにもリース（applying_until）を持たせ、反映中に落ちた場合は
+# リースが切れた後の poll_batches が残りの投稿から反映を再開する（反映済みの投稿は確保が外れているので対象外）。
+
+# OpenAI 側のバッチ状態のうち、結果が確定したもの
+FINISHED_STATUSES = ("completed", "failed", "expired", "cancelled")
+# こちらで反映まで終えたもの（ポーリング対象外）
+CLOSED_STATUSES = ("applied", "failed", "expired", "cancelled")
+
+def batch_worker_id(batch_id):
+    return f"batch:{batch_id}"
+
+def _lead_threshold():
+    return now_jst() + timedelta(hours=current_app.config["BATCH_MIN_LEAD_HOURS"])
+
+def batch_filters():
+    """Batch API で生成する投稿の条件（outline モードは複数回の呼び出しが必要なので対象外）"""
+    stopped_users = db.session.query(GenerationControl.user_id).filter(GenerationControl.stop_flag.is_(True))
+    return [
+        ScheduledPost.status == "生成中",
+        ScheduledPost.batch_id.is_(None),
+        ScheduledPost.generation_mode != "outline",
+        ScheduledPost.scheduled_time >= _lead_threshold(),
+        ScheduledPost.prompt_title.isnot(None),
+        ScheduledPost.prompt_body.isnot(None),
+        ScheduledPost.user_id.notin_(stopped_users),
+    ]
+
+def realtime_filters():
+    """
+    通常生成（ワーカー）側で追加する条件。Batch API 有効時は、バッチに回す投稿をワーカーが先に取らないよう除外する。
+    一度バッチに載った投稿（batch_id あり）は、バッチで生成できなかった場合に通常生成で拾う。
+    """
+    if not current_app.config["BATCH_API_ENABLED"]:
+        return []
+    return [or_(
+        ScheduledPost.batch_id.isnot(None),
+        ScheduledPost.generation_mode == "outline",
+        ScheduledPost.scheduled_time.is_(None),
+        ScheduledPost.scheduled_time < _lead_threshold(),
+    )]
+
+# ---------------------
+# Batch API との通信（BATCH_TRANSPORT で差し替え可能）
+# ---------------------
+class OpenAIBatchTransport:
+    """
+    OpenAI の Files / Batches API を呼ぶ。戻り値はすべて dict / str にそろえているので、
+    テスト用のフェイク実装は同じメソッドを持つクラスを BATCH_TRANSPORT に指定すればよい。
+    OPENAI_BATCH_BASE_URL を指定すればローカルのフェイクエンドポイントにも向けられる。
+    """
+
+    def __init__(self, base_url=None):
+        self.client = create_openai_client(base_url=base_url)
+
+    def upload_file(self, filename, content):
+        file = self.client.files.create(file=(filename, content), purpose="batch")
+        return file.id
+
+    def create_batch(self, input_file_id, metadata=None):
+        batch = self.client.batches.create(
+            input_file_id=input_file_id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+            metadata=metadata,
+        )
+        return batch.model_dump()
+
+    def retrieve_batch(self, provider_batch_id):
+        return self.client.batches.retrieve(provider_batch_id).model_dump()
+
+    def download_file(self, file_id):
+        return self.client.files.content(file_id).text
+
+def get_batch_transport():
+    path = current_app.config["BATCH_TRANSPORT"]
+    if not path:
+        return OpenAIBatchTransport(base_url=current_app.config["OPENAI_BATCH_BASE_URL"])
+    module_name, class_name = path.split(":")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+# ---------------------
+# 投入
+# ---------------------
+def build_batch_request(post):
+    """1投稿分の JSONL 行（structured モードと同じ1回のJSON出力で生成する）"""
+    title = post.title if has_generated_title(post) else None
+    return {
+        "custom_id": f"post-{post.id}",
+        "method": "POST",
+        "url": "/v1/chat/completions",
+        "body": {
+            "model": "gpt-4-turbo",
+            "messages": build_structured_messages(post.prompt_title, post.prompt_body, post.keyword, title),
+            "temperature": 0.7,
+            "max_tokens": 3600,
+            "response_format": {"type": "json_object"},
+        },
+    }
+
+def submit_batch(transport=None):
+    """
+    対象の投稿を最大 BATCH_MAX_POSTS 件確保してバッチを投入する。
+    戻り値: 作成した GenerationBatch（対象がなければ None）
+    """
+    # 対象がなければバッチの行を作らない（ポーリングのたびに作成・削除しない）
+    if not db.session.query(ScheduledPost.id).filter(*batch_filters()).first():
+        return None
+
+    batch = GenerationBatch(status="preparing")
+    db.session.add(batch)
+    db.session.commit()
+
+    posts = claim_posts(
+        batch_filters(),
+        [ScheduledPost.scheduled_time],
+        limit=current_app.config["BATCH_MAX_POSTS"],
+        worker_id=batch_worker_id(batch.id),
+        lease_seconds=current_app.config["BATCH_LEASE_HOURS"] * 3600,
+    )
+    if not posts:
+        # 確認の後に他のワーカーが先に確保した
+        db.session.delete(batch)
+        db.session.commit()
+        return None
+
+    post_ids = [post.id for post in posts]
+    try:
+        transport = transport or get_batch_transport()
+        lines = "\n".join(json.dumps(build_batch_request(post), ensure_ascii=False) for post in posts)
+        batch.input_file_id = transport.upload_file(f"batch-{batch.id}.jsonl", lines.encode("utf-8"))
+        result = transport.create_batch(batch.input_file_id, metadata={"generation_batch_id": str(batch.id)})
+
+        batch.provider_batch_id = result["id"]
+        batch.status = result.get("status") or "validating"
+        batch.post_count = len(post_ids)
+        batch.submitted_at = datetime.utcnow()
+        for post in posts:
+            post.batch_id = batch.id
+        db.session.commit()
+        print(f"📦 バッチ投入: #{batch.id}（{batch.provider_batch_id}）{len(post_ids)} 件")
+        return batch
+    except Exception as e:
+        print(f"❌ バッチ投入エラー（#{batch.id}）:", e)
+        traceback.print_exc()
+        db.session.rollback()
+        for post_id in post_ids:
+            release_claim(post_id)
+        batch.status = "failed"
+        batch.error = str(e)
+        db.session.commit()
+        return batch
+
+# ---------------------
+# ポーリング・結果の反映
+# ---------------------
+def parse_batch_output(text):
+    """出力 JSONL を {post_id: 生成結果の本文} に変換する（エラー行・読めない行は含めない）"""
+    results = {}
+    for line in (text or "").splitlines():
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+            custom_id = item["custom_id"]
+            response = item.get("response") or {}
+            if item.get("error") or response.get("status_code") != 200:
+                continue
+            content = response["body"]["choices"][0]["message"]["content"]
+            results[int(custom_id.split("-", 1)[1])] = content
+        except (ValueError, KeyError, IndexError, TypeError, AttributeError):
+            continue
+    return results
+
+def _apply_lease():
+    return datetime.utcnow() + timedelta(seconds=current_app.config["BATCH_APPLY_LEASE_SECONDS"])
+
+def _pollable():
+    """ポーリング対象（未反映、または反映中のリースが切れた＝反映中に落ちた）"""
+    return or_(
+        GenerationBatch.status.notin_(CLOSED_STATUSES + ("applying",)),
+        and_(GenerationBatch.status == "applying", GenerationBatch.applying_until < datetime.utcnow()),
+    )
+
+def _start_applying(batch_id):
+    """結果が確定したバッチを条件付きUPDATEで applying に切り替え、反映を1プロセスだけが行うようにする"""
+    result = db.session.execute(
+        update(GenerationBatch)
+        .where(GenerationBatch.id == batch_id, _pollable())
+        .values(status="applying", applying_until=_apply_lease())
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+def apply_batch_results(batch, transport):
+    """
+    出力ファイルの結果を投稿に反映する。バッチが確保したまま生成中の投稿だけを更新し、
+    反映できなかった投稿は確保を外して通常生成に戻す。反映件数は1件ごとに succeeded_count に加える。
+    戻り値: 今回の反映件数
+    """
+    outputs = parse_batch_output(transport.download_file(batch.output_file_id)) if batch.output_file_id else {}
+    worker_id = batch_worker_id(batch.id)
+    applied = 0
+
+    for post in ScheduledPost.query.filter_by(batch_id=batch.id, claimed_by=worker_id).all():
+        try:
+            article = parse_structured_article(outputs.get(post.id))
+            if not article or post.status != "生成中":
+                release_claim(post.id)
+                continue
+
+            image_urls = search_images(article["image_keywords"], num_images=1)
+            # 事前にタイトルが割り当てられていればそちらを優先
+            post.title = post.title if has_generated_title(post) else article["title"]
+            post.body = article["body"]
+            post.featured_image = image_urls[0] if image_urls else None
+            mark_generated(post)
+            clear_claim(post)
+            batch.succeeded_count = (batch.succeeded_count or 0) + 1
+            batch.applying_until = _apply_lease()
+            db.session.commit()
+            applied += 1
+        except Exception as e:
+            print(f"❌ バッチ結果の反映エラー（post_id={post.id}）:", e)
+            traceback.print_exc()
+            db.session.rollback()
+            release_claim(post.id)
+
+    return applied
+
+def poll_batch(batch, transport):
+    """1バッチの状態を更新し、確定していれば結果を反映する"""
+    result = transport.retrieve_batch(batch.provider_batch_id)
+    provider_status = result.get("status")
+    counts = result.get("request_counts") or {}
+    batch.output_file_id = result.get("output_file_id")
+    batch.error_file_id = result.get("error_file_id")
+    batch.failed_count = counts.get("failed") or 0
+    if result.get("errors"):
+        batch.error = json.dumps(result["errors"], ensure_ascii=False)
+
+    if provider_status not in FINISHED_STATUSES:
+        batch.status = provider_status or batch.status
+        db.session.commit()
+        return
+    db.session.commit()
+
+    final_status = "applied" if provider_status == "completed" else provider_status
+    if not _start_applying(batch.id):
+        return  # 他プロセスが反映中
+
+    # failed / expired / cancelled でも部分的な出力があれば反映する
+    apply_batch_results(batch, transport)
+    batch.status = final_status
+    batch.applying_until = None
+    batch.completed_at = datetime.utcnow()
+    db.session.commit()
+    print(f"📦 バッチ完了: #{batch.id}（{final_status}）反映 {batch.succeeded_count}/{batch.post_count} 件")
+
+def poll_batches(transport=None):
+    """投入済みで未反映のバッチをすべてポーリングする"""
+    batches = (
+        GenerationBatch.query
+        .filter(GenerationBatch.provider_batch_id.isnot(None), _pollable())
+        .order_by(GenerationBatch.id)
+        .all()
+    )
+    if not batches:
+        return
+    transport = transport or get_batch_transport()
+    for batch in batches:
+        try:
+            poll_batch(batch, transport)
+        except Exception as e:
+            print(f"❌ バッチ状態の取得エラー（#{batch.id}）:", e)
+            traceback.print_exc()
+            db.session.rollback()
@@ -0,0 +1,95 @@
+# 📄 app/circuit_breaker.py
+
+from datetime import datetime, timedelta
+from urllib.parse import urlparse
+from flask import current_app
+from sqlalchemy import insert, update
+from sqlalchemy.exc import IntegrityError
+from .models import db, SiteCircuit
+
+# サイト（ホスト）ごとのサーキットブレーカー。状態は site_circuits に保存し、管理画面からも参照する。
+#   closed    … 通常どおり投稿（WP_PUBLISH_MAX_PER_HOST 件まで同時）
+#   open      … 一時的なエラーが CIRCUIT_FAILURE_THRESHOLD 回続いたので retry_at まで投稿しない
+#   half_open … retry_at を過ぎたので1件だけ試験投稿する。応答があれば closed、一時的なエラーなら再び open（停止時間は倍）
+# 401/403 などの恒久的なエラーはサイトが落ちているわけではないので、失敗ではなく成功（応答あり）として数える。
+
+def site_host(site_url):
+    return urlparse(site_url or "").netloc.lower()
+
+def _ensure_row(host):
+    try:
+        with db.engine.begin() as conn:
+            conn.execute(insert(SiteCircuit.__table__).values(host=host, state="closed", failure_count=0, trips=0))
+    except IntegrityError:
+        pass  # 作成済み
+
+def load_circuits():
+    """closed 以外のブレーカー（ホスト → SiteCircuit）"""
+    return {circuit.host: circuit for circuit in SiteCircuit.query.filter(SiteCircuit.state != "closed").all()}
+
+def publish_capacity(host, per_host, circuits=None):
+    """
+    このホストに同時に投稿してよい件数を返す（closed は per_host、open は 0、試験投稿中は 1）。
+    open で retry_at を過ぎていれば half_open に切り替えて1件だけ通す。
+    """
+    circuits = load_circuits() if circuits is None else circuits
+    circuit = circuits.get(host)
+    if not circuit or circuit.state == "closed":
+        return per_host
+    if circuit.state == "half_open":
+        return 1
+    if circuit.retry_at and circuit.retry_at > datetime.utcnow():
+        return 0
+    db.session.execute(
+        update(SiteCircuit)
+        .where(SiteCircuit.host == host, SiteCircuit.state == "open")
+        .values(state="half_open")
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    print(f"🔌 試験投稿を再開: {host}")
+    return 1
+
+def record_success(host):
+    """投稿に成功したらブレーカーを closed に戻す"""
+    result = db.session.execute(
+        update(SiteCircuit)
+        .where(SiteCircuit.host == host, (SiteCircuit.state != "closed") | (SiteCircuit.failure_count > 0))
+        .values(state="closed", failure_count=0, trips=0, opened_at=None, retry_at=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    if result.rowcount:
+        print(f"🔌 サイトへの投稿を再開: {host}")
+
+def record_failure(host, error):
+    """一時的なエラーを記録し、連続失敗が閾値に達したか試験投稿に失敗したら open にする。戻り値: open にしたか"""
+    config = current_app.config
+    _ensure_row(host)
+    db.session.execute(
+        update(SiteCircuit)
+        .where(SiteCircuit.host == host)
+        .values(failure_count=SiteCircuit.failure_count + 1, last_error=str(error)[:1000])
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+    circuit = db.session.get(SiteCircuit, host)
+    db.session.refresh(circuit)
+    if circuit.state == "open":
+        return False
+    if circuit.state != "half_open" and circuit.failure_count < config["CIRCUIT_FAILURE_THRESHOLD"]:
+        return False
+
+    now = datetime.utcnow()
+    open_seconds = min(config["CIRCUIT_OPEN_SECONDS"] * 2 ** circuit.trips, config["CIRCUIT_MAX_OPEN_SECONDS"])
+    result = db.session.execute(
+        update(SiteCircuit)
+        .where(SiteCircuit.host == host, SiteCircuit.state != "open")
+        .values(state="open", trips=SiteCircuit.trips + 1, opened_at=now, retry_at=now + timedelta(seconds=open_seconds))
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    if result.rowcount:
+        print(f"🔌 サイトへの投稿を停止: {host}（連続失敗 {circuit.failure_count} 回、{open_seconds} 秒後に再試行）→ {error}")
+    return bool(result.rowcount)
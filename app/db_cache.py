@@ -0,0 +1,34 @@
+# 📄 app/db_cache.py
+
+from sqlalchemy import select, insert, update, delete
+from sqlalchemy.exc import IntegrityError
+from .models import db
+
+# DBに置くキャッシュ（image_search_cache・llm_cache・wp_media・image_keywords）の共通処理。
+# どれも呼び出し側のセッションとは別に db.engine の接続で読み書きするので、
+# asyncio.to_thread で別スレッドから呼んでもよい。
+
+def upsert(table, keys, values):
+    """keys（主キー・一意キーの列名 → 値）の行を values で保存する。既にあれば上書きする"""
+    try:
+        with db.engine.begin() as conn:
+            conn.execute(insert(table).values(**keys, **values))
+    except IntegrityError:
+        # 期限切れの行が残っていた・他のワーカーが同時に保存した
+        with db.engine.begin() as conn:
+            conn.execute(update(table).where(*(table.c[name] == value for name, value in keys.items())).values(**values))
+
+def evict(table, now, max_entries):
+    """期限切れ（expires_at）の行を消し、max_entries を超えた分を最後に使われた（last_used_at）のが古い順に消す"""
+    with db.engine.begin() as conn:
+        conn.execute(delete(table).where(table.c.expires_at <= now))
+        cutoff = conn.execute(
+            select(table.c.last_used_at).order_by(table.c.last_used_at.desc()).offset(max_entries).limit(1)
+        ).scalar()
+        if cutoff is not None:
+            conn.execute(delete(table).where(table.c.last_used_at <= cutoff))
+
+def report_hit_rate(label, hit, miss):
+    """ヒット率を1行ログに出す（まだ使われていなければ何も出さない）"""
+    if hit or miss:
+        print(f"{label}: ヒット {hit} 回 / ミス {miss} 回（ヒット率 {hit / (hit + miss):.0%}）")
@@ -0,0 +1,110 @@
+# 📄 app/fair_share.py
+
+from flask import current_app
+from sqlalchemy import func, case
+from .models import db, ScheduledPost
+from .job_queue import claim_posts, deadline_order
+
+# 生成枠をテナント（ユーザー、FAIR_SHARE_MODE=site ならサイト）ごとに重み付きで公平に配分する。
+# 1人が /auto-post で数千件登録しても、他のユーザーの投稿は毎サイクル自分の取り分だけ生成される。
+#   FAIR_SHARE_WEIGHTS      … "3:2,7:0.5" のように テナントID:重み（未指定は 1）
+#   FAIR_SHARE_MAX_IN_FLIGHT … テナントごとの同時生成数の上限（0で無制限）
+#   FAIR_SHARE_QUOTAS       … テナントごとの上限の個別指定（"3:20"）
+
+def tenant_column():
+    if current_app.config["FAIR_SHARE_MODE"] == "site":
+        return ScheduledPost.site_id
+    return ScheduledPost.user_id
+
+def parse_tenant_map(value, cast=float):
+    """'3:2,7:0.5' → {3: 2.0, 7: 0.5}（読めない項目は無視）"""
+    result = {}
+    for item in (value or "").split(","):
+        key, _, number = item.partition(":")
+        try:
+            result[int(key.strip())] = cast(number.strip())
+        except ValueError:
+            continue
+    return result
+
+def queue_depths(filters=None):
+    """
+    テナントごとの生成キューの深さを返す。
+    戻り値: {テナントID: {"pending": 未確保の生成待ち件数, "in_flight": 生成中（確保済み）件数}}
+    Batch API が確保している投稿は in_flight に含めない。
+    """
+    column = tenant_column()
+    unclaimed = ScheduledPost.claimed_by.is_(None)
+    in_flight = ScheduledPost.claimed_by.isnot(None) & ~ScheduledPost.claimed_by.like("batch:%")
+    rows = (
+        db.session.query(
+            column,
+            func.sum(case((unclaimed, 1), else_=0)),
+            func.sum(case((in_flight, 1), else_=0)),
+        )
+        .filter(ScheduledPost.status == "生成中", *(filters or []))
+        .group_by(column)
+        .all()
+    )
+    return {
+        tenant: {"pending": int(pending or 0), "in_flight": int(running or 0)}
+        for tenant, pending, running in rows
+        if pending or running
+    }
+
+def allocate_slots(depths, limit, weights=None, quotas=None, default_quota=0):
+    """
+    limit 件の枠を重み付きで配分する（テナントID → 件数）。
+    既に生成中の件数も「配分済み」として数え、(配分済み + 1) / 重み が最小のテナントに1件ずつ割り当てる。
+    未確保の投稿がないテナント・同時生成数の上限に達したテナントには割り当てない。
+    """
+    weights = weights or {}
+    quotas = quotas or {}
+    served = {tenant: depth["in_flight"] for tenant, depth in depths.items()}
+    slots = {}
+    for _ in range(limit):
+        candidates = []
+        for tenant, depth in depths.items():
+            given = slots.get(tenant, 0)
+            quota = quotas.get(tenant, default_quota)
+            weight = weights.get(tenant, 1.0)
+            if given >= depth["pending"] or weight <= 0:
+                continue
+            if quota and served[tenant] + given >= quota:
+                continue
+            candidates.append(((served[tenant] + given + 1) / weight, tenant))
+        if not candidates:
+            break
+        _, tenant = min(candidates, key=lambda c: (c[0], str(c[1])))
+        slots[tenant] = slots.get(tenant, 0) + 1
+    return slots
+
+def claim_fair_share(filters, limit, worker_id=None):
+    """
+    claim_posts の公平配分版。テナントごとに配分した件数だけ、各テナント内は期限順に確保する。
+    FAIR_SHARE_MODE=off なら全体の期限順でそのまま確保する。戻り値: 確保した投稿（期限順）
+    """
+    config = current_app.config
+    if config["FAIR_SHARE_MODE"] == "off":
+        return claim_posts(filters, deadline_order(), limit=limit, worker_id=worker_id)
+
+    slots = allocate_slots(
+        queue_depths(filters),
+        limit,
+        weights=parse_tenant_map(config["FAIR_SHARE_WEIGHTS"]),
+        quotas=parse_tenant_map(config["FAIR_SHARE_QUOTAS"], cast=int),
+        default_quota=config["FAIR_SHARE_MAX_IN_FLIGHT"],
+    )
+    column = tenant_column()
+    posts = []
+    for tenant, count in slots.items():
+        posts.extend(claim_posts(filters + [column == tenant], deadline_order(), limit=count, worker_id=worker_id))
+    return sorted(posts, key=lambda post: (post.scheduled_time is None, post.scheduled_time or post.created_at, post.created_at))
+
+def report_queue_depths(filters=None):
+    """テナントごとのキューの深さをログに出す"""
+    depths = queue_depths(filters)
+    label = "サイト" if current_app.config["FAIR_SHARE_MODE"] == "site" else "ユーザー"
+    for tenant, depth in sorted(depths.items(), key=lambda item: -item[1]["pending"]):
+        print(f"📊 キュー（{label} {tenant}）: 待ち {depth['pending']} 件 / 生成中 {depth['in_flight']} 件")
+    return depths
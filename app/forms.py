@@ -10,6 +10,13 @@ from wtforms import (
 )
 from wtforms.validators import DataRequired, Email, URL
 
+# ✅ 本文の生成方式（PromptTemplate.generation_mode）
+GENERATION_MODE_CHOICES = [
+    ("standard", "通常（1回で本文生成）"),
+    ("outline", "見出し構成 → セクション並列生成（長文向け）"),
+    ("structured", "タイトル・本文・画像キーワードを一括生成"),
+]
+
 # ✅ ユーザー登録フォーム
 class SignupForm(FlaskForm):
     username = StringField('ユーザー名', validators=[DataRequired()])
@@ -42,4 +49,5 @@ class PromptTemplateForm(FlaskForm):
     genre = StringField("ジャンル", validators=[DataRequired()])
     title_prompt = TextAreaField("タイトル生成プロンプト", validators=[DataRequired()])
     body_prompt = TextAreaField("本文生成プロンプト", validators=[DataRequired()])
+    generation_mode = SelectField("生成方式", choices=GENERATION_MODE_CHOICES, default="standard")
     submit = SubmitField("テンプレートを保存")
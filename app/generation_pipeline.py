@@ -0,0 +1,242 @@
+# 📄 app/generation_pipeline.py
+
+import asyncio
+import time
+import traceback
+from . import metrics
+from .models import db, ScheduledPost, GenerationControl
+from .image_search import search_images_async
+from .job_queue import clear_claim, release_claim, mark_generated
+from .article_generator import (
+    has_generated_title,
+    checkpoint_title,
+    generate_title_async,
+    generate_body_async,
+    generate_image_keyword_from_title_async,
+    generate_structured_article_async,
+)
+
+# ステージ構成:
+#   title ─┬─> body ────────────────┬─> persist
+#          └─> image（キーワード→Pixabay）┘
+# 本文と画像はタイトルだけに依存するので並列に走らせ、1記事あたりの所要時間をほぼ本文生成分に抑える。
+STAGES = ("title", "body", "image", "persist")
+
+class PipelineJob:
+    """パイプラインを流れる1投稿分の状態"""
+
+    def __init__(self, post):
+        self.post_id = post.id
+        self.keyword = post.keyword
+        self.prompt_title = post.prompt_title
+        self.prompt_body = post.prompt_body
+        self.generation_mode = post.generation_mode
+        # タイトル一括生成で割り当て済みならタイトルステージを省略する
+        self.title = post.title if has_generated_title(post) else None
+        self.content = None
+        self.image_keywords = None
+        self.featured_image = None
+        self.error = None
+        self.pending = 2  # body と image の残り
+        self.started_at = time.monotonic()
+        self.enqueued_at = self.started_at
+        self.timings = {}
+
+async def _put(queue, job):
+    job.enqueued_at = time.monotonic()
+    await queue.put(job)
+
+async def _get(queue, stage):
+    job = await queue.get()
+    metrics.observe(f"pipeline.wait.{stage}", time.monotonic() - job.enqueued_at)
+    return job
+
+async def _run_stage(job, stage, coro):
+    started = time.monotonic()
+    try:
+        return await coro
+    finally:
+        elapsed = time.monotonic() - started
+        job.timings[stage] = elapsed
+        metrics.observe(f"pipeline.stage.{stage}", elapsed)
+
+async def _branch_done(job, persist_q):
+    # body と image の両方が終わった時点で保存ステージへ
+    job.pending -= 1
+    if job.pending == 0:
+        await _put(persist_q, job)
+
+async def _title_worker(client, title_q, body_q, image_q, persist_q):
+    while True:
+        job = await _get(title_q, "title")
+        try:
+            # structured モードはこのステージで本文・画像キーワードまで一括生成（失敗時は通常の流れ）
+            structured = None
+            if job.generation_mode == "structured":
+                structured = await _run_stage(job, "title", generate_structured_article_async(
+                    client, job.prompt_title, job.prompt_body, job.keyword
+                ))
+            if structured:
+                job.title = structured["title"]
+                job.content = structured["body"]
+                job.image_keywords = structured["image_keywords"]
+                print("✅ 一括生成成功:", job.title)
+            elif not job.title:
+                job.title = await _run_stage(job, "title", generate_title_async(client, job.prompt_title, job.keyword))
+                await asyncio.to_thread(checkpoint_title, job.post_id, job.title)
+                print("✅ タイトル生成成功:", job.title)
+            await _put(body_q, job)
+            await _put(image_q, job)
+        except Exception as e:
+            print(f"❌ タイトル生成エラー（post_id={job.post_id}）:", e)
+            job.error = e
+            await _put(persist_q, job)
+        finally:
+            title_q.task_done()
+
+async def _body_worker(client, body_q, persist_q):
+    while True:
+        job = await _get(body_q, "body")
+        try:
+            if job.content:
+                continue  # 一括生成済み
+            job.content = await _run_stage(job, "body", generate_body_async(client, job.prompt_body, job.title, job.generation_mode))
+            print(f"✅ 本文生成成功（post_id={job.post_id}）")
+        except Exception as e:
+            print(f"❌ 本文生成エラー（post_id={job.post_id}）:", e)
+            job.error = e
+        finally:
+            await _branch_done(job, persist_q)
+            body_q.task_done()
+
+async def _image_worker(client, image_q, persist_q):
+    async def find_image(job):
+        image_kw = job.image_keywords or await generate_image_keyword_from_title_async(job.title, client)
+        image_urls = await search_images_async(image_kw, num_images=1)
+        return image_urls[0] if image_urls else None
+
+    while True:
+        job = await _get(image_q, "image")
+        try:
+            job.featured_image = await _run_stage(job, "image", find_image(job))
+            print(f"✅ 画像取得成功（post_id={job.post_id}）:", job.featured_image or "なし")
+        except Exception as e:
+            # 画像は必須ではないので、失敗しても本文があれば保存する
+            print(f"⚠️ 画像取得エラー（post_id={job.post_id}）:", e)
+        finally:
+            await _branch_done(job, persist_q)
+            image_q.task_done()
+
+def _persist(job):
+    if job.error:
+        traceback.print_exception(job.error)
+        release_claim(job.post_id)
+        return False
+
+    post = db.session.get(ScheduledPost, job.post_id)
+    if not post or post.status != "生成中":
+        print(f"⚠️ ステータス変更済みのため保存をスキップ（post_id={job.post_id}）")
+        release_claim(job.post_id)
+        return False
+
+    post.title = job.title
+    post.body = job.content
+    post.featured_image = job.featured_image
+    mark_generated(post)
+    clear_claim(post)
+    db.session.commit()
+    return True
+
+async def _persist_worker(persist_q, results):
+    while True:
+        job = await _get(persist_q, "persist")
+        try:
+            started = time.monotonic()
+            ok = _persist(job)
+            job.timings["persist"] = time.monotonic() - started
+            metrics.observe("pipeline.stage.persist", job.timings["persist"])
+            total = time.monotonic() - job.started_at
+            metrics.observe("pipeline.total", total)
+            if ok:
+                metrics.observe("generation.duration", total)
+                timings = " / ".join(f"{stage} {job.timings[stage]:.1f}s" for stage in STAGES if stage in job.timings)
+                print(f"✅ 保存完了（post_id={job.post_id}）合計 {total:.1f}s: {timings}")
+            results.append(ok)
+        except Exception as e:
+            print(f"❌ 保存エラー（post_id={job.post_id}）:", e)
+            traceback.print_exc()
+            db.session.rollback()
+            release_claim(job.post_id)
+            results.append(False)
+        finally:
+            persist_q.task_done()
+
+def _report_bottleneck():
+    timings = metrics.snapshot("pipeline.")["timings"]
+    busy = {
+        stage: timings[f"pipeline.stage.{stage}"]["total"]
+        for stage in STAGES if f"pipeline.stage.{stage}" in timings
+    }
+    metrics.report("pipeline.")
+    if busy:
+        bottleneck = max(busy, key=busy.get)
+        print(f"🐢 ボトルネック候補ステージ: {bottleneck}（累計 {busy[bottleneck]:.1f}s）")
+
+async def run_pipeline(app, client, post_ids, concurrency):
+    """
+    確保済みの post_ids をステージ並列で生成する。ステージ間は上限付きキュー
+    （PIPELINE_QUEUE_SIZE）でつなぎ、後段が詰まれば前段が待つ。
+    各ステージの処理時間とキュー待ち時間は metrics に記録する。
+    戻り値: 生成完了になった件数
+    """
+    queue_size = app.config["PIPELINE_QUEUE_SIZE"]
+    title_q = asyncio.Queue(maxsize=queue_size)
+    body_q = asyncio.Queue(maxsize=queue_size)
+    image_q = asyncio.Queue(maxsize=queue_size)
+    persist_q = asyncio.Queue(maxsize=queue_size)
+    results = []
+
+    # 投稿（db.session）の更新はイベントループ上の1タスクに集約し、セッションの取り合いを避ける。
+    # ステージ内のDB読み書き（タイトルの途中保存・キャッシュ）は別の接続を使い、asyncio.to_thread で行う
+    workers = [asyncio.create_task(_persist_worker(persist_q, results))]
+    for _ in range(concurrency):
+        workers.append(asyncio.create_task(_title_worker(client, title_q, body_q, image_q, persist_q)))
+        workers.append(asyncio.create_task(_body_worker(client, body_q, persist_q)))
+        workers.append(asyncio.create_task(_image_worker(client, image_q, persist_q)))
+
+    try:
+        for post_id in post_ids:
+            post = db.session.get(ScheduledPost, post_id)
+            if not post or post.status != "生成中":
+                release_claim(post_id)
+                continue
+
+            print(f"📝 生成処理開始: {post.keyword}")
+
+            # 停止フラグを確認
+            control = GenerationControl.query.filter_by(user_id=post.user_id).first()
+            if control and control.stop_flag:
+                print("🛑 停止フラグ検出 → スキップ")
+                release_claim(post_id)
+                continue
+
+            # プロンプト未設定チェック
+            if not post.prompt_title or not post.prompt_body:
+                print(f"⚠️ プロンプト未設定（post_id={post_id}）→ スキップ")
+                post.status = "生成失敗"
+                clear_claim(post)
+                db.session.commit()
+                continue
+
+            await _put(title_q, PipelineJob(post))
+
+        # 前段から順に空になるのを待つ（ジョブは後段にしか流れない）
+        for queue in (title_q, body_q, image_q, persist_q):
+            await queue.join()
+    finally:
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    _report_bottleneck()
+    return sum(1 for ok in results if ok)
@@ -0,0 +1,161 @@
+# 📄 app/http_client.py
+
+import asyncio
+import threading
+import importlib.util
+import weakref
+import httpx
+from charset_normalizer import from_bytes
+from flask import current_app, has_app_context
+from . import metrics
+
+# WordPress・Pixabay・画像の取得など外部サービスへの呼び出しで共有する HTTP クライアント。
+# 接続はホストごとに keep-alive でプールして再利用し、毎回の TCP/TLS ハンドシェイクを省く。
+# h2 パッケージが入っていれば HTTP/2 を使う（同じホストへの並行リクエストを1接続に多重化）。
+#   get_client()       … プロセス内で共有する httpx.Client（スレッドセーフ）
+#   get_async_client() … イベントループごとの httpx.AsyncClient
+# 接続の新規・再利用の回数は metrics の http.connections.* に記録する。
+
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+USER_AGENT = "Mozilla/5.0 (compatible; AI-Posting-Bot/1.0)"
+
+# アプリの設定がない場所（スクリプト等）から使われたときの既定値
+DEFAULTS = {
+    "HTTP_MAX_CONNECTIONS": 100,
+    "HTTP_MAX_KEEPALIVE_CONNECTIONS": 20,
+    "HTTP_KEEPALIVE_EXPIRY": 30,
+    "HTTP_CONNECT_TIMEOUT": 5,
+    "HTTP_TIMEOUT": 20,
+    "HTTP2_ENABLED": True,
+}
+
+_lock = threading.Lock()
+_client = {"sync": None}
+_async_clients = weakref.WeakKeyDictionary()  # イベントループ → AsyncClient
+
+def _config(key):
+    if has_app_context():
+        return current_app.config.get(key, DEFAULTS[key])
+    return DEFAULTS[key]
+
+def timeout(seconds):
+    """1回の呼び出しのタイムアウト（接続は HTTP_CONNECT_TIMEOUT、読み書きは seconds）"""
+    return httpx.Timeout(seconds, connect=min(seconds, _config("HTTP_CONNECT_TIMEOUT")))
+
+def _autodetect_encoding(content):
+    # Content-Type に charset がないレスポンス（WordPress のエラーページ等）の文字化けを防ぐ
+    return from_bytes(content).best().encoding if content else "utf-8"
+
+def _client_options():
+    return {
+        "http2": HTTP2_AVAILABLE and _config("HTTP2_ENABLED"),
+        "limits": httpx.Limits(
+            max_connections=_config("HTTP_MAX_CONNECTIONS"),
+            max_keepalive_connections=_config("HTTP_MAX_KEEPALIVE_CONNECTIONS"),
+            keepalive_expiry=_config("HTTP_KEEPALIVE_EXPIRY"),
+        ),
+    }
+
+def _record_connection(request, connected):
+    kind = "new" if connected else "reused"
+    metrics.incr(f"http.connections.{kind}")
+    metrics.incr(f"http.connections.{kind}.{request.url.host}")
+
+class MeteredTransport(httpx.BaseTransport):
+    """リクエストごとに新しい接続を張ったか、プールの接続を再利用したかを数える"""
+
+    def __init__(self, transport):
+        self._transport = transport
+
+    def handle_request(self, request):
+        connected = []
+
+        def trace(event_name, info):
+            if event_name == "connection.connect_tcp.complete":
+                connected.append(True)
+
+        request.extensions["trace"] = trace
+        with metrics.timer("http.request"):
+            response = self._transport.handle_request(request)
+        _record_connection(request, bool(connected))
+        return response
+
+    def close(self):
+        self._transport.close()
+
+class AsyncMeteredTransport(httpx.AsyncBaseTransport):
+    """MeteredTransport の AsyncClient 版"""
+
+    def __init__(self, transport):
+        self._transport = transport
+
+    async def handle_async_request(self, request):
+        connected = []
+
+        async def trace(event_name, info):
+            if event_name == "connection.connect_tcp.complete":
+                connected.append(True)
+
+        request.extensions["trace"] = trace
+        with metrics.timer("http.request"):
+            response = await self._transport.handle_async_request(request)
+        _record_connection(request, bool(connected))
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+def get_client():
+    """プロセスで共有する httpx.Client（初回呼び出し時に作成）"""
+    client = _client["sync"]
+    if client is None:
+        with _lock:
+            client = _client["sync"]
+            if client is None:
+                options = _client_options()
+                client = httpx.Client(
+                    transport=MeteredTransport(httpx.HTTPTransport(**options)),
+                    timeout=timeout(_config("HTTP_TIMEOUT")),
+                    headers={"User-Agent": USER_AGENT},
+                    follow_redirects=True,
+                    default_encoding=_autodetect_encoding,
+                )
+                _client["sync"] = client
+                print(f"🌐 HTTPクライアント作成（HTTP/2: {'有効' if options['http2'] else '無効'}）")
+    return client
+
+def get_async_client():
+    """実行中のイベントループで共有する httpx.AsyncClient（ループが変われば作り直す）"""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(
+            transport=AsyncMeteredTransport(httpx.AsyncHTTPTransport(**_client_options())),
+            timeout=timeout(_config("HTTP_TIMEOUT")),
+            headers={"User-Agent": USER_AGENT},
+            follow_redirects=True,
+            default_encoding=_autodetect_encoding,
+        )
+        _async_clients[loop] = client
+    return client
+
+async def aclose_async_client():
+    """イベントループを終える前に呼び、そのループの AsyncClient の接続を閉じる"""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+def close_client():
+    with _lock:
+        client, _client["sync"] = _client["sync"], None
+    if client is not None:
+        client.close()
+
+def report_connection_reuse():
+    """接続の再利用率をログに出す"""
+    counters = metrics.snapshot("http.connections.")["counters"]
+    new = counters.get("http.connections.new", 0)
+    reused = counters.get("http.connections.reused", 0)
+    if new or reused:
+        print(f"🌐 HTTP接続: 新規 {new} 回 / 再利用 {reused} 回（再利用率 {reused / (new + reused):.0%}）")
+    return {"new": new, "reused": reused}
@@ -0,0 +1,76 @@
+# 📄 app/image_cache.py
+
+import json
+import hashlib
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import select, update
+from . import metrics
+from .db_cache import upsert, evict, report_hit_rate
+from .models import db, ImageSearchCache
+
+# Pixabay の検索結果キャッシュ（image_search_cache）。DBに置くので全ワーカーで共有する。
+# キーは clean_query 後の検索語と検索条件（APIキーは除く）。PIXABAY_CACHE_TTL_SECONDS で期限切れになり、
+# PIXABAY_CACHE_MAX_ENTRIES を超えたら最後に使われたのが古いものから消す（LRU）。
+# 1キーワードから2〜3件の投稿を作るので、ヒットのたびに読み出し位置をずらして兄弟投稿に別の画像を返す。
+# ヒット・ミスの回数は metrics の pixabay.cache.* に記録する。
+# どちらの関数もDBを読み書きするので、イベントループからは asyncio.to_thread で呼ぶ。
+
+def cache_key(params):
+    data = {k: v for k, v in params.items() if k != "key"}
+    return hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()
+
+def _enabled():
+    return current_app.config["PIXABAY_CACHE_TTL_SECONDS"] > 0
+
+def take_cached(params, num_images):
+    """キャッシュにあれば読み出し位置から num_images 件を返す（なければ None）"""
+    if not _enabled():
+        return None
+    table = ImageSearchCache.__table__
+    key = cache_key(params)
+    now = datetime.utcnow()
+    row = None
+    with db.engine.begin() as conn:
+        # 位置を進める UPDATE で行をロックしてから読むので、同時に読んだ投稿同士でも別の画像になる
+        result = conn.execute(
+            update(table)
+            .where(table.c.cache_key == key, table.c.expires_at > now)
+            .values(cursor=table.c.cursor + num_images, last_used_at=now)
+        )
+        if result.rowcount:
+            row = conn.execute(select(table.c.image_urls, table.c.cursor).where(table.c.cache_key == key)).first()
+    if row is None:
+        metrics.incr("pixabay.cache.miss")
+        return None
+
+    metrics.incr("pixabay.cache.hit")
+    image_urls = json.loads(row.image_urls)
+    start = row.cursor - num_images
+    return [image_urls[(start + i) % len(image_urls)] for i in range(min(num_images, len(image_urls)))]
+
+def store_results(params, image_urls, num_images):
+    """検索結果を保存し、先頭から num_images 件を返す（結果なし・エラーは保存しない）"""
+    if image_urls and _enabled():
+        config = current_app.config
+        table = ImageSearchCache.__table__
+        key = cache_key(params)
+        now = datetime.utcnow()
+        values = dict(
+            query=params["q"],
+            image_urls=json.dumps(image_urls),
+            cursor=num_images,
+            expires_at=now + timedelta(seconds=config["PIXABAY_CACHE_TTL_SECONDS"]),
+            last_used_at=now,
+        )
+        upsert(table, dict(cache_key=key), values)
+        evict(table, now, config["PIXABAY_CACHE_MAX_ENTRIES"])
+    return image_urls[:num_images]
+
+def report_image_cache():
+    """キャッシュのヒット率をログに出す"""
+    counters = metrics.snapshot("pixabay.cache.")["counters"]
+    hit = counters.get("pixabay.cache.hit", 0)
+    miss = counters.get("pixabay.cache.miss", 0)
+    report_hit_rate("🖼 Pixabayキャッシュ", hit, miss)
+    return {"hit": hit, "miss": miss}
@@ -0,0 +1,201 @@
+# 📄 app/image_keywords.py
+
+import re
+import json
+import hashlib
+import unicodedata
+from functools import lru_cache
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import select
+from . import metrics
+from .db_cache import upsert
+from .models import db, ImageKeyword
+
+# 記事タイトル → Pixabay 用の英語キーワード（LLM を呼ばずに辞書で変換する）。
+# タイトルを辞書の最長一致で区切り、写真になりやすい語を英語に置き換える。
+# 辞書で覆えた割合（信頼度）が IMAGE_KEYWORD_MIN_CONFIDENCE 未満のときだけ LLM を呼び、
+# その結果はタイトルごとに image_keywords テーブルへ保存して次回から再利用する（全ワーカーで共有）。
+# 辞書は IMAGE_KEYWORD_DICT_PATH の JSON（{"日本語": "english", "除外する語": null}）で追加・上書きできる。
+# 辞書・保存済み・LLM の件数は metrics の image_keyword.* に記録する。
+
+MAX_WORDS = 3  # LLM と同じく2〜3語
+
+# 写真になりやすい語（値が英語の検索語）
+DICTIONARY = {
+    # 場所・風景
+    "日本": "japan", "東京": "tokyo", "京都": "kyoto", "大阪": "osaka", "北海道": "hokkaido", "沖縄": "okinawa",
+    "富士山": "mount fuji", "海外": "travel", "海": "sea", "ビーチ": "beach", "山": "mountain", "川": "river",
+    "湖": "lake", "森": "forest", "公園": "park", "庭": "garden", "空": "sky", "夜景": "night city", "街": "city",
+    "都市": "city", "田舎": "countryside", "島": "island", "温泉": "hot spring", "神社": "shrine", "寺": "temple",
+    "城": "castle", "桜": "cherry blossom", "紅葉": "autumn leaves", "雪": "snow", "花": "flower", "春": "spring",
+    "夏": "summer", "秋": "autumn", "冬": "winter", "キャンプ": "camping", "登山": "hiking", "旅行": "travel",
+    "観光": "sightseeing", "ホテル": "hotel", "旅館": "ryokan", "空港": "airport", "飛行機": "airplane",
+    "電車": "train", "駅": "station", "車": "car", "自転車": "bicycle", "バイク": "motorcycle", "ドライブ": "road trip",
+    # 食べ物
+    "料理": "cooking", "レシピ": "recipe", "食事": "meal", "グルメ": "food", "ラーメン": "ramen", "寿司": "sushi",
+    "カレー": "curry", "パスタ": "pasta", "パン": "bread", "ケーキ": "cake", "スイーツ": "dessert", "お菓子": "sweets",
+    "チョコレート": "chocolate", "コーヒー": "coffee", "カフェ": "cafe", "紅茶": "tea", "お茶": "green tea",
+    "ビール": "beer", "ワイン": "wine", "日本酒": "sake", "お酒": "drinks", "野菜": "vegetables", "果物": "fruit",
+    "フルーツ": "fruit", "肉": "meat", "魚": "fish", "弁当": "bento", "朝食": "breakfast", "ランチ": "lunch",
+    "ディナー": "dinner", "レストラン": "restaurant", "居酒屋": "izakaya", "焼肉": "yakiniku", "サラダ": "salad",
+    "ダイエット": "diet", "食べ": "food", "飲み": "drinks",
+    # 暮らし・住まい
+    "家": "house", "住宅": "house", "部屋": "room", "インテリア": "interior", "キッチン": "kitchen",
+    "掃除": "cleaning", "洗濯": "laundry", "収納": "storage", "家具": "furniture", "引っ越し": "moving boxes",
+    "家族": "family", "子育て": "parenting", "子供": "children", "子ども": "children", "赤ちゃん": "baby",
+    "結婚": "wedding", "恋愛": "couple", "友達": "friends", "一人暮らし": "apartment", "節約": "saving money",
+    "買い物": "shopping", "ファッション": "fashion", "服": "clothes", "靴": "shoes", "バッグ": "bag",
+    "時計": "watch", "メガネ": "glasses", "プレゼント": "gift", "誕生日": "birthday", "クリスマス": "christmas",
+    "正月": "new year", "お祭り": "festival", "祭り": "festival",
+    # 美容・健康
+    "美容": "beauty", "化粧": "makeup", "メイク": "makeup", "コスメ": "cosmetics", "スキンケア": "skincare",
+    "髪": "hair", "ヘアスタイル": "hairstyle", "ネイル": "nail art", "健康": "health", "運動": "exercise",
+    "筋トレ": "workout", "ジム": "gym", "ヨガ": "yoga", "ランニング": "running", "睡眠": "sleep",
+    "病院": "hospital", "医療": "medical", "薬": "medicine", "歯": "dental", "マッサージ": "massage",
+    "ストレス": "relaxation", "瞑想": "meditation",
+    # 動物
+    "犬": "dog", "猫": "cat", "ペット": "pet", "鳥": "bird", "うさぎ": "rabbit", "金魚": "goldfish", "馬": "horse",
+    # 仕事・お金・学び
+    "仕事": "office", "会社": "office", "オフィス": "office", "転職": "job interview", "就職": "job interview",
+    "面接": "job interview", "副業": "laptop work", "在宅": "home office", "テレワーク": "home office",
+    "起業": "startup", "経営": "business meeting", "営業": "business meeting", "会議": "meeting",
+    "お金": "money", "投資": "investment", "株": "stock market", "株式": "stock market", "資産": "money",
+    "貯金": "savings", "保険": "insurance", "税金": "tax", "銀行": "bank", "クレジットカード": "credit card",
+    "不動産": "real estate", "納税": "tax", "ふるさと納税": "local specialty", "年金": "retirement", "勉強": "study", "学校": "school", "大学": "university",
+    "受験": "exam", "資格": "certificate", "英語": "english study", "読書": "reading", "本": "books",
+    "図書館": "library", "ノート": "notebook",
+    # IT・趣味
+    "パソコン": "computer", "PC": "computer", "スマホ": "smartphone", "スマートフォン": "smartphone",
+    "携帯": "smartphone", "アプリ": "smartphone app", "ゲーム": "video game", "カメラ": "camera", "写真": "photography",
+    "動画": "video", "音楽": "music", "ギター": "guitar", "ピアノ": "piano", "映画": "cinema", "アニメ": "anime",
+    "ブログ": "blogging", "プログラミング": "programming", "ネット": "internet", "インターネット": "internet",
+    "AI": "artificial intelligence", "人工知能": "artificial intelligence", "ロボット": "robot",
+    "サッカー": "soccer", "野球": "baseball", "テニス": "tennis", "ゴルフ": "golf", "釣り": "fishing",
+    "水泳": "swimming", "スキー": "skiing", "サーフィン": "surfing", "絵": "painting", "手作り": "handmade",
+    "DIY": "diy", "園芸": "gardening", "ガーデニング": "gardening",
+}
+
+# 写真の検索語にならない語（辞書で覆えたものとして数えるが、キーワードには入れない）
+IGNORED_WORDS = [
+    "おすすめ", "オススメ", "人気", "ランキング", "比較", "方法", "やり方", "使い方", "選び方", "選", "解説", "紹介",
+    "完全", "徹底", "ガイド", "まとめ", "初心者", "入門", "基本", "基礎", "ポイント", "コツ", "理由", "違い", "特徴",
+    "メリット", "デメリット", "注意点", "最新", "年", "月", "版", "簡単", "実践", "必見", "最強", "人", "知識",
+    "意味", "効果", "対策", "向け", "について", "とは", "する", "ため", "こと", "もの", "ない", "できる", "たい",
+    "本当", "失敗", "成功", "秘訣", "魅力", "楽しみ方", "口コミ", "評判", "レビュー", "体験談", "Q&A", "FAQ",
+]
+
+# タイトル中の英単語のうち検索語にしないもの
+ENGLISH_STOPWORDS = {"the", "and", "for", "with", "how", "to", "of", "in", "on", "vs", "top", "best", "new"}
+
+_CONTENT_CHAR = re.compile(r'[一-鿿゠-ヿa-z]')  # 漢字・カタカナ・英字（ひらがなは助詞が多いので数えない）
+_LATIN_WORD = re.compile(r'[a-z][a-z0-9\-]*')
+
+def _normalize(text):
+    return unicodedata.normalize("NFKC", text or "").lower()
+
+def _load_dictionary(path):
+    entries = {_normalize(word): None for word in IGNORED_WORDS}
+    entries.update({_normalize(word): english for word, english in DICTIONARY.items()})
+    if path:
+        try:
+            with open(path, encoding="utf-8") as f:
+                entries.update({_normalize(word): english for word, english in json.load(f).items()})
+        except (OSError, ValueError) as e:
+            print(f"⚠️ 画像キーワード辞書を読み込めませんでした（{path}）: {e}")
+    return entries
+
+@lru_cache(maxsize=1)
+def _dictionary(path):
+    # path ごとに1度だけ読み込む（設定で辞書を差し替えたときは読み直す）
+    entries = _load_dictionary(path)
+    return entries, max(map(len, entries))
+
+@lru_cache(maxsize=2048)
+def _extract(title, path):
+    entries, longest = _dictionary(path)
+    text = _normalize(title)
+    keywords = []
+    covered = total = 0
+    i = 0
+    while i < len(text):
+        # 英単語は単語単位で辞書を引き（pc → computer）、なければそのまま検索語にする
+        match = _LATIN_WORD.match(text, i)
+        if match:
+            word = match.group(0)
+            english = entries.get(word, word if len(word) >= 3 and word not in ENGLISH_STOPWORDS else None)
+            if english and english not in keywords:
+                keywords.append(english)
+            covered += len(word)
+            total += len(word)
+            i = match.end()
+            continue
+
+        for length in range(min(longest, len(text) - i), 0, -1):
+            word = text[i:i + length]
+            if word in entries:
+                english = entries[word]
+                if english and english not in keywords:
+                    keywords.append(english)
+                covered += length
+                total += length
+                i += length
+                break
+        else:
+            if _CONTENT_CHAR.match(text[i]):
+                total += 1
+            i += 1
+
+    words = []
+    for keyword in keywords:
+        if len(words) + len(keyword.split()) > MAX_WORDS:
+            break
+        words.extend(keyword.split())
+    confidence = covered / total if words and total else 0.0
+    return " ".join(words), confidence
+
+def extract_image_keywords(title):
+    """辞書でタイトルを英語キーワードに変換する。戻り値: (キーワード, 信頼度 0〜1)"""
+    return _extract(title, current_app.config.get("IMAGE_KEYWORD_DICT_PATH"))
+
+def _title_hash(title):
+    return hashlib.sha256(_normalize(title).strip().encode()).hexdigest()
+
+def local_image_keyword(title):
+    """LLM を呼ばずに決まるキーワード（辞書の信頼度が十分か、以前に LLM で求めたもの）。なければ None"""
+    keywords, confidence = extract_image_keywords(title)
+    if keywords and confidence >= current_app.config["IMAGE_KEYWORD_MIN_CONFIDENCE"]:
+        metrics.incr("image_keyword.dictionary")
+        return keywords
+
+    table = ImageKeyword.__table__
+    with db.engine.connect() as conn:
+        learned = conn.execute(select(table.c.keywords).where(table.c.title_hash == _title_hash(title))).scalar()
+    if learned:
+        metrics.incr("image_keyword.learned")
+        return learned
+    metrics.incr("image_keyword.llm")
+    return None
+
+def remember_image_keyword(title, keywords):
+    """LLM が生成したキーワードをタイトルごとに保存する"""
+    table = ImageKeyword.__table__
+    values = dict(keywords=keywords[:100], created_at=datetime.utcnow())
+    upsert(table, dict(title_hash=_title_hash(title)), dict(title=title[:255], **values))
+
+def fallback_image_keyword(title):
+    """LLM が失敗したとき用（信頼度が低くても辞書で取れた語を使い、なければ nature）"""
+    keywords, _ = extract_image_keywords(title)
+    return keywords or "nature"
+
+def report_image_keywords():
+    """LLM を呼ばずに済んだ割合をログに出す"""
+    counters = metrics.snapshot("image_keyword.")["counters"]
+    dictionary = counters.get("image_keyword.dictionary", 0)
+    learned = counters.get("image_keyword.learned", 0)
+    llm = counters.get("image_keyword.llm", 0)
+    total = dictionary + learned + llm
+    if total:
+        print(f"🔤 画像キーワード: 辞書 {dictionary} 件 / 保存済み {learned} 件 / LLM {llm} 件"
+              f"（LLMなし {(dictionary + learned) / total:.0%}）")
+    return {"dictionary": dictionary, "learned": learned, "llm": llm}
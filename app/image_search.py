@@ -1,8 +1,14 @@
 # 📄 app/image_search.py
 
-import requests
+import asyncio
+import httpx
 from flask import current_app
 import re
+from .rate_limiter import acquire, acquire_async, observe_pixabay_response
+from .http_client import get_client, get_async_client, timeout
+from .image_cache import take_cached, store_results
+
+PIXABAY_API_URL = "https://pixabay.com/api/"
 
 def clean_query(query):
     """
@@ -20,44 +26,85 @@ def clean_query(query):
 
     return query[:100]  # 文字数制限（Pixabay推奨）
 
-def search_images(query, num_images=2):
-    """
-    Pixabay APIを使って画像URLリストを返す。
-    - query: 日本語または英語の検索語（英語推奨）
-    - num_images: 必要な画像枚数（最大3程度）
-    """
+def _pixabay_params(query, num_images):
+    """検索パラメータ（APIキー未設定なら None）。キャッシュして順番に使うため PIXABAY_CACHE_RESULTS 件まとめて取得する"""
     PIXABAY_API_KEY = current_app.config.get('PIXABAY_API_KEY')
-    PIXABAY_API_URL = "https://pixabay.com/api/"
 
     if not PIXABAY_API_KEY:
         print("❌ Pixabay APIキーが設定されていません")
-        return []
-
-    clean_kw = clean_query(query)
+        return None
 
-    params = {
+    return {
         'key': PIXABAY_API_KEY,
-        'q': clean_kw,
+        'q': clean_query(query),
         'image_type': 'photo',
-        'per_page': num_images,
+        'per_page': min(max(num_images, current_app.config["PIXABAY_CACHE_RESULTS"], 3), 200),  # Pixabay は 3〜200
         'safesearch': 'true',
         'lang': 'en'
     }
 
+def _image_urls(response, params):
+    if response.status_code != 200:
+        print(f"❌ Pixabay APIリクエスト失敗: {response.status_code} - {response.text}")
+        return []
+
+    data = response.json()
+    image_urls = [hit['webformatURL'] for hit in data.get('hits', [])]
+
+    if not image_urls:
+        print(f"⚠️ 画像が見つかりませんでした（検索語: {params['q']}）")
+
+    return image_urls
+
+def search_images(query, num_images=2):
+    """
+    Pixabay APIを使って画像URLリストを返す。
+    - query: 日本語または英語の検索語（英語推奨）
+    - num_images: 必要な画像枚数（最大3程度）
+    同じ検索はキャッシュから返し、呼ぶたびに結果の中の別の画像を返す。
+    """
+    params = _pixabay_params(query, num_images)
+    if params is None:
+        return []
+    cached = take_cached(params, num_images)
+    if cached is not None:
+        return cached
+
     try:
-        response = requests.get(PIXABAY_API_URL, params=params, timeout=10)
-        if response.status_code != 200:
-            print(f"❌ Pixabay APIリクエスト失敗: {response.status_code} - {response.text}")
-            return []
+        # 共有のレート制限枠が空くまで待ってから呼び出し、429 は待機して再送する
+        for attempt in range(current_app.config["RATE_LIMIT_MAX_RETRIES"] + 1):
+            acquire("pixabay:requests")
+            response = get_client().get(PIXABAY_API_URL, params=params, timeout=timeout(10))
+            if observe_pixabay_response(response) is None:
+                break
+        return store_results(params, _image_urls(response, params), num_images)
 
-        data = response.json()
-        image_urls = [hit['webformatURL'] for hit in data.get('hits', [])]
+    except httpx.HTTPError as e:
+        print(f"❌ Pixabay API例外発生: {e}")
+        return []
 
-        if not image_urls:
-            print(f"⚠️ 画像が見つかりませんでした（検索語: {clean_kw}）")
+async def search_images_async(query, num_images=2):
+    """
+    search_images の async 版。イベントループの AsyncClient を使うのでスレッドに逃がさずに呼べる。
+    current_app を参照するため、呼び出し側でアプリコンテキストを張る。
+    キャッシュ（DB）とレート制限バケット（ファイルロック・DB）の読み書きは
+    イベントループを止めないよう asyncio.to_thread で行う。
+    """
+    params = _pixabay_params(query, num_images)
+    if params is None:
+        return []
+    cached = await asyncio.to_thread(take_cached, params, num_images)
+    if cached is not None:
+        return cached
 
-        return image_urls
+    try:
+        for attempt in range(current_app.config["RATE_LIMIT_MAX_RETRIES"] + 1):
+            await acquire_async("pixabay:requests")
+            response = await get_async_client().get(PIXABAY_API_URL, params=params, timeout=timeout(10))
+            if await asyncio.to_thread(observe_pixabay_response, response) is None:
+                break
+        return await asyncio.to_thread(store_results, params, _image_urls(response, params), num_images)
 
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         print(f"❌ Pixabay API例外発生: {e}")
         return []
@@ -0,0 +1,246 @@
+# 📄 app/job_queue.py
+
+import os
+import socket
+import time
+import threading
+import traceback
+from datetime import datetime, timedelta
+import pytz
+from flask import current_app
+from sqlalchemy import select, update, func, or_, and_
+from . import metrics
+from .models import db, ScheduledPost
+
+# リーパーが期限切れ確保を失敗扱いにする際のステータス対応（確保時のステータス → 失敗時のステータス）
+FAILED_STATUS_BY_PHASE = {
+    "生成待ち": "生成失敗",
+    "生成中": "生成失敗",
+    "生成完了": "投稿失敗",
+}
+
+def now_jst():
+    """scheduled_time と同じ JST（タイムゾーンなし）の現在時刻"""
+    return datetime.now(pytz.timezone("Asia/Tokyo")).replace(tzinfo=None)
+
+def get_worker_id():
+    """ホスト名とPIDからワーカーIDを生成（claimed_by に保存される）"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def is_postgres():
+    return db.engine.dialect.name == "postgresql"
+
+def claim_posts(filters, order_by, limit=None, worker_id=None, lease_seconds=None):
+    """
+    条件に合う未確保の ScheduledPost を最大 limit 件確保し、確保できた投稿を返す。
+    - PostgreSQL: 対象行を SELECT ... FOR UPDATE SKIP LOCKED でロックし、他ワーカーがロック中の行は飛ばす
+    - SQLite: 書き込みがDB単位で直列化されるため、claimed_by IS NULL 条件付きの単一UPDATEで同等の排他になる
+    どちらも UPDATE ... WHERE id IN (サブクエリ) の1文で確保するので、同じ投稿が二重に確保されることはない。
+    確保にはリース期限（既定は CLAIM_LEASE_SECONDS）が付き、renew_leases で延長されなければ
+    reap_expired_leases が回収する。
+    """
+    worker_id = worker_id or get_worker_id()
+    claimed_at = datetime.utcnow()
+    lease_seconds = lease_seconds or current_app.config["CLAIM_LEASE_SECONDS"]
+    lease_expires_at = claimed_at + timedelta(seconds=lease_seconds)
+
+    candidates = (
+        select(ScheduledPost.id)
+        .where(*filters, ScheduledPost.claimed_by.is_(None))
+        .order_by(*order_by)
+    )
+    if limit is not None:
+        candidates = candidates.limit(limit)
+    if is_postgres():
+        candidates = candidates.with_for_update(skip_locked=True)
+
+    db.session.execute(
+        update(ScheduledPost)
+        .where(ScheduledPost.id.in_(candidates), ScheduledPost.claimed_by.is_(None))
+        .values(claimed_by=worker_id, claimed_at=claimed_at, lease_expires_at=lease_expires_at)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+    # 今回の確保分だけを取得（claimed_at を確保トークンとして使う）
+    return (
+        ScheduledPost.query
+        .filter(ScheduledPost.claimed_by == worker_id, ScheduledPost.claimed_at == claimed_at)
+        .order_by(*order_by)
+        .all()
+    )
+
+def mark_generated(post):
+    """
+    生成完了にする（commit は呼び出し側）。リーパーの再キュー回数は投稿フェーズ用に数え直すため 0 に戻す
+    （生成中の再キューで投稿前に MAX_JOB_ATTEMPTS を使い切らないように）。
+    """
+    post.status = "生成完了"
+    post.attempts = 0
+
+def clear_claim(post):
+    """ステータス更新と同じコミットで確保を外す（commit は呼び出し側）"""
+    post.claimed_by = None
+    post.claimed_at = None
+    post.lease_expires_at = None
+
+def release_claim(post_id):
+    """処理を中断した投稿の確保を外してキューに戻す"""
+    db.session.execute(
+        update(ScheduledPost)
+        .where(ScheduledPost.id == post_id)
+        .values(claimed_by=None, claimed_at=None, lease_expires_at=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+def renew_leases(worker_id=None):
+    """このワーカーが確保中の投稿すべてのリース期限を延長する（ハートビート）"""
+    worker_id = worker_id or get_worker_id()
+    lease_expires_at = datetime.utcnow() + timedelta(seconds=current_app.config["CLAIM_LEASE_SECONDS"])
+    result = db.session.execute(
+        update(ScheduledPost)
+        .where(ScheduledPost.claimed_by == worker_id)
+        .values(lease_expires_at=lease_expires_at)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return result.rowcount
+
+def start_heartbeat(app, worker_id=None):
+    """
+    WORKER_HEARTBEAT_SECONDS ごとに renew_leases を呼ぶデーモンスレッドを起動する。
+    生成処理が長引いても、プロセスが生きている限り確保はリーパーに回収されない。
+    """
+    worker_id = worker_id or get_worker_id()
+    interval = app.config["WORKER_HEARTBEAT_SECONDS"]
+
+    def beat():
+        while True:
+            try:
+                with app.app_context():
+                    renew_leases(worker_id)
+            except Exception as e:
+                print(f"❌ ハートビート失敗: {e}")
+                traceback.print_exc()
+            time.sleep(interval)
+
+    thread = threading.Thread(target=beat, name="lease-heartbeat", daemon=True)
+    thread.start()
+    return thread
+
+def reap_expired_leases():
+    """
+    リース期限切れの確保（ワーカーがクラッシュした投稿）を回収する。
+    - attempts を1増やして確保を外し、キューに戻す
+    - attempts が MAX_JOB_ATTEMPTS に達した投稿は失敗ステータスにする
+    期限内の確保には触れない。戻り値: (再キュー件数, 失敗件数)
+    """
+    now = datetime.utcnow()
+    max_attempts = current_app.config["MAX_JOB_ATTEMPTS"]
+    expired = and_(
+        ScheduledPost.claimed_by.isnot(None),
+        or_(
+            ScheduledPost.lease_expires_at < now,
+            # リース導入前に確保された行は claimed_at から判定
+            and_(
+                ScheduledPost.lease_expires_at.is_(None),
+                ScheduledPost.claimed_at < now - timedelta(seconds=current_app.config["CLAIM_LEASE_SECONDS"]),
+            ),
+        ),
+    )
+    released = dict(claimed_by=None, claimed_at=None, lease_expires_at=None, attempts=ScheduledPost.attempts + 1)
+
+    failed = 0
+    for phase_status, failed_status in FAILED_STATUS_BY_PHASE.items():
+        result = db.session.execute(
+            update(ScheduledPost)
+            .where(expired, ScheduledPost.status == phase_status, ScheduledPost.attempts + 1 >= max_attempts)
+            .values(status=failed_status, **released)
+            .execution_options(synchronize_session=False)
+        )
+        failed += result.rowcount
+
+    result = db.session.execute(
+        update(ScheduledPost)
+        .where(expired)
+        .values(**released)
+        .execution_options(synchronize_session=False)
+    )
+    requeued = result.rowcount
+    db.session.commit()
+
+    if requeued or failed:
+        print(f"🧹 期限切れの確保を回収: 再キュー {requeued} 件 / 失敗 {failed} 件")
+    return requeued, failed
+
+# ---------------------
+# 投稿予定時刻に基づく生成順序
+# ---------------------
+def expected_generation_seconds():
+    """1記事の生成にかかる見込み秒数。このプロセスで5件以上計測済みならその平均、なければ GENERATION_EXPECTED_SECONDS"""
+    stat = metrics.snapshot("generation.duration")["timings"].get("generation.duration")
+    if stat and stat["count"] >= 5:
+        return stat["total"] / stat["count"]
+    return current_app.config["GENERATION_EXPECTED_SECONDS"]
+
+def generation_concurrency():
+    """このワーカー構成で同時に生成できる件数（sync モードは1件ずつ）"""
+    if current_app.config["WORKER_MODE"] in ("async", "pipeline"):
+        return current_app.config["WORKER_CONCURRENCY"]
+    return 1
+
+def generation_window_filters():
+    """
+    生成対象を投稿予定の GENERATION_LEAD_HOURS 時間前（+ 生成の見込み時間）以内に絞る条件（0 なら絞らない）。
+    予定時刻のない投稿は常に対象。
+    """
+    lead_hours = current_app.config["GENERATION_LEAD_HOURS"]
+    if not lead_hours:
+        return []
+    window_end = now_jst() + timedelta(hours=lead_hours, seconds=expected_generation_seconds())
+    return [or_(ScheduledPost.scheduled_time.is_(None), ScheduledPost.scheduled_time <= window_end)]
+
+def deadline_order():
+    """
+    生成開始の期限（投稿予定時刻 - 生成の見込み時間）が早い順。見込み時間は全投稿共通なので
+    投稿予定時刻の順と同じになる。予定時刻のない投稿は最後に登録順で処理する。
+    """
+    return [ScheduledPost.scheduled_time.is_(None), ScheduledPost.scheduled_time, ScheduledPost.created_at]
+
+def find_at_risk_posts(concurrency=None, filters=()):
+    """
+    生成待ちの投稿を期限順に並べ、現在の処理能力（concurrency 件同時・1件あたり expected_generation_seconds）で
+    先頭から生成した場合に投稿予定時刻に間に合わない投稿を返す。戻り値: [(投稿, 見込み完了時刻)]
+    filters を渡すとそれに当てはまる投稿だけを返す（順番は全ユーザーのキューの中での位置で数える）。
+    """
+    concurrency = concurrency or generation_concurrency()
+    expected = expected_generation_seconds()
+    now = now_jst()
+    # キュー内の順番はDB側で数え、呼び出し元が見る投稿だけを読み込む
+    queue = (
+        select(ScheduledPost.id, func.row_number().over(order_by=deadline_order()).label("position"))
+        .where(ScheduledPost.status == "生成中", ScheduledPost.scheduled_time.isnot(None), *generation_window_filters())
+        .subquery()
+    )
+    rows = db.session.execute(
+        select(ScheduledPost, queue.c.position)
+        .join(queue, queue.c.id == ScheduledPost.id)
+        .where(*filters)
+        .order_by(queue.c.position)
+    ).all()
+    at_risk = []
+    for post, position in rows:
+        finish_at = now + timedelta(seconds=expected * ((position - 1) // concurrency + 1))
+        if finish_at > post.scheduled_time:
+            at_risk.append((post, finish_at))
+    return at_risk
+
+def report_at_risk(concurrency=None):
+    """投稿予定時刻に間に合わない恐れのある投稿をログに出す"""
+    at_risk = find_at_risk_posts(concurrency)
+    if at_risk:
+        print(f"⚠️ 投稿予定時刻に間に合わない恐れのある投稿: {len(at_risk)} 件")
+        for post, finish_at in at_risk[:10]:
+            print(f"   post_id={post.id} {post.keyword} 予定 {post.scheduled_time:%m/%d %H:%M} / 生成完了見込み {finish_at:%m/%d %H:%M}")
+    return at_risk
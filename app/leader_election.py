@@ -0,0 +1,60 @@
+# 📄 app/leader_election.py
+
+from datetime import datetime, timedelta
+from sqlalchemy import insert, update, or_, case
+from sqlalchemy.exc import IntegrityError
+from .models import db, SchedulerLease
+
+# scheduler_leases の1行をリースとして取り合い、期限内に延長し続けたプロセスだけをリーダーとする。
+# リーダーが落ちるとリースが切れ、次に延長を試みたプロセスが引き継ぐ。
+
+def _ensure_row(name):
+    try:
+        with db.engine.begin() as conn:
+            conn.execute(insert(SchedulerLease.__table__).values(name=name))
+    except IntegrityError:
+        pass  # 作成済み
+
+def try_acquire_leadership(name, holder, lease_seconds):
+    """
+    リースを取得または延長する。自分が保持中か、期限切れ・未保持のときだけ単一UPDATEで書き換えるので、
+    同時に複数のプロセスがリーダーになることはない。戻り値: リーダーなら True
+    """
+    _ensure_row(name)
+    now = datetime.utcnow()
+    result = db.session.execute(
+        update(SchedulerLease)
+        .where(
+            SchedulerLease.name == name,
+            or_(
+                SchedulerLease.holder == holder,
+                SchedulerLease.holder.is_(None),
+                SchedulerLease.expires_at.is_(None),
+                SchedulerLease.expires_at < now,
+            ),
+        )
+        .values(
+            holder=holder,
+            expires_at=now + timedelta(seconds=lease_seconds),
+            acquired_at=case((SchedulerLease.holder == holder, SchedulerLease.acquired_at), else_=now),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+def release_leadership(name, holder):
+    """終了時にリースを手放し、他のプロセスがすぐ引き継げるようにする"""
+    db.session.execute(
+        update(SchedulerLease)
+        .where(SchedulerLease.name == name, SchedulerLease.holder == holder)
+        .values(holder=None, expires_at=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+def current_leader(name):
+    lease = db.session.get(SchedulerLease, name)
+    if not lease or not lease.holder or not lease.expires_at or lease.expires_at < datetime.utcnow():
+        return None
+    return lease.holder
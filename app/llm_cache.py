@@ -0,0 +1,115 @@
+# 📄 app/llm_cache.py
+
+import json
+import asyncio
+import hashlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import select, update
+from . import metrics
+from .db_cache import upsert, evict, report_hit_rate
+from .models import db, LlmCache
+
+# OpenAI の応答キャッシュ（llm_cache）。モデル・メッセージ・temperature・max_tokens 等が同じリクエストは
+# 保存済みの応答を返す（キーはリクエスト内容の SHA-256）。DBに置くので全ワーカーで共有する。
+# 対象は LLM_CACHE_CALL_SITES に挙げた呼び出し元のみ（既定はなし。image_keyword の結果は image_keywords テーブルに
+# タイトルごとに保存している。outline・section・title・body・structured は temperature > 0 で兄弟投稿ごとに
+# 別の記事を作るため、対象にすると同じ内容になる）。
+# 管理画面からの再生成は refreshing() の中で呼び、保存済みの応答を使わずに作り直す（結果で上書きする）。
+# LLM_CACHE_TTL_SECONDS で期限切れ、LLM_CACHE_MAX_ENTRIES を超えたら最後に使われたのが古いものから消す。
+# ヒット・ミスの回数は metrics の llm_cache.hit.<呼び出し元> / llm_cache.miss.<呼び出し元> に記録する。
+
+_refresh = ContextVar("llm_cache_refresh", default=False)
+
+@contextmanager
+def refreshing(enabled=True):
+    """この中の呼び出しは保存済みの応答を読まずに API を呼ぶ（明示的な再生成用）"""
+    token = _refresh.set(enabled)
+    try:
+        yield
+    finally:
+        _refresh.reset(token)
+
+def is_refreshing():
+    return _refresh.get()
+
+def _call_sites():
+    return {site.strip() for site in current_app.config["LLM_CACHE_CALL_SITES"].split(",") if site.strip()}
+
+def request_key(request):
+    return hashlib.sha256(json.dumps(request, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+
+def _cache_key(call_site, request):
+    """キャッシュ対象ならキー、対象外なら None"""
+    if current_app.config["LLM_CACHE_TTL_SECONDS"] <= 0 or call_site not in _call_sites():
+        return None
+    return request_key(request)
+
+def load(key, call_site):
+    if _refresh.get():
+        metrics.incr(f"llm_cache.miss.{call_site}")
+        return None
+    table = LlmCache.__table__
+    now = datetime.utcnow()
+    with db.engine.begin() as conn:
+        content = conn.execute(
+            select(table.c.content).where(table.c.cache_key == key, table.c.expires_at > now)
+        ).scalar()
+        if content is not None:
+            conn.execute(update(table).where(table.c.cache_key == key).values(last_used_at=now))
+    metrics.incr(f"llm_cache.{'hit' if content is not None else 'miss'}.{call_site}")
+    return content
+
+def store(key, call_site, content):
+    config = current_app.config
+    table = LlmCache.__table__
+    now = datetime.utcnow()
+    values = dict(
+        call_site=call_site,
+        content=content,
+        expires_at=now + timedelta(seconds=config["LLM_CACHE_TTL_SECONDS"]),
+        last_used_at=now,
+    )
+    upsert(table, dict(cache_key=key), values)
+    evict(table, now, config["LLM_CACHE_MAX_ENTRIES"])
+
+def _cacheable(response):
+    # max_tokens で途中で切れた応答は保存しない
+    choice = response.choices[0]
+    return bool(choice.message.content) and choice.finish_reason != "length"
+
+def complete(client, call_site, **request):
+    """chat.completions.create を呼んで応答のテキストを返す（call_site がキャッシュ対象なら保存済みの応答を使う）"""
+    key = _cache_key(call_site, request)
+    if key:
+        content = load(key, call_site)
+        if content is not None:
+            return content
+    response = client.chat.completions.create(**request)
+    if key and _cacheable(response):
+        store(key, call_site, response.choices[0].message.content)
+    return response.choices[0].message.content
+
+async def complete_async(async_client, call_site, **request):
+    """complete の AsyncOpenAI 版（キャッシュの読み書きはイベントループを止めないよう別スレッドで行う）"""
+    key = _cache_key(call_site, request)
+    if key:
+        content = await asyncio.to_thread(load, key, call_site)
+        if content is not None:
+            return content
+    response = await async_client.chat.completions.create(**request)
+    if key and _cacheable(response):
+        await asyncio.to_thread(store, key, call_site, response.choices[0].message.content)
+    return response.choices[0].message.content
+
+def report_llm_cache():
+    """呼び出し元ごとのヒット率をログに出す"""
+    counters = metrics.snapshot("llm_cache.")["counters"]
+    sites = sorted({name.split(".", 2)[2] for name in counters})
+    for site in sites:
+        hit = counters.get(f"llm_cache.hit.{site}", 0)
+        miss = counters.get(f"llm_cache.miss.{site}", 0)
+        report_hit_rate(f"🧠 LLMキャッシュ（{site}）", hit, miss)
+    return counters
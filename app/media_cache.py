@@ -0,0 +1,41 @@
+# 📄 app/media_cache.py
+
+from sqlalchemy import select, delete
+from .db_cache import upsert
+from .models import db, WpMedia
+
+# WordPress にアップロード済みの画像の対応表（サイトURL + 画像URL / 内容の SHA-256 → メディアID）。
+# 投稿の再試行・即時投稿・同じ写真を使う兄弟投稿で、同じ画像を同じサイトへ何度もアップロードしない。
+# 投稿処理のセッションとは別の接続で読み書きし、呼び出し元の未コミットの変更を巻き込まない。
+
+def find_media(site_url, source_url=None, content_hash=None):
+    """アップロード済みならメディアIDを返す（画像URL → 内容のハッシュの順に照合）"""
+    table = WpMedia.__table__
+    with db.engine.connect() as conn:
+        if source_url:
+            row = conn.execute(
+                select(table.c.media_id).where(table.c.site_url == site_url, table.c.source_url == source_url)
+            ).first()
+            if row:
+                return row[0]
+        if content_hash:
+            row = conn.execute(
+                select(table.c.media_id)
+                .where(table.c.site_url == site_url, table.c.content_hash == content_hash)
+                .order_by(table.c.id.desc())
+                .limit(1)
+            ).first()
+            if row:
+                return row[0]
+    return None
+
+def remember_media(site_url, source_url, media_id, content_hash=None):
+    table = WpMedia.__table__
+    values = dict(media_id=media_id, content_hash=content_hash)
+    upsert(table, dict(site_url=site_url, source_url=source_url), values)
+
+def forget_media(site_url, media_id):
+    """WordPress 側で削除されたメディアの対応を消す"""
+    table = WpMedia.__table__
+    with db.engine.begin() as conn:
+        conn.execute(delete(table).where(table.c.site_url == site_url, table.c.media_id == media_id))
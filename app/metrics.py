@@ -0,0 +1,52 @@
+# 📄 app/metrics.py
+
+import time
+import threading
+from contextlib import contextmanager
+
+# プロセス内の簡易メトリクス（カウンタと所要時間）。ワーカー・スケジューラーのログ出力用。
+_lock = threading.Lock()
+_counters = {}
+_timings = {}  # name -> {"count", "total", "max"}
+
+def incr(name, value=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+def observe(name, seconds):
+    with _lock:
+        stat = _timings.setdefault(name, {"count": 0, "total": 0.0, "max": 0.0})
+        stat["count"] += 1
+        stat["total"] += seconds
+        stat["max"] = max(stat["max"], seconds)
+
+@contextmanager
+def timer(name):
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        observe(name, time.monotonic() - started)
+
+def snapshot(prefix=""):
+    """prefix に一致するメトリクスのコピーを返す"""
+    with _lock:
+        counters = {k: v for k, v in _counters.items() if k.startswith(prefix)}
+        timings = {k: dict(v) for k, v in _timings.items() if k.startswith(prefix)}
+    return {"counters": counters, "timings": timings}
+
+def reset(prefix=""):
+    with _lock:
+        for store in (_counters, _timings):
+            for key in [k for k in store if k.startswith(prefix)]:
+                del store[key]
+
+def report(prefix=""):
+    """prefix に一致するメトリクスをログに出力する"""
+    data = snapshot(prefix)
+    for name, value in sorted(data["counters"].items()):
+        print(f"📈 {name}: {value}")
+    for name, stat in sorted(data["timings"].items()):
+        avg = stat["total"] / stat["count"] if stat["count"] else 0
+        print(f"⏱ {name}: {stat['count']}回 平均 {avg:.2f}s / 最大 {stat['max']:.2f}s / 合計 {stat['total']:.1f}s")
+    return data
@@ -40,7 +40,7 @@ class Site(db.Model):
     wp_username = db.Column(db.String(120), nullable=False)
     wp_app_password = db.Column(db.String(255), nullable=False)
 
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
 
     articles = db.relationship('Article', backref='site', lazy=True)
     scheduled_posts = db.relationship('ScheduledPost', backref='site', lazy=True)
@@ -62,7 +62,7 @@ class Article(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     images = db.Column(db.JSON, nullable=True)
 
-    site_id = db.Column(db.Integer, db.ForeignKey('sites.id'), nullable=False)
+    site_id = db.Column(db.Integer, db.ForeignKey('sites.id'), nullable=False, index=True)
 
     def __repr__(self):
         return f'<Article {self.title}>'
@@ -72,6 +72,24 @@ class Article(db.Model):
 # ---------------------
 class ScheduledPost(db.Model):
     __tablename__ = 'scheduled_posts'
+    __table_args__ = (
+        # スケジューラー・ワーカーのポーリング（status で絞り、投稿予定時刻順に並べる）
+        db.Index("ix_scheduled_posts_status_scheduled_time", "status", "scheduled_time"),
+        # 投稿ログ画面（サイト・ユーザー・ステータスで絞り、登録日時順）。site_id の外部キーも兼ねる
+        db.Index("ix_scheduled_posts_site_user_status", "site_id", "user_id", "status", "created_at"),
+        # ユーザーごとのキュー深さ・停止中ユーザーの除外。user_id の外部キーも兼ねる
+        db.Index("ix_scheduled_posts_user_status", "user_id", "status"),
+        # 確保中の投稿だけ（ハートビート・リーパー）。未確保の行は索引に入れない
+        db.Index(
+            "ix_scheduled_posts_claimed", "claimed_by", "lease_expires_at",
+            postgresql_where=db.text("claimed_by IS NOT NULL"), sqlite_where=db.text("claimed_by IS NOT NULL"),
+        ),
+        # Batch API で生成中の投稿だけ
+        db.Index(
+            "ix_scheduled_posts_batch_id", "batch_id",
+            postgresql_where=db.text("batch_id IS NOT NULL"), sqlite_where=db.text("batch_id IS NOT NULL"),
+        ),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     genre = db.Column(db.String(100), nullable=True)
@@ -86,6 +104,18 @@ class ScheduledPost(db.Model):
     # 🔹 プロンプト内容も保存
     prompt_title = db.Column(db.Text, nullable=True)
     prompt_body = db.Column(db.Text, nullable=True)
+    generation_mode = db.Column(db.String(20), default="standard", nullable=False)  # テンプレートから引き継ぐ生成方式
+
+    # 🔹 ワーカーによる確保（複数ワーカーで同じ投稿を二重処理しないため）
+    claimed_by = db.Column(db.String(120), nullable=True)  # 確保中のワーカーID（None=未確保）
+    claimed_at = db.Column(db.DateTime, nullable=True)
+    lease_expires_at = db.Column(db.DateTime, nullable=True)  # ハートビートで延長、期限切れはリーパーが回収
+    attempts = db.Column(db.Integer, default=0, nullable=False)  # リーパーによる再キュー回数（生成・投稿の各フェーズで数え直す）
+    publish_attempts = db.Column(db.Integer, default=0, nullable=False)  # 一時的な投稿エラーによる再試行回数
+    next_attempt_at = db.Column(db.DateTime, nullable=True)  # 一時的な投稿エラー後、次に投稿を試す時刻（UTC）
+    batch_id = db.Column(db.Integer, db.ForeignKey('generation_batches.id'), nullable=True)  # Batch API で生成中のバッチ
+    wp_post_id = db.Column(db.Integer, nullable=True)  # WordPress 側の投稿ID（予約投稿・投稿済み）
+    wp_synced_at = db.Column(db.DateTime, nullable=True)  # WordPress に最後に送った日時
 
     # WordPress接続情報
     site_url = db.Column(db.String(255), nullable=False)
@@ -109,13 +139,178 @@ class PromptTemplate(db.Model):
     genre = db.Column(db.String(100), nullable=False)
     title_prompt = db.Column(db.Text, nullable=False)
     body_prompt = db.Column(db.Text, nullable=False)
+    # 本文の生成方式: standard（1回の生成）/ outline（見出し構成→セクション並列生成）
+    #                 structured（タイトル・本文・画像キーワードをJSONで一括生成）
+    generation_mode = db.Column(db.String(20), default="standard", nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
 
     def __repr__(self):
         return f"<PromptTemplate {self.genre}>"
 
+# ---------------------
+# Batch API による一括生成ジョブ
+# ---------------------
+class GenerationBatch(db.Model):
+    __tablename__ = "generation_batches"
+
+    id = db.Column(db.Integer, primary_key=True)
+    provider_batch_id = db.Column(db.String(100), nullable=True)  # OpenAI 側のバッチID
+    input_file_id = db.Column(db.String(100), nullable=True)
+    output_file_id = db.Column(db.String(100), nullable=True)
+    error_file_id = db.Column(db.String(100), nullable=True)
+    # preparing → validating / in_progress / finalizing → completed → applying → applied
+    # （failed / expired / cancelled は未処理の投稿を通常生成に戻す）
+    status = db.Column(db.String(30), default="preparing", nullable=False)
+    post_count = db.Column(db.Integer, default=0, nullable=False)
+    succeeded_count = db.Column(db.Integer, default=0, nullable=False)
+    failed_count = db.Column(db.Integer, default=0, nullable=False)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    submitted_at = db.Column(db.DateTime, nullable=True)
+    completed_at = db.Column(db.DateTime, nullable=True)
+    applying_until = db.Column(db.DateTime, nullable=True)  # 反映中のリース（過ぎていれば落ちたとみなして再開する）
+
+    scheduled_posts = db.relationship('ScheduledPost', backref='batch', lazy=True)
+
+    def __repr__(self):
+        return f"<GenerationBatch {self.id} {self.status}>"
+
+# ---------------------
+# ユーザー操作ジョブ（即時投稿・再生成。一括生成より優先して処理）
+# ---------------------
+class PriorityJob(db.Model):
+    __tablename__ = "priority_jobs"
+    __table_args__ = (
+        db.Index("ix_priority_jobs_user_created_at", "user_id", "created_at"),  # 投稿ログ画面の直近ジョブ
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    post_id = db.Column(db.Integer, db.ForeignKey('scheduled_posts.id', ondelete='CASCADE'), nullable=False, index=True)
+    action = db.Column(db.String(30), nullable=False)  # publish_now / regenerate / regenerate_title / regenerate_body
+    status = db.Column(db.String(20), default="queued", nullable=False, index=True)  # queued → running → succeeded / failed
+    error = db.Column(db.Text, nullable=True)
+    claimed_by = db.Column(db.String(100), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<PriorityJob {self.id} {self.action} {self.status}>"
+
+# ---------------------
+# スケジューラーのリーダー選出用リース（稼働中のスケジューラーを1つに限定）
+# ---------------------
+class SchedulerLease(db.Model):
+    __tablename__ = "scheduler_leases"
+
+    name = db.Column(db.String(50), primary_key=True)
+    holder = db.Column(db.String(100), nullable=True)  # リーダーのワーカーID（ホスト名:PID）
+    acquired_at = db.Column(db.DateTime, nullable=True)
+    expires_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<SchedulerLease {self.name} {self.holder}>"
+
+# ---------------------
+# WordPress にアップロード済みの画像（同じ画像を同じサイトへ再アップロードしない）
+# ---------------------
+class WpMedia(db.Model):
+    __tablename__ = "wp_media"
+    __table_args__ = (
+        db.UniqueConstraint("site_url", "source_url", name="uq_wp_media_site_source"),
+        db.Index("ix_wp_media_site_hash", "site_url", "content_hash"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    site_url = db.Column(db.String(255), nullable=False)  # 末尾 / 付きのサイトURL
+    source_url = db.Column(db.String(1000), nullable=False)  # 取得元の画像URL
+    content_hash = db.Column(db.String(64), nullable=True)  # 画像の SHA-256（URLが違う同じ画像の判定用）
+    media_id = db.Column(db.Integer, nullable=False)  # WordPress のメディアID
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<WpMedia {self.site_url} {self.media_id}>"
+
+# ---------------------
+# Pixabay の検索結果キャッシュ（全ワーカーで共有）
+# ---------------------
+class ImageSearchCache(db.Model):
+    __tablename__ = "image_search_cache"
+
+    cache_key = db.Column(db.String(64), primary_key=True)  # 検索語 + 検索条件の SHA-256
+    query = db.Column(db.String(100), nullable=False)  # clean_query 後の検索語
+    image_urls = db.Column(db.Text, nullable=False)  # 画像URLのJSON配列
+    cursor = db.Column(db.Integer, default=0, nullable=False)  # 次に返す画像の位置（兄弟投稿で順番に使う）
+    expires_at = db.Column(db.DateTime, nullable=False)
+    last_used_at = db.Column(db.DateTime, nullable=False, index=True)  # 上限を超えたら古いものから削除
+
+    def __repr__(self):
+        return f"<ImageSearchCache {self.query}>"
+
+# ---------------------
+# LLM で求めた画像キーワード（辞書で変換できなかったタイトル用、タイトルごとに再利用）
+# ---------------------
+class ImageKeyword(db.Model):
+    __tablename__ = "image_keywords"
+
+    title_hash = db.Column(db.String(64), primary_key=True)  # 正規化したタイトルの SHA-256
+    title = db.Column(db.String(255), nullable=False)
+    keywords = db.Column(db.String(100), nullable=False)  # Pixabay 用の英語キーワード
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<ImageKeyword {self.keywords}>"
+
+# ---------------------
+# OpenAI の応答キャッシュ（同じリクエストの応答を再利用、全ワーカーで共有）
+# ---------------------
+class LlmCache(db.Model):
+    __tablename__ = "llm_cache"
+
+    cache_key = db.Column(db.String(64), primary_key=True)  # モデル・メッセージ・temperature 等の SHA-256
+    call_site = db.Column(db.String(50), nullable=False)  # 呼び出し元（image_keyword / outline / section 等）
+    content = db.Column(db.Text, nullable=False)  # 応答のテキスト
+    expires_at = db.Column(db.DateTime, nullable=False)
+    last_used_at = db.Column(db.DateTime, nullable=False, index=True)  # 上限を超えたら古いものから削除
+
+    def __repr__(self):
+        return f"<LlmCache {self.call_site} {self.cache_key[:8]}>"
+
+# ---------------------
+# サイト（ホスト）ごとの投稿サーキットブレーカー
+# ---------------------
+class SiteCircuit(db.Model):
+    __tablename__ = "site_circuits"
+
+    host = db.Column(db.String(255), primary_key=True)
+    state = db.Column(db.String(20), default="closed", nullable=False)  # closed / open / half_open
+    failure_count = db.Column(db.Integer, default=0, nullable=False)  # 連続した一時的エラーの回数
+    trips = db.Column(db.Integer, default=0, nullable=False)  # 連続して open になった回数（停止時間の延長に使う）
+    opened_at = db.Column(db.DateTime, nullable=True)
+    retry_at = db.Column(db.DateTime, nullable=True)  # open の間、次に試験投稿してよい時刻（UTC）
+    last_error = db.Column(db.Text, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<SiteCircuit {self.host} {self.state}>"
+
+# ---------------------
+# レート制限バケット（OpenAI / Pixabay の呼び出し枠をプロセス間で共有）
+# ---------------------
+class RateLimitBucket(db.Model):
+    __tablename__ = "rate_limit_buckets"
+    name = db.Column(db.String(100), primary_key=True)  # 例: openai:requests
+    tokens = db.Column(db.Float, nullable=True)  # 残量
+    updated_at = db.Column(db.Float, nullable=True)  # 残量を計算したUNIX時刻
+    blocked_until = db.Column(db.Float, nullable=True)  # 429 等で待機中の期限（UNIX時刻）
+    capacity = db.Column(db.Float, nullable=True)  # レスポンスヘッダーから得た1分あたりの上限
+
+    def __repr__(self):
+        return f"<RateLimitBucket {self.name} tokens={self.tokens}>"
+
 # ---------------------
 # 記事生成フラグ管理モデル
 # ---------------------
@@ -0,0 +1,233 @@
+# 📄 app/priority_jobs.py
+
+import time
+import threading
+import traceback
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import select, update
+from .models import db, ScheduledPost, PriorityJob
+from .image_search import search_images
+from .wordpress_post import push_to_wordpress
+from .job_queue import get_worker_id, is_postgres, claim_posts, clear_claim, release_claim, mark_generated
+from .llm_cache import refreshing
+from .article_generator import (
+    create_openai_client,
+    has_generated_title,
+    generate_title,
+    generate_body,
+    generate_image_keyword_from_title,
+)
+
+# 画面から操作された即時投稿・再生成は、HTTPリクエスト内では実行せずジョブとして登録して即座に返す。
+# ワーカープロセスの優先レーン（start_priority_lane）が一括生成とは別スレッドで先に処理し、
+# 画面は /jobs/<id> をポーリングして結果を表示する。
+
+ACTION_LABELS = {
+    "publish_now": "即時投稿",
+    "regenerate": "記事の再生成",
+    "regenerate_title": "タイトルの再生成",
+    "regenerate_body": "本文の再生成",
+    "wp_sync": "WordPressの予約投稿を更新",
+}
+# 再生成ジョブごとに作り直す部分
+REGENERATE_PARTS = {
+    "regenerate": ("title", "body", "image"),
+    "regenerate_title": ("title",),
+    "regenerate_body": ("body",),
+}
+ACTIVE_STATUSES = ("queued", "running")
+
+def enqueue_job(post, action, user_id):
+    """ジョブを登録する。同じ投稿・同じ操作のジョブが待機中・実行中ならそれを返す"""
+    job = PriorityJob.query.filter(
+        PriorityJob.post_id == post.id,
+        PriorityJob.action == action,
+        PriorityJob.status.in_(ACTIVE_STATUSES),
+    ).first()
+    if job:
+        return job
+    job = PriorityJob(user_id=user_id, post_id=post.id, action=action)
+    db.session.add(job)
+    db.session.commit()
+    print(f"⚡ 優先ジョブ登録: #{job.id} {ACTION_LABELS[action]}（post_id={post.id}）")
+    return job
+
+def job_to_dict(job):
+    return {
+        "id": job.id,
+        "post_id": job.post_id,
+        "action": job.action,
+        "label": ACTION_LABELS.get(job.action, job.action),
+        "status": job.status,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+def claim_jobs(limit=1, worker_id=None):
+    """待機中のジョブを登録順に確保する（claim_posts と同じ単一UPDATEでの確保）"""
+    worker_id = worker_id or get_worker_id()
+    started_at = datetime.utcnow()
+    candidates = (
+        select(PriorityJob.id)
+        .where(PriorityJob.status == "queued")
+        .order_by(PriorityJob.id)
+        .limit(limit)
+    )
+    if is_postgres():
+        candidates = candidates.with_for_update(skip_locked=True)
+
+    db.session.execute(
+        update(PriorityJob)
+        .where(PriorityJob.id.in_(candidates), PriorityJob.status == "queued")
+        .values(status="running", claimed_by=worker_id, started_at=started_at)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return (
+        PriorityJob.query
+        .filter(PriorityJob.claimed_by == worker_id, PriorityJob.started_at == started_at)
+        .order_by(PriorityJob.id)
+        .all()
+    )
+
+def fail_stale_jobs():
+    """PRIORITY_JOB_TIMEOUT_SECONDS を過ぎても実行中のジョブ（ワーカーが落ちたもの）を失敗にする"""
+    deadline = datetime.utcnow() - timedelta(seconds=current_app.config["PRIORITY_JOB_TIMEOUT_SECONDS"])
+    result = db.session.execute(
+        update(PriorityJob)
+        .where(PriorityJob.status == "running", PriorityJob.started_at < deadline)
+        .values(status="failed", error="タイムアウトしました", finished_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return result.rowcount
+
+def _send_to_wordpress(post, scheduled_time):
+    # 予約投稿として送信済み（wp_post_id あり）なら新規作成せずに更新する
+    # 失敗時は WordPressError がそのままジョブのエラーになる
+    result = push_to_wordpress(
+        site_url=post.site_url,
+        wp_username=post.username,
+        wp_app_password=post.app_password,
+        title=post.title,
+        content=post.body,
+        images=[post.featured_image] if post.featured_image else [],
+        scheduled_time=scheduled_time,
+        wp_post_id=post.wp_post_id,
+    )
+    post.wp_post_id = result["id"]
+    post.wp_synced_at = datetime.utcnow()
+    return result
+
+def _publish_now(post):
+    _send_to_wordpress(post, None)
+    post.status = "投稿済み"
+
+def _sync_wordpress(post):
+    """編集内容・投稿予定時刻を WordPress の予約投稿に反映する"""
+    if not post.wp_post_id:
+        raise ValueError("WordPressに送信されていない投稿です")
+    result = _send_to_wordpress(post, post.scheduled_time)
+    post.status = "予約済み" if result["status"] == "future" else "投稿済み"
+
+def _regenerate(post, client, parts):
+    if not post.prompt_title or not post.prompt_body:
+        raise ValueError("プロンプトが設定されていません")
+
+    # 作り直しの指示なので LLM の応答キャッシュは使わない
+    with refreshing():
+        # 本文だけの再生成でもタイトル未生成ならタイトルから作る
+        title = post.title
+        if "title" in parts or not has_generated_title(post):
+            title = generate_title(client, post.prompt_title, post.keyword)
+            print("✅ タイトル生成成功:", title)
+        if "body" in parts:
+            post.body = generate_body(
+                client, post.prompt_body, title, post.generation_mode, current_app.config["OUTLINE_SECTION_CONCURRENCY"]
+            )
+            print("✅ 本文生成成功")
+        if "image" in parts:
+            image_urls = search_images(generate_image_keyword_from_title(title, client), num_images=1)
+            post.featured_image = image_urls[0] if image_urls else None
+    post.title = title
+
+    # タイトル・本文がそろえば投稿待ちに戻す（生成失敗・投稿失敗からの復帰）。
+    # 失敗までに使った再試行回数と再試行の待ち時間は持ち越さない
+    if post.body:
+        mark_generated(post)
+        post.publish_attempts = 0
+        post.next_attempt_at = None
+
+def run_job(job, client):
+    """確保済みのジョブを実行する。対象の投稿も確保し、一括処理と同時に触らないようにする"""
+    job_id = job.id
+    posts = claim_posts([ScheduledPost.id == job.post_id, ScheduledPost.status != "投稿済み"], [ScheduledPost.id])
+    if not posts:
+        job.status = "failed"
+        job.error = "投稿が見つからないか、投稿済み・他の処理中です"
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        return False
+
+    post = posts[0]
+    try:
+        print(f"⚡ 優先ジョブ実行: #{job_id} {ACTION_LABELS.get(job.action, job.action)}（post_id={post.id}）")
+        if job.action == "publish_now":
+            _publish_now(post)
+        elif job.action == "wp_sync":
+            _sync_wordpress(post)
+        else:
+            _regenerate(post, client, REGENERATE_PARTS[job.action])
+        clear_claim(post)
+        job.status = "succeeded"
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        print(f"✅ 優先ジョブ完了: #{job_id}")
+        return True
+    except Exception as e:
+        print(f"❌ 優先ジョブ失敗: #{job_id} → {e}")
+        traceback.print_exc()
+        db.session.rollback()
+        release_claim(post.id)
+        job = db.session.get(PriorityJob, job_id)
+        job.status = "failed"
+        job.error = str(e)
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        return False
+
+def process_priority_jobs(client):
+    """待機中のジョブを1件処理する。戻り値: 処理したか"""
+    jobs = claim_jobs(limit=1)
+    for job in jobs:
+        run_job(job, client)
+    return bool(jobs)
+
+def start_priority_lane(app):
+    """
+    PRIORITY_LANE_THREADS 本のデーモンスレッドで優先ジョブを処理する。一括生成のループとは独立して
+    PRIORITY_POLL_SECONDS ごとに確認するので、一括生成が長引いてもユーザー操作は待たされない。
+    """
+    interval = app.config["PRIORITY_POLL_SECONDS"]
+
+    def lane():
+        client = create_openai_client()
+        while True:
+            try:
+                with app.app_context():
+                    fail_stale_jobs()
+                    if process_priority_jobs(client):
+                        continue  # 続けて次のジョブを確認
+            except Exception as e:
+                print(f"❌ 優先レーンエラー: {e}")
+                traceback.print_exc()
+            time.sleep(interval)
+
+    threads = []
+    for index in range(app.config["PRIORITY_LANE_THREADS"]):
+        thread = threading.Thread(target=lane, name=f"priority-lane-{index}", daemon=True)
+        thread.start()
+        threads.append(thread)
+    return threads
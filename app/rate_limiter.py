@@ -0,0 +1,425 @@
+# 📄 app/rate_limiter.py
+
+import os
+import json
+import time
+import random
+import asyncio
+import threading
+from contextlib import contextmanager
+import httpx
+from flask import current_app, has_app_context
+from sqlalchemy import select, insert, update
+from sqlalchemy.exc import IntegrityError
+from .extensions import db
+from .models import RateLimitBucket
+
+try:
+    import fcntl
+except ImportError:  # Windows（ローカル開発）ではファイルロックが使えないためプロセス内制限のみ
+    fcntl = None
+
+# プロバイダごとのトークンバケット（容量は「1分あたり」の値、毎秒 容量/60 ずつ回復）
+#   openai:requests  … OPENAI_RPM
+#   openai:tokens    … OPENAI_TPM（プロンプト文字数 + max_tokens で概算）
+#   pixabay:requests … PIXABAY_RPM
+BUCKET_CONFIG_KEYS = {
+    "openai:requests": "OPENAI_RPM",
+    "openai:tokens": "OPENAI_TPM",
+    "pixabay:requests": "PIXABAY_RPM",
+}
+
+_state = {"app": None, "store": None}
+
+def init_app(app):
+    _state["app"] = app
+    _state["store"] = None
+
+@contextmanager
+def _app_context():
+    # スレッドプール等、アプリコンテキストを持たない呼び出し元からも使えるようにする
+    if has_app_context() or _state["app"] is None:
+        yield
+    else:
+        with _state["app"].app_context():
+            yield
+
+# ---------------------
+# バケット状態の保存先
+# ---------------------
+class MemoryBucketStore:
+    """プロセス内のみで共有（ファイルロックが使えない環境用）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = {}
+
+    def update(self, name, fn):
+        with self._lock:
+            state, result = fn(self._data.get(name) or {})
+            self._data[name] = state
+            return result
+
+class FileBucketStore:
+    """同一ホストの全プロセスで共有（SQLite構成用）。ロックファイルで排他してJSONを読み書きする。"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def update(self, name, fn):
+        with open(self.path + ".lock", "a+") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                try:
+                    with open(self.path, encoding="utf-8") as f:
+                        data = json.load(f)
+                except (FileNotFoundError, ValueError):
+                    data = {}
+                state, result = fn(data.get(name) or {})
+                data[name] = state
+                tmp_path = f"{self.path}.{os.getpid()}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(data, f)
+                os.replace(tmp_path, self.path)
+                return result
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+class DatabaseBucketStore:
+    """全ノードで共有（PostgreSQL構成用）。rate_limit_buckets の行を SELECT ... FOR UPDATE で排他する。"""
+
+    def __init__(self):
+        self._known = set()
+
+    def _ensure_row(self, name):
+        if name in self._known:
+            return
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(insert(RateLimitBucket.__table__).values(name=name))
+        except IntegrityError:
+            pass  # 他プロセスが先に作成済み
+        self._known.add(name)
+
+    def update(self, name, fn):
+        table = RateLimitBucket.__table__
+        with _app_context():
+            self._ensure_row(name)
+            with db.engine.begin() as conn:
+                stmt = select(table).where(table.c.name == name)
+                if db.engine.dialect.name == "postgresql":
+                    stmt = stmt.with_for_update()
+                row = conn.execute(stmt).mappings().first()
+                current = {
+                    "tokens": row["tokens"],
+                    "updated_at": row["updated_at"],
+                    "blocked_until": row["blocked_until"],
+                    "capacity": row["capacity"],
+                }
+                state, result = fn({k: v for k, v in current.items() if v is not None})
+                conn.execute(update(table).where(table.c.name == name).values(
+                    tokens=state.get("tokens"),
+                    updated_at=state.get("updated_at"),
+                    blocked_until=state.get("blocked_until"),
+                    capacity=state.get("capacity"),
+                ))
+                return result
+
+def get_store():
+    if _state["store"] is None:
+        with _app_context():
+            backend = current_app.config["RATE_LIMIT_BACKEND"]
+            if backend == "auto":
+                backend = "db" if db.engine.dialect.name == "postgresql" else "file"
+            if backend == "file" and fcntl is None:
+                backend = "memory"
+
+            if backend == "db":
+                _state["store"] = DatabaseBucketStore()
+            elif backend == "file":
+                _state["store"] = FileBucketStore(current_app.config["RATE_LIMIT_FILE"])
+            else:
+                _state["store"] = MemoryBucketStore()
+            print(f"🚦 レート制限の共有方式: {backend}")
+    return _state["store"]
+
+# ---------------------
+# トークンバケット
+# ---------------------
+def _default_capacity(name):
+    with _app_context():
+        return float(current_app.config[BUCKET_CONFIG_KEYS[name]])
+
+def _refill(state, default_capacity, now):
+    capacity = state.get("capacity") or default_capacity
+    tokens = state.get("tokens", capacity)
+    updated_at = state.get("updated_at", now)
+    tokens = min(capacity, tokens + max(0.0, now - updated_at) * capacity / 60.0)
+    return dict(state, tokens=tokens, updated_at=now), capacity
+
+def try_acquire(name, amount=1):
+    """
+    バケットから amount を取り出す。取り出せた場合は 0、足りない場合は待つべき秒数を返す。
+    """
+    default_capacity = _default_capacity(name)
+
+    def take(state):
+        now = time.time()
+        state, capacity = _refill(state, default_capacity, now)
+        need = min(float(amount), capacity)  # 容量を超える要求は満タンで通す
+        blocked_until = state.get("blocked_until", 0)
+        if now < blocked_until:
+            return state, blocked_until - now
+        if state["tokens"] >= need:
+            state["tokens"] -= need
+            return state, 0.0
+        return state, (need - state["tokens"]) * 60.0 / capacity
+
+    return get_store().update(name, take)
+
+def acquire(name, amount=1):
+    """容量が空くまで待ってから取り出す（失敗させずに待機する）"""
+    while True:
+        wait = try_acquire(name, amount)
+        if not wait:
+            return
+        time.sleep(min(wait, 30))
+
+async def acquire_async(name, amount=1):
+    """acquire の async 版（バケットの読み書きはファイルロック・DBを使うので別スレッドで行う）"""
+    while True:
+        wait = await asyncio.to_thread(try_acquire, name, amount)
+        if not wait:
+            return
+        await asyncio.sleep(min(wait, 30))
+
+def sync_from_headers(name, limit=None, remaining=None, reset_seconds=None):
+    """
+    プロバイダが返したレート制限ヘッダーにバケットを合わせる。
+    - limit: 実際の上限（設定値より低ければこちらを容量にする）
+    - remaining: 残り回数（バケット残量がこれより多ければ切り詰める）
+    - remaining=0 のときは reset_seconds までブロック
+    """
+    if limit is None and remaining is None:
+        return
+    default_capacity = _default_capacity(name)
+
+    def adjust(state):
+        now = time.time()
+        if limit:
+            state = dict(state, capacity=min(float(limit), default_capacity))
+        state, _ = _refill(state, default_capacity, now)
+        if remaining is not None:
+            state["tokens"] = min(state["tokens"], float(remaining))
+            if remaining <= 0 and reset_seconds:
+                state["blocked_until"] = max(state.get("blocked_until", 0), now + reset_seconds)
+        return state, None
+
+    get_store().update(name, adjust)
+
+def block(name, seconds):
+    """429 を受けたバケットを seconds 秒止める"""
+    default_capacity = _default_capacity(name)
+
+    def stop(state):
+        now = time.time()
+        state, _ = _refill(state, default_capacity, now)
+        state["tokens"] = 0.0
+        state["blocked_until"] = max(state.get("blocked_until", 0), now + seconds)
+        return state, None
+
+    get_store().update(name, stop)
+    print(f"🚦 レート制限（{name}）: {seconds:.1f}秒待機")
+
+def parse_duration(value):
+    """'1s' / '6m0s' / '250ms' / '20' 形式の時間を秒に変換"""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    total = 0.0
+    number = ""
+    i = 0
+    while i < len(value):
+        ch = value[i]
+        if ch.isdigit() or ch == ".":
+            number += ch
+        elif value.startswith("ms", i):
+            total += float(number or 0) / 1000
+            number = ""
+            i += 1
+        elif ch in "hms":
+            total += float(number or 0) * {"h": 3600, "m": 60, "s": 1}[ch]
+            number = ""
+        i += 1
+    return total
+
+def _int_header(headers, key):
+    try:
+        return int(headers[key])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+def retry_after_seconds(headers, default=10.0):
+    return parse_duration(headers.get("retry-after")) or parse_duration(headers.get("x-ratelimit-reset")) or default
+
+# ---------------------
+# OpenAI（httpx トランスポートで全呼び出しに適用）
+# ---------------------
+def estimate_openai_tokens(request):
+    """リクエストの消費トークン数を概算（日本語はほぼ1文字1トークン + max_tokens）"""
+    try:
+        payload = json.loads(request.content or b"{}")
+    except (ValueError, httpx.RequestNotRead):
+        return 1  # ファイルアップロード等
+    if not isinstance(payload, dict):
+        return 1
+    prompt_chars = sum(len(str(m.get("content", ""))) for m in payload.get("messages", []))
+    return prompt_chars + int(payload.get("max_tokens") or 0)
+
+def observe_openai_response(response):
+    headers = response.headers
+    sync_from_headers(
+        "openai:requests",
+        limit=_int_header(headers, "x-ratelimit-limit-requests"),
+        remaining=_int_header(headers, "x-ratelimit-remaining-requests"),
+        reset_seconds=parse_duration(headers.get("x-ratelimit-reset-requests")),
+    )
+    sync_from_headers(
+        "openai:tokens",
+        limit=_int_header(headers, "x-ratelimit-limit-tokens"),
+        remaining=_int_header(headers, "x-ratelimit-remaining-tokens"),
+        reset_seconds=parse_duration(headers.get("x-ratelimit-reset-tokens")),
+    )
+    if response.status_code == 429:
+        block("openai:requests", retry_after_seconds(headers))
+
+def _is_transient(status_code):
+    # OpenAI SDK が再試行するのと同じ一時的なエラー（429 は別に数える）
+    return status_code in (408, 409) or status_code >= 500
+
+class _RetryBudget:
+    """
+    1リクエスト分の再送回数。429 は RATE_LIMIT_MAX_RETRIES 回（待機はバケット側）、
+    5xx・タイムアウト・接続エラーは OPENAI_MAX_RETRIES 回（指数バックオフ）まで再送する。
+    """
+
+    def __init__(self, max_retries=None):
+        with _app_context():
+            config = current_app.config
+            self.rate_limited_left = max_retries if max_retries is not None else config["RATE_LIMIT_MAX_RETRIES"]
+            self.errors_left = config["OPENAI_MAX_RETRIES"]
+        self.errors = 0
+
+    def after_response(self, status_code):
+        """再送するなら待機秒数（429 はバケットが止まるので 0）、しないなら None"""
+        if status_code == 429:
+            if self.rate_limited_left <= 0:
+                return None
+            self.rate_limited_left -= 1
+            return 0.0
+        if _is_transient(status_code):
+            return self.after_error()
+        return None
+
+    def after_error(self):
+        if self.errors_left <= 0:
+            return None
+        self.errors_left -= 1
+        self.errors += 1
+        return min(0.5 * 2 ** (self.errors - 1), 8.0) * random.uniform(0.75, 1.0)
+
+class RateLimitedTransport(httpx.BaseTransport):
+    """
+    OpenAI へのリクエスト前にバケットから取り出し、429・一時的なエラーは待機して再送する
+    （OpenAI クライアントは max_retries=0 にして、再送はここだけで行う）。
+    """
+
+    def __init__(self, transport=None, max_retries=None):
+        self._transport = transport or httpx.HTTPTransport()
+        self._max_retries = max_retries
+
+    def handle_request(self, request):
+        budget = _RetryBudget(self._max_retries)
+        tokens = estimate_openai_tokens(request)
+        while True:
+            acquire("openai:requests")
+            acquire("openai:tokens", tokens)
+            try:
+                response = self._transport.handle_request(request)
+            except httpx.TransportError as e:
+                delay = budget.after_error()
+                if delay is None:
+                    raise
+                print(f"🔁 OpenAI 通信エラー → {delay:.1f}秒後に再送: {e}")
+                time.sleep(delay)
+                continue
+            observe_openai_response(response)
+            delay = budget.after_response(response.status_code)
+            if delay is None:
+                return response
+            response.read()
+            response.close()
+            if delay:
+                print(f"🔁 OpenAI {response.status_code} → {delay:.1f}秒後に再送")
+                time.sleep(delay)
+
+    def close(self):
+        self._transport.close()
+
+class AsyncRateLimitedTransport(httpx.AsyncBaseTransport):
+    """RateLimitedTransport の AsyncOpenAI 版（待機は asyncio.sleep）"""
+
+    def __init__(self, transport=None, max_retries=None):
+        self._transport = transport or httpx.AsyncHTTPTransport()
+        self._max_retries = max_retries
+
+    async def handle_async_request(self, request):
+        budget = _RetryBudget(self._max_retries)
+        tokens = estimate_openai_tokens(request)
+        while True:
+            await acquire_async("openai:requests")
+            await acquire_async("openai:tokens", tokens)
+            try:
+                response = await self._transport.handle_async_request(request)
+            except httpx.TransportError as e:
+                delay = budget.after_error()
+                if delay is None:
+                    raise
+                print(f"🔁 OpenAI 通信エラー → {delay:.1f}秒後に再送: {e}")
+                await asyncio.sleep(delay)
+                continue
+            # バケットの更新はファイルロック・DBを使うのでイベントループを止めないよう別スレッドで行う
+            await asyncio.to_thread(observe_openai_response, response)
+            delay = budget.after_response(response.status_code)
+            if delay is None:
+                return response
+            await response.aread()
+            await response.aclose()
+            if delay:
+                print(f"🔁 OpenAI {response.status_code} → {delay:.1f}秒後に再送")
+                await asyncio.sleep(delay)
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+# ---------------------
+# Pixabay
+# ---------------------
+def observe_pixabay_response(response):
+    """Pixabay の X-RateLimit-* ヘッダーを反映。429 なら待機秒数を返す"""
+    headers = response.headers
+    sync_from_headers(
+        "pixabay:requests",
+        limit=_int_header(headers, "X-RateLimit-Limit"),
+        remaining=_int_header(headers, "X-RateLimit-Remaining"),
+        reset_seconds=parse_duration(headers.get("X-RateLimit-Reset")),
+    )
+    if response.status_code == 429:
+        seconds = retry_after_seconds(headers, default=60.0)
+        block("pixabay:requests", seconds)
+        return seconds
+    return None
@@ -1,10 +1,13 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, jsonify
 from flask_login import login_required, current_user
-from .models import db, Article, Site, ScheduledPost, PromptTemplate, GenerationControl
+from .models import db, Article, Site, ScheduledPost, PromptTemplate, GenerationControl, PriorityJob, SiteCircuit
 from datetime import datetime, timedelta, time as dtime
 import pytz
 import random
-from .wordpress_post import post_to_wordpress
+from .job_queue import find_at_risk_posts
+from .fair_share import queue_depths
+from .circuit_breaker import site_host
+from .priority_jobs import ACTION_LABELS, enqueue_job, job_to_dict
 from .forms import AddSiteForm, PromptTemplateForm, AutoPostForm
 
 routes_bp = Blueprint('routes', __name__)
@@ -25,7 +28,31 @@ def admin_log(site_id):
         query = query.filter_by(status=filter_status)
     posts = query.order_by(ScheduledPost.created_at.desc()).all()
     jst = pytz.timezone("Asia/Tokyo")
-    return render_template('admin_log.html', posts=posts, jst=jst, site_id=site_id, filter_status=filter_status)
+    # 投稿予定時刻までに生成が間に合わない恐れのあるこのサイトの投稿（post_id → 生成完了見込み）
+    at_risk = {
+        post.id: finish_at
+        for post, finish_at in find_at_risk_posts(filters=[ScheduledPost.site_id == site_id, ScheduledPost.user_id == current_user.id])
+    }
+    # このユーザー（FAIR_SHARE_MODE=site ならこのサイト）の生成キューの深さ
+    tenant = site_id if current_app.config["FAIR_SHARE_MODE"] == "site" else current_user.id
+    queue_depth = queue_depths([ScheduledPost.user_id == current_user.id]).get(tenant, {"pending": 0, "in_flight": 0})
+    # 直近24時間の即時投稿・再生成ジョブ（投稿ごとに最新の1件）
+    jobs = {}
+    recent_jobs = (
+        PriorityJob.query
+        .filter(PriorityJob.user_id == current_user.id, PriorityJob.created_at >= datetime.utcnow() - timedelta(days=1))
+        .order_by(PriorityJob.id)
+        .all()
+    )
+    for job in recent_jobs:
+        jobs[job.post_id] = job
+    # このサイトへの投稿のサーキットブレーカー（停止中・試験投稿中のときだけ表示）
+    site = Site.query.filter_by(id=site_id, user_id=current_user.id).first()
+    circuit = db.session.get(SiteCircuit, site_host(site.site_url)) if site else None
+    if circuit and circuit.state == "closed":
+        circuit = None
+    return render_template('admin_log.html', posts=posts, jst=jst, utc=pytz.utc, site_id=site_id, filter_status=filter_status,
+                           at_risk=at_risk, queue_depth=queue_depth, jobs=jobs, action_labels=ACTION_LABELS, circuit=circuit)
 
 @routes_bp.route('/preview_post/<int:post_id>', endpoint='preview_scheduled_post')
 @login_required
@@ -49,12 +76,14 @@ def auto_post():
 
     title_prompt = ''
     body_prompt = ''
+    generation_mode = "standard"
 
     if form.template_id.data:
         selected_template = PromptTemplate.query.get(form.template_id.data)
         if selected_template:
             title_prompt = selected_template.title_prompt
             body_prompt = selected_template.body_prompt
+            generation_mode = selected_template.generation_mode
 
     if form.validate_on_submit():
         # 入力されたデータを取得
@@ -124,7 +153,8 @@ def auto_post():
                     site_id=site.id,
                     genre="",  # 使用しないため空文字
                     prompt_title=title_prompt,
-                    prompt_body=body_prompt
+                    prompt_body=body_prompt,
+                    generation_mode=generation_mode
                 )
                 db.session.add(post)
 
@@ -145,12 +175,16 @@ def edit_scheduled_post(post_id):
         return redirect(url_for('routes.dashboard'))
     if request.method == 'POST':
         post.title = request.form['title']
-        post.body = request.form['body']
+        post.body = request.form.get('content', request.form.get('body'))
         scheduled_time = request.form.get('scheduled_time')
         if scheduled_time:
             post.scheduled_time = datetime.strptime(scheduled_time, '%Y-%m-%d %H:%M')
         db.session.commit()
         flash('記事を更新しました')
+        # WordPress に予約投稿済みなら編集内容を反映する
+        if post.wp_post_id and post.status == '予約済み':
+            job = enqueue_job(post, "wp_sync", current_user.id)
+            flash(f"{ACTION_LABELS[job.action]}を受け付けました（ジョブ #{job.id}）", 'success')
         return redirect(url_for('routes.admin_log', site_id=post.site_id))
     return render_template('edit_article.html', post=post)
 
@@ -166,6 +200,13 @@ def delete_scheduled_post(post_id):
     flash('記事を削除しました')
     return redirect(url_for('routes.admin_log', site_id=post.site_id))
 
+def job_accepted_response(job, post):
+    """ジョブ登録後の応答（JSONを求められた場合はジョブIDを返し、画面からの操作は投稿ログに戻す）"""
+    if request.accept_mimetypes.best == "application/json":
+        return jsonify(job_to_dict(job)), 202
+    flash(f"{ACTION_LABELS[job.action]}を受け付けました（ジョブ #{job.id}）", 'success')
+    return redirect(url_for('routes.admin_log', site_id=post.site_id))
+
 @routes_bp.route('/publish_now/<int:post_id>')
 @login_required
 def publish_scheduled_now(post_id):
@@ -173,22 +214,32 @@ def publish_scheduled_now(post_id):
     if post.user_id != current_user.id:
         return "権限がありません", 403
 
-    success = post_to_wordpress(
-        site_url=post.site_url,
-        wp_username=post.username,
-        wp_app_password=post.app_password,
-        title=post.title,
-        content=post.body,
-        images=[post.featured_image] if post.featured_image else []
-    )
-    if success:
-        post.status = '投稿済み'
-        db.session.commit()
-        flash('投稿が完了しました', 'success')
-    else:
-        flash('投稿に失敗しました', 'error')
+    # WordPressへの投稿はワーカーの優先レーンで実行（リクエストはすぐ返す）
+    job = enqueue_job(post, "publish_now", current_user.id)
+    return job_accepted_response(job, post)
 
-    return redirect(url_for('routes.admin_log', site_id=post.site_id))
+@routes_bp.route('/regenerate/<int:post_id>', methods=['POST'])
+@login_required
+def regenerate_post(post_id):
+    post = ScheduledPost.query.get_or_404(post_id)
+    if post.user_id != current_user.id:
+        return "権限がありません", 403
+    if post.status == '投稿済み':
+        flash('投稿済みの記事は再生成できません', 'error')
+        return redirect(url_for('routes.admin_log', site_id=post.site_id))
+
+    part = request.form.get('part', 'all')
+    action = {"title": "regenerate_title", "body": "regenerate_body"}.get(part, "regenerate")
+    job = enqueue_job(post, action, current_user.id)
+    return job_accepted_response(job, post)
+
+@routes_bp.route('/jobs/<int:job_id>')
+@login_required
+def job_status(job_id):
+    job = PriorityJob.query.get_or_404(job_id)
+    if job.user_id != current_user.id:
+        return jsonify({"error": "権限がありません"}), 403
+    return jsonify(job_to_dict(job))
 
 @routes_bp.route('/prompt-templates', methods=['GET', 'POST'])
 @login_required
@@ -206,6 +257,7 @@ def prompt_templates():
             genre=genre,
             title_prompt=title_prompt,
             body_prompt=body_prompt,
+            generation_mode=form.generation_mode.data,
             user_id=current_user.id
         )
         db.session.add(template)
@@ -1,9 +1,8 @@
 from app import create_app
 from app.extensions import db
 from flask_migrate import Migrate, upgrade
-from app.scheduler import scheduler  # スケジューラーをインポート
 
-# Flaskアプリケーション生成
+# Flaskアプリケーション生成（スケジューラーは app/scheduler_worker.py で別途起動する）
 app = create_app()
 
 # DBマイグレーション初期化
@@ -13,11 +12,6 @@ migrate = Migrate(app, db)
 with app.app_context():
     upgrade()  # alembic upgrade head 相当
 
-# APScheduler の初期化と開始（自動投稿スケジューラ）
-# アプリケーションコンテキスト内で scheduler を初期化
-scheduler.init_app(app)
-scheduler.start()  # スケジューラーを開始
-
 # ローカル開発用のサーバー起動（Renderでは gunicorn 経由）
 if __name__ == "__main__":
     # 本番環境ではgunicornを使用するので、Flaskのdebugモードを無効にする
@@ -1,90 +1,501 @@
 from flask_apscheduler import APScheduler
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+import time
+import random
+import threading
 import pytz
+from flask import current_app
+from sqlalchemy import update, func, or_
+from app import metrics
 from app.models import db, ScheduledPost, GenerationControl
-from app.wordpress_post import post_to_wordpress
+from app.wordpress_post import (
+    WordPressError,
+    post_to_wordpress,
+    push_to_wordpress,
+    push_batch_to_wordpress,
+    cached_batch_support,
+    detect_batch_support,
+)
+from app.http_client import report_connection_reuse
+from app.image_cache import report_image_cache
+from app.image_keywords import report_image_keywords
+from app.llm_cache import report_llm_cache
+from app.circuit_breaker import site_host, load_circuits, publish_capacity, record_success, record_failure
 from app.article_generator import generate_article_for_post
+from app.job_queue import (
+    now_jst, claim_posts, clear_claim, release_claim, renew_leases, reap_expired_leases, mark_generated,
+)
+from app.batch_generation import submit_batch, poll_batches
+from app.job_queue import get_worker_id
+from app.leader_election import try_acquire_leadership, release_leadership
 
 scheduler = APScheduler()
 
+# スケジューラーを起動したプロセス同士でリースを取り合い、リーダーの1プロセスだけが定期処理を実行する
+LEADER_LEASE_NAME = "scheduler"
+leadership = {"holder": None, "is_leader": False}
+
+def is_leader():
+    return leadership["is_leader"]
+
+def renew_leadership(app):
+    """リースを取得・延長してリーダーかどうかを更新する（DBエラー時はリーダーを降りる）"""
+    with app.app_context():
+        try:
+            is_leader_now = try_acquire_leadership(
+                LEADER_LEASE_NAME, leadership["holder"], app.config["SCHEDULER_LEASE_SECONDS"]
+            )
+        except Exception as e:
+            print(f"❌ リーダーリースの更新失敗: {e}")
+            db.session.rollback()
+            is_leader_now = False
+    if is_leader_now != leadership["is_leader"]:
+        print(f"👑 スケジューラーのリーダー{'になりました' if is_leader_now else 'を降りました'}（{leadership['holder']}）")
+    leadership["is_leader"] = is_leader_now
+    return is_leader_now
+
+def resign_leadership(app):
+    with app.app_context():
+        release_leadership(LEADER_LEASE_NAME, leadership["holder"])
+    leadership["is_leader"] = False
+
+# ---------------------
+# 生成・投稿の振り分け（tick）とワーカープール
+# ---------------------
+pools = {}
+in_flight = {"generate": set(), "publish": set()}
+publishing_hosts = {}  # ホスト → 投稿処理中の件数
+_in_flight_lock = threading.Lock()
+_dispatch_publish_lock = threading.Lock()  # tick と投稿完了時の振り分けが重ならないようにする
+
+def _submit(app, kind, post_id, fn, host=None):
+    """確保済みの投稿をプールに渡す。終わったら実行中から外す（post_id はまとめて投稿する場合は投稿IDのタプル）"""
+    with _in_flight_lock:
+        in_flight[kind].add(post_id)
+        if host is not None:
+            publishing_hosts[host] = publishing_hosts.get(host, 0) + 1
+    metrics.incr(f"scheduler.dispatched.{kind}")
+
+    def run():
+        with app.app_context():
+            with metrics.timer(f"scheduler.job.{kind}"):
+                try:
+                    fn(post_id)
+                finally:
+                    db.session.remove()
+                    with _in_flight_lock:
+                        in_flight[kind].discard(post_id)
+                        if host is not None:
+                            publishing_hosts[host] -= 1
+                            if not publishing_hosts[host]:
+                                del publishing_hosts[host]
+            # 投稿が1件終わったら次の tick を待たずに空いた枠を埋める（速いサイトは続けて投稿される）
+            if kind == "publish" and is_leader():
+                try:
+                    dispatch_publish(app)
+                except Exception as e:
+                    print(f"❌ 投稿の振り分けエラー: {e}")
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+
+    pools[kind].submit(run)
+
+def _free_slots(app, kind):
+    workers = app.config["SCHEDULER_GENERATE_WORKERS" if kind == "generate" else "SCHEDULER_PUBLISH_WORKERS"]
+    with _in_flight_lock:
+        return max(0, workers - len(in_flight[kind]))
+
+def dispatch_generation(app):
+    """生成時刻になった「生成待ち」の投稿を、生成プールの空き分だけ確保して渡す。戻り値: 振り分け件数"""
+    limit = _free_slots(app, "generate")
+    if not limit:
+        return 0
+    # 現在のUTC時間を取得
+    now_utc = datetime.utcnow()
+    # 他プロセスのスケジューラー・ワーカーと重複しないよう確保してから処理
+    generate_targets = claim_posts(
+        [
+            ScheduledPost.status == "生成待ち",  # 生成待ちの状態
+            ScheduledPost.scheduled_time <= now_utc  # 記事が生成可能な時間になったもの
+        ],
+        [ScheduledPost.scheduled_time],
+        limit=limit
+    )
+    for post in generate_targets:
+        _submit(app, "generate", post.id, generate_scheduled_post)
+    return len(generate_targets)
+
+def dispatch_publish(app):
+    """
+    「生成完了」の投稿を、投稿プールの空き分だけ確保して渡す。戻り値: 振り分け件数
+    - WP_PUBLISH_MODE=publish: 投稿予定時刻を過ぎたものを公開
+    - WP_PUBLISH_MODE=future: 生成完了になった時点で予約投稿として送る（公開はWordPress側）
+    同じホストへの同時投稿は WP_PUBLISH_MAX_PER_HOST 件までとし、遅いサイトが枠を占有して
+    他のサイトの投稿を待たせないようにする（全体の上限は SCHEDULER_PUBLISH_WORKERS）。
+    バッチエンドポイント対応が確認済みのサイトは WP_BATCH_SIZE 件ずつ1リクエストで送り、1件分の枠として数える。
+    ブレーカーが open のサイトは飛ばし、試験投稿（half_open）のサイトは1件だけ送る。
+    一時的なエラーで再試行待ち（next_attempt_at が未来）の投稿は対象外。
+    """
+    if not _dispatch_publish_lock.acquire(blocking=False):
+        return 0  # 他のスレッドが振り分け中
+    try:
+        return _dispatch_publish(app)
+    finally:
+        _dispatch_publish_lock.release()
+
+def _dispatch_publish(app):
+    free = _free_slots(app, "publish")
+    if not free:
+        return 0
+    if app.config["WP_PUBLISH_MODE"] == "future":
+        filters = [ScheduledPost.status == "生成完了"]
+    else:
+        now_jst = pytz.timezone('Asia/Tokyo').localize(datetime.now())  # JST時刻に変換
+        filters = [
+            ScheduledPost.status == "生成完了",  # 生成完了の状態
+            ScheduledPost.scheduled_time <= now_jst  # 投稿予定時刻が過ぎたもの
+        ]
+    filters.append(or_(ScheduledPost.next_attempt_at.is_(None), ScheduledPost.next_attempt_at <= datetime.utcnow()))
+    publish = reserve_scheduled_post if app.config["WP_PUBLISH_MODE"] == "future" else publish_scheduled_post
+    per_host = app.config["WP_PUBLISH_MAX_PER_HOST"]
+    circuits = load_circuits()
+    batch_size = min(app.config["WP_BATCH_SIZE"], 25) if app.config["WP_BATCH_ENABLED"] else 1
+
+    # 投稿待ちのあるサイトを、最も早い投稿予定時刻の順に回る
+    sites = (
+        db.session.query(ScheduledPost.site_url)
+        .filter(*filters, ScheduledPost.claimed_by.is_(None))
+        .group_by(ScheduledPost.site_url)
+        .order_by(func.min(ScheduledPost.scheduled_time))
+        .all()
+    )
+    dispatched = 0
+    for (site_url,) in sites:
+        if free <= 0:
+            break
+        host = site_host(site_url)
+        capacity = publish_capacity(host, per_host, circuits)
+        with _in_flight_lock:
+            host_free = capacity - publishing_hosts.get(host, 0)
+        if host_free <= 0:
+            continue
+        # 判定はプール側で行うので、ここではキャッシュだけを見る（tick で通信しない）
+        size = batch_size if cached_batch_support(site_url) and host not in circuits else 1
+        slots = min(free, host_free)
+        post_targets = claim_posts(
+            filters + [ScheduledPost.site_url == site_url],
+            [ScheduledPost.scheduled_time],
+            limit=slots * size
+        )
+        if size == 1:
+            for post in post_targets:
+                _submit(app, "publish", post.id, publish, host=host)
+        else:
+            for start in range(0, len(post_targets), size):
+                chunk = tuple(post.id for post in post_targets[start:start + size])
+                _submit(app, "publish", chunk, publish_scheduled_batch, host=host)
+        free -= -(-len(post_targets) // size)
+        dispatched += len(post_targets)
+    return dispatched
+
+def promote_reserved_posts():
+    """予約投稿の公開時刻を過ぎた「予約済み」を「投稿済み」にする（WordPress側で公開済みのためDB更新のみ）"""
+    result = db.session.execute(
+        update(ScheduledPost)
+        .where(ScheduledPost.status == "予約済み", ScheduledPost.scheduled_time <= now_jst())
+        .values(status="投稿済み")
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return result.rowcount
+
+def generate_scheduled_post(post_id):
+    """生成プールで実行：確保済みの「生成待ち」投稿を生成する"""
+    post = db.session.get(ScheduledPost, post_id)
+    try:
+        # 生成停止フラグの確認
+        control = GenerationControl.query.filter_by(user_id=post.user_id).first()
+        if control and control.stop_flag:
+            print(f"⏸ 停止フラグ中: {post.keyword}")
+            release_claim(post.id)
+            return
+
+        # ステータスを「生成中」に更新
+        print(f"🔁 ステータス変更 → 生成中: {post.keyword}")
+        post.status = "生成中"
+        db.session.commit()
+
+        success = generate_article_for_post(post.id)
+
+        post = db.session.get(ScheduledPost, post_id)
+        if success:
+            mark_generated(post)
+        else:
+            post.status = "生成失敗"
+        clear_claim(post)
+        db.session.commit()
+
+    except Exception as e:
+        print(f"❌ ステータス更新エラー: {post_id} → {e}")
+        db.session.rollback()
+        release_claim(post_id)
+
+def publish_scheduled_post(post_id):
+    """投稿プールで実行：確保済みの「生成完了」投稿を WordPress に投稿する"""
+    post = db.session.get(ScheduledPost, post_id)
+    if post.wp_post_id:
+        # 予約投稿として送信済みの投稿は、新規作成せず既存の投稿を公開に更新する
+        return reserve_scheduled_post(post_id)
+    try:
+        print(f"📤 投稿処理中: {post.title}（予定: {post.scheduled_time}）")
+        _check_batch_support(post)
+
+        # 投稿処理
+        try:
+            result = post_to_wordpress(
+                site_url=post.site_url,
+                wp_username=post.username,
+                wp_app_password=post.app_password,
+                title=post.title,
+                content=post.body,
+                images=[post.featured_image] if post.featured_image else []
+            )
+        except WordPressError as e:
+            result = e
+        _apply_publish_result(post, result)
+        db.session.commit()
+        _record_circuit(post.site_url, [result])
+
+    except Exception as e:
+        print(f"❌ 投稿処理エラー: {post_id} → {e}")
+        db.session.rollback()
+        post = db.session.get(ScheduledPost, post_id)
+        post.status = "投稿失敗"  # 🔴 例外でも失敗として記録
+        clear_claim(post)
+        db.session.commit()
+
+def reserve_scheduled_post(post_id):
+    """投稿プールで実行：確保済みの「生成完了」投稿を WordPress に予約投稿（status=future）として送る"""
+    post = db.session.get(ScheduledPost, post_id)
+    try:
+        print(f"📤 予約投稿処理中: {post.title}（予定: {post.scheduled_time}）")
+        _check_batch_support(post)
+        try:
+            result = push_to_wordpress(
+                site_url=post.site_url,
+                wp_username=post.username,
+                wp_app_password=post.app_password,
+                title=post.title,
+                content=post.body,
+                images=[post.featured_image] if post.featured_image else [],
+                scheduled_time=post.scheduled_time,
+                wp_post_id=post.wp_post_id,
+            )
+        except WordPressError as e:
+            result = e
+        _apply_publish_result(post, result)
+        db.session.commit()
+        _record_circuit(post.site_url, [result])
+
+    except Exception as e:
+        print(f"❌ 予約投稿処理エラー: {post_id} → {e}")
+        db.session.rollback()
+        post = db.session.get(ScheduledPost, post_id)
+        post.status = "投稿失敗"
+        clear_claim(post)
+        db.session.commit()
+
+def _check_batch_support(post):
+    """サイトのバッチエンドポイント対応を確認しておく（結果はキャッシュされ、次の振り分けからまとめて送る）"""
+    if current_app.config["WP_BATCH_ENABLED"]:
+        detect_batch_support(post.site_url, post.username, post.app_password)
+
+def _apply_publish_result(post, result):
+    """
+    送信結果を投稿に反映して確保を外す（commit は呼び出し側）。
+    result: True（即時投稿の成功）/ {"id", "status"}（予約投稿・バッチの成功）/ WordPressError（失敗）
+    一時的なエラーは PUBLISH_MAX_ATTEMPTS 回まで「生成完了」のまま next_attempt_at 以降に再試行し
+    （サイトが Retry-After を返していればそれより前にはしない）、
+    それ以外のエラー（401/403 など）はすぐ「投稿失敗」にする。
+    """
+    if isinstance(result, WordPressError):
+        config = current_app.config
+        # 回数は publish_attempts で数える（attempts はリーパーの再キュー回数で、上限も別）
+        if result.retryable:
+            post.publish_attempts = (post.publish_attempts or 0) + 1
+        if result.retryable and post.publish_attempts < config["PUBLISH_MAX_ATTEMPTS"]:
+            delay = min(config["PUBLISH_RETRY_BASE_SECONDS"] * 2 ** (post.publish_attempts - 1), config["PUBLISH_RETRY_MAX_SECONDS"])
+            delay = random.uniform(delay / 2, delay)  # 同じサイトの投稿が同時に再試行しないようずらす
+            delay = max(delay, min(result.retry_after or 0, config["PUBLISH_RETRY_MAX_SECONDS"]))
+            post.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+            print(f"🔁 投稿を {delay:.0f} 秒後に再試行（{post.publish_attempts}/{config['PUBLISH_MAX_ATTEMPTS']}）: {post.title} → {result}")
+        else:
+            post.status = "投稿失敗"  # 🔴 投稿失敗記録
+            post.next_attempt_at = None
+            print(f"❌ 投稿失敗: {post.title} → {result}")
+    elif isinstance(result, dict):
+        post.wp_post_id = result["id"]
+        post.wp_synced_at = datetime.utcnow()
+        post.status = "予約済み" if result["status"] == "future" else "投稿済み"
+        post.next_attempt_at = None
+        post.publish_attempts = 0
+        post.attempts = 0
+    else:
+        post.status = "投稿済み"
+        post.next_attempt_at = None
+        post.publish_attempts = 0
+        post.attempts = 0
+        print(f"✅ 投稿成功: {post.title}")
+    clear_claim(post)
+
+def _record_circuit(site_url, results):
+    """
+    サイトへの1回の送信結果をブレーカーに記録する。一時的なエラー（タイムアウト・429・5xx）だけを失敗として数え、
+    成功や 401/403/400 などの恒久的なエラーは成功として数える（応答が返る = サイトは動いている。
+    試験投稿が恒久的なエラーになったときに half_open のまま残らないように）。
+    """
+    host = site_host(site_url)
+    if any(not isinstance(result, WordPressError) or not result.retryable for result in results):
+        record_success(host)
+    elif results:
+        record_failure(host, results[0])
+
+def publish_scheduled_batch(post_ids):
+    """
+    投稿プールで実行：同じサイトの確保済み「生成完了」投稿をバッチエンドポイントでまとめて送る。
+    WP_PUBLISH_MODE=future（または送信済みの予約投稿の更新）は予約投稿、それ以外は即時公開。
+    サイトがバッチに対応していなかったら1件ずつの投稿に切り替える。
+    """
+    future = current_app.config["WP_PUBLISH_MODE"] == "future"
+    posts = [post for post in (db.session.get(ScheduledPost, post_id) for post_id in post_ids) if post]
+
+    # 同じURLでも認証情報が異なる投稿は別々に送る
+    groups = {}
+    for post in posts:
+        groups.setdefault((post.site_url, post.username, post.app_password), []).append(post)
+
+    for (site_url, username, app_password), group in groups.items():
+        print(f"📤 バッチ投稿処理中: {site_url}（{len(group)} 件）")
+        try:
+            results = push_batch_to_wordpress(site_url, username, app_password, [
+                {
+                    "title": post.title,
+                    "content": post.body,
+                    "images": [post.featured_image] if post.featured_image else [],
+                    "scheduled_time": post.scheduled_time if future or post.wp_post_id else None,
+                    "wp_post_id": post.wp_post_id,
+                }
+                for post in group
+            ])
+        except WordPressError as e:
+            print(f"❌ バッチ投稿処理エラー: {site_url} → {e}")
+            results = [e] * len(group)
+        except Exception as e:
+            print(f"❌ バッチ投稿処理エラー: {site_url} → {e}")
+            db.session.rollback()
+            results = None
+
+        if results is None:
+            single = reserve_scheduled_post if future else publish_scheduled_post
+            for post in group:
+                single(post.id)
+            continue
+
+        for post, result in zip(group, results):
+            _apply_publish_result(post, result)
+        db.session.commit()
+        _record_circuit(site_url, results)
+
 def init_app(app):
+    """
+    定期処理を登録してスケジューラーを起動する。create_app(start_scheduler=True)（SCHEDULER_ENABLED）か
+    app/scheduler_worker.py からのみ呼ばれる。複数プロセスで起動してもリーダー以外は何もしない。
+    """
+    leadership["holder"] = get_worker_id()
+    pools["generate"] = ThreadPoolExecutor(max_workers=app.config["SCHEDULER_GENERATE_WORKERS"], thread_name_prefix="generate")
+    pools["publish"] = ThreadPoolExecutor(max_workers=app.config["SCHEDULER_PUBLISH_WORKERS"], thread_name_prefix="publish")
     scheduler.init_app(app)
+
+    @scheduler.task('interval', id='leader_lease', seconds=app.config["SCHEDULER_LEASE_RENEW_SECONDS"])
+    def leader_lease():
+        renew_leadership(app)
+
+    # 起動直後から処理できるよう、最初のリース取得は起動前に行う
+    renew_leadership(app)
     scheduler.start()
 
-    @scheduler.task('interval', id='scheduled_task', seconds=60)
+    # ✅ 生成・投稿の振り分け（対象を確保してプールに渡すだけなので tick はすぐ終わる）
+    # 前回の tick が終わっていなければ重ねて実行せず（max_instances=1）、溜まった実行は1回にまとめる（coalesce）
+    @scheduler.task(
+        'interval',
+        id='scheduled_task',
+        seconds=app.config["SCHEDULER_TICK_SECONDS"],
+        max_instances=1,
+        coalesce=True,
+        misfire_grace_time=app.config["SCHEDULER_TICK_SECONDS"],
+    )
     def scheduled_task():
+        if not is_leader():
+            return
         with app.app_context():
+            started = time.monotonic()
             try:
-                # 現在のUTC時間とJST時間を取得
-                now_utc = datetime.utcnow()
-                now_jst = pytz.timezone('Asia/Tokyo').localize(datetime.now())  # JST時刻に変換
-
-                # ✅ ① 記事生成ステータスを「生成中」に変更（workerが処理）
-                generate_targets = ScheduledPost.query.filter(
-                    ScheduledPost.status == "生成待ち",  # 生成待ちの状態
-                    ScheduledPost.scheduled_time <= now_utc  # 記事が生成可能な時間になったもの
-                ).order_by(ScheduledPost.scheduled_time).limit(3).all()  # 最初の3件を処理
-
-                for post in generate_targets:
-                    try:
-                        # 生成停止フラグの確認
-                        control = GenerationControl.query.filter_by(user_id=post.user_id).first()
-                        if control and control.stop_flag:
-                            print(f"⏸ 停止フラグ中: {post.keyword}")
-                            continue
-
-                        # ステータスを「生成中」に更新
-                        print(f"🔁 ステータス変更 → 生成中: {post.keyword}")
-                        post.status = "生成中"
-                        db.session.commit()
-
-                        # 生成処理を非同期で実行（`generate_article_for_post` を実行）
-                        success = generate_article_for_post(post)
-
-                        if success:
-                            post.status = "生成完了"
-                        else:
-                            post.status = "生成失敗"
-                        db.session.commit()
-
-                    except Exception as e:
-                        print(f"❌ ステータス更新エラー: {post.id} → {e}")
-                        db.session.rollback()
-
-                # ✅ ② 投稿処理（投稿失敗を除外）
-                post_targets = ScheduledPost.query.filter(
-                    ScheduledPost.status == "生成完了",  # 生成完了の状態
-                    ScheduledPost.scheduled_time <= now_jst  # 投稿予定時刻が過ぎたもの
-                ).filter(ScheduledPost.status != "投稿失敗").all()
-
-                for post in post_targets:
-                    try:
-                        print(f"📤 投稿処理中: {post.title}（予定: {post.scheduled_time}）")
-
-                        # 投稿処理
-                        success = post_to_wordpress(
-                            site_url=post.site_url,
-                            wp_username=post.username,
-                            wp_app_password=post.app_password,
-                            title=post.title,
-                            content=post.body,
-                            images=[post.featured_image] if post.featured_image else []
-                        )
-
-                        if success:
-                            post.status = "投稿済み"
-                            db.session.commit()
-                            print(f"✅ 投稿成功: {post.title}")
-                        else:
-                            post.status = "投稿失敗"  # 🔴 投稿失敗記録
-                            db.session.commit()
-                            print(f"❌ 投稿失敗: {post.title}")
-
-                    except Exception as e:
-                        post.status = "投稿失敗"  # 🔴 例外でも失敗として記録
-                        db.session.commit()
-                        print(f"❌ 投稿処理エラー: {post.id} → {e}")
-                        db.session.rollback()
-
+                generated = dispatch_generation(app)
+                published = dispatch_publish(app)
+                promote_reserved_posts()
             except Exception as e:
                 print(f"🔥 スケジューラー全体エラー: {e}")
+                db.session.rollback()
+                return
+            finally:
+                metrics.observe("scheduler.tick", time.monotonic() - started)
+
+            elapsed = time.monotonic() - started
+            if generated or published:
+                print(f"⏱ tick {elapsed:.2f}s: 生成 {generated} 件 / 投稿 {published} 件を振り分け"
+                      f"（実行中 生成 {len(in_flight['generate'])} / 投稿 {len(in_flight['publish'])}）")
+            tick_count = metrics.snapshot("scheduler.tick")["timings"]["scheduler.tick"]["count"]
+            if tick_count % app.config["SCHEDULER_METRICS_REPORT_TICKS"] == 0:
+                metrics.report("scheduler.")
+                report_connection_reuse()
+                report_image_cache()
+                report_image_keywords()
+                report_llm_cache()
+
+    # ✅ 確保中の投稿のリース延長（投稿処理が長引いてもリーパーに回収されないように）
+    @scheduler.task('interval', id='lease_heartbeat', seconds=app.config["WORKER_HEARTBEAT_SECONDS"])
+    def lease_heartbeat():
+        # 自プロセスの確保分だけを延長するので、リーダーを降りた後もプールに残った処理のために続ける
+        with app.app_context():
+            try:
+                renew_leases()
+            except Exception as e:
+                print(f"❌ ハートビート失敗: {e}")
+
+    # ✅ 期限切れの確保（クラッシュしたワーカーの投稿）を再キュー
+    @scheduler.task('interval', id='lease_reaper', seconds=app.config["LEASE_REAPER_INTERVAL_SECONDS"])
+    def lease_reaper():
+        if not is_leader():
+            return
+        with app.app_context():
+            try:
+                reap_expired_leases()
+            except Exception as e:
+                print(f"❌ リーパー実行エラー: {e}")
+                db.session.rollback()
+
+    # ✅ Batch API による一括生成（完了したバッチの反映 → 新しいバッチの投入）
+    if app.config["BATCH_API_ENABLED"]:
+        @scheduler.task('interval', id='batch_generation', seconds=app.config["BATCH_POLL_SECONDS"], coalesce=True)
+        def batch_generation():
+            if not is_leader():
+                return
+            with app.app_context():
+                try:
+                    poll_batches()
+                    submit_batch()
+                except Exception as e:
+                    print(f"❌ バッチ生成エラー: {e}")
+                    db.session.rollback()
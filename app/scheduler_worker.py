@@ -0,0 +1,23 @@
+import os
+import sys
+import time
+import atexit
+import signal
+
+# 🔧 Render環境対応のパス追加
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from app.scheduler import resign_leadership
+
+# 定期処理（生成・投稿の振り分け、リース回収、Batch API）専用のプロセス。
+# 複数起動してもDBのリースでリーダー1つだけが処理し、リーダーが落ちれば他が引き継ぐ。
+app = create_app(start_scheduler=True)
+
+if __name__ == "__main__":
+    # 正常終了時はリースを手放して、待機中のプロセスにすぐ引き継ぐ
+    atexit.register(resign_leadership, app)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))  # デプロイ時の停止でも atexit を通す
+    print("🗓 スケジューラー起動")
+    while True:
+        time.sleep(60)
@@ -0,0 +1,132 @@
+# 📄 app/title_batch.py
+
+import asyncio
+import traceback
+from sqlalchemy import func, or_
+from .models import db, ScheduledPost, GenerationControl
+from .job_queue import claim_posts, clear_claim, release_claim, generation_window_filters, deadline_order
+from .article_generator import TITLE_PLACEHOLDER, clean_title, parse_text_list
+
+# /auto-post は1キーワードにつき2〜3件の投稿を同じタイトルプロンプトで登録する。
+# それぞれが別々にタイトルを生成すると似たタイトルになりやすいので、
+# (ユーザー, キーワード, タイトルプロンプト) が同じ兄弟投稿には1回の呼び出しで異なるタイトルをまとめて割り当てる。
+
+def _untitled_filters():
+    stopped_users = db.session.query(GenerationControl.user_id).filter(GenerationControl.stop_flag.is_(True))
+    return [
+        ScheduledPost.status == "生成中",
+        ScheduledPost.prompt_title.isnot(None),
+        # structured モードはタイトルも一括生成するので対象外
+        ScheduledPost.generation_mode != "structured",
+        or_(ScheduledPost.title.is_(None), ScheduledPost.title == "", ScheduledPost.title == TITLE_PLACEHOLDER),
+        ScheduledPost.user_id.notin_(stopped_users),
+    ] + generation_window_filters()
+
+def find_title_groups(max_groups):
+    """タイトル未生成の兄弟投稿グループ（2件以上）を投稿予定時刻が近い順に返す"""
+    return (
+        db.session.query(ScheduledPost.user_id, ScheduledPost.keyword, ScheduledPost.prompt_title)
+        .filter(*_untitled_filters(), ScheduledPost.claimed_by.is_(None))
+        .group_by(ScheduledPost.user_id, ScheduledPost.keyword, ScheduledPost.prompt_title)
+        .having(func.count(ScheduledPost.id) >= 2)
+        .order_by(func.min(ScheduledPost.scheduled_time), func.min(ScheduledPost.created_at))
+        .limit(max_groups)
+        .all()
+    )
+
+def claim_title_group(user_id, keyword, prompt_title):
+    posts = claim_posts(
+        _untitled_filters() + [
+            ScheduledPost.user_id == user_id,
+            ScheduledPost.keyword == keyword,
+            ScheduledPost.prompt_title == prompt_title,
+        ],
+        deadline_order(),
+    )
+    if len(posts) < 2:
+        # 他ワーカーと取り合って1件以下になった場合は通常のタイトル生成に任せる
+        for post in posts:
+            release_claim(post.id)
+        return []
+    return posts
+
+def build_title_batch_messages(prompt_title, keyword, count):
+    title_prompt = prompt_title.replace("{{keyword}}", keyword)
+    prompt = f"""{title_prompt}
+
+上記の指示に従って、互いに切り口・内容が重ならないタイトルを{count}個作成してください。
+出力はJSONの文字列配列のみとし、説明文は付けないでください。"""
+    return [{
+        "role": "system",
+        "content": "あなたはSEOの専門家です。"
+    }, {
+        "role": "user",
+        "content": prompt
+    }]
+
+def parse_titles(text, count):
+    titles = []
+    for item in parse_text_list(text):
+        title = clean_title(item.split("\n")[0])
+        if title and title not in titles:
+            titles.append(title)
+    return titles[:count]
+
+def assign_titles(post_ids, titles):
+    """生成できた分だけ先頭から割り当て、残りは未生成のままキューに戻す"""
+    for index, post_id in enumerate(post_ids):
+        post = db.session.get(ScheduledPost, post_id)
+        if post and index < len(titles) and post.status == "生成中":
+            post.title = titles[index]
+        if post:
+            clear_claim(post)
+    db.session.commit()
+    print(f"✅ タイトル一括生成: {min(len(titles), len(post_ids))}/{len(post_ids)} 件に割り当て")
+
+def prefetch_sibling_titles(client, max_groups):
+    """兄弟投稿のタイトルをグループごとに1回の呼び出しで生成する（同期版）"""
+    for user_id, keyword, prompt_title in find_title_groups(max_groups):
+        posts = claim_title_group(user_id, keyword, prompt_title)
+        if not posts:
+            continue
+        post_ids = [post.id for post in posts]
+        try:
+            res = client.chat.completions.create(
+                model="gpt-4-turbo",
+                messages=build_title_batch_messages(prompt_title, keyword, len(post_ids)),
+                temperature=0.8,
+                max_tokens=150 * len(post_ids)
+            )
+            assign_titles(post_ids, parse_titles(res.choices[0].message.content, len(post_ids)))
+        except Exception as e:
+            print(f"❌ タイトル一括生成エラー（{keyword}）:", e)
+            traceback.print_exc()
+            db.session.rollback()
+            for post_id in post_ids:
+                release_claim(post_id)
+
+async def prefetch_sibling_titles_async(async_client, max_groups):
+    """prefetch_sibling_titles の AsyncOpenAI 版（グループ同士は同時に生成）"""
+    groups = []
+    for user_id, keyword, prompt_title in find_title_groups(max_groups):
+        posts = claim_title_group(user_id, keyword, prompt_title)
+        if posts:
+            groups.append((keyword, prompt_title, [post.id for post in posts]))
+
+    async def generate(keyword, prompt_title, post_ids):
+        res = await async_client.chat.completions.create(
+            model="gpt-4-turbo",
+            messages=build_title_batch_messages(prompt_title, keyword, len(post_ids)),
+            temperature=0.8,
+            max_tokens=150 * len(post_ids)
+        )
+        return parse_titles(res.choices[0].message.content, len(post_ids))
+
+    results = await asyncio.gather(*(generate(*group) for group in groups), return_exceptions=True)
+    for (keyword, _, post_ids), titles in zip(groups, results):
+        if isinstance(titles, Exception):
+            print(f"❌ タイトル一括生成エラー（{keyword}）:", titles)
+            for post_id in post_ids:
+                release_claim(post_id)
+            continue
+        assign_titles(post_ids, titles)
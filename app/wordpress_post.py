@@ -1,46 +1,330 @@
 # 📄 app/wordpress_post.py
 
-import requests
+import httpx
 import json
 import base64
+import time
+import random
+import hashlib
+import mimetypes
+import posixpath
+import tempfile
 from datetime import datetime
+from urllib.parse import urlparse
+import pytz
+from flask import current_app
+from .http_client import get_client, timeout
+from .media_cache import find_media, remember_media, forget_media
+
+# REST API のバッチエンドポイント（WordPress 5.6+）で1回に送れるリクエスト数の上限
+BATCH_MAX_REQUESTS = 25
+# サイトごとのバッチ対応の判定結果を保持する秒数
+BATCH_SUPPORT_TTL_SECONDS = 6 * 3600
+_batch_support = {}  # サイトURL → (対応しているか, 判定した時刻)
+
+# 1回の送信の中での再試行（一時的なエラーのみ）。投稿ワーカーを塞がないよう待つのは短い間だけにし、
+# それでも失敗した投稿・Retry-After が RETRY_MAX_SECONDS より長い応答はスケジューラーが next_attempt_at 以降に再試行する
+RETRY_ATTEMPTS = 3
+RETRY_BASE_SECONDS = 0.5
+RETRY_MAX_SECONDS = 2.0
+
+# 画像はこのサイズずつ読み、読んだそばからアップロードに流す
+IMAGE_CHUNK_BYTES = 64 * 1024
+# 先頭バイトで判定する画像形式（Content-Type・拡張子より優先する）
+IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+)
+
+class WordPressError(Exception):
+    """
+    WordPress への送信の失敗。retryable=True は時間をおけば成功し得る一時的なエラー
+    （タイムアウト・接続エラー・408/425/429・5xx）、False は認証エラー（401/403）や入力エラーなど再試行しても同じ結果になるもの。
+    retry_after はサイトが Retry-After で指定した待ち秒数（なければ None）。
+    """
+
+    def __init__(self, message, status_code=None, retryable=False, retry_after=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+def is_retryable_status(status_code):
+    return status_code in (408, 425, 429) or status_code >= 500
+
+def backoff_seconds(attempt, base, cap):
+    """attempt 回目（0始まり）の再試行までの待ち秒数（指数バックオフ + フルジッター）"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+def _retry_after_seconds(response):
+    try:
+        return float(response.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+def send_with_retry(method, url, **kwargs):
+    """
+    共有の HTTP クライアント（keep-alive 接続を再利用）で送信し、一時的なエラーは RETRY_ATTEMPTS 回まで指数バックオフで再試行する（429 等は Retry-After を優先）。
+    待つのは RETRY_MAX_SECONDS までで、Retry-After がそれより長ければ待たずにそのレスポンスを返す。
+    戻り値: 最後のレスポンス（成否の判定は呼び出し側）。通信自体が失敗し続けたら WordPressError(retryable=True)
+    """
+    return retry_transient(lambda: get_client().request(method.upper(), url, **kwargs), url)
+
+def retry_transient(send, url):
+    """
+    send() を呼び、send_with_retry と同じ条件で再試行する。
+    send は呼ぶたびにリクエストを作り直すこと（ストリームで送る本文は再送できないため）。
+    """
+    for attempt in range(RETRY_ATTEMPTS):
+        last = attempt == RETRY_ATTEMPTS - 1
+        try:
+            response = send()
+        except httpx.TransportError as e:
+            if last:
+                raise WordPressError(f"通信エラー: {e}", retryable=True)
+            delay = backoff_seconds(attempt, RETRY_BASE_SECONDS, RETRY_MAX_SECONDS)
+        else:
+            if last or not is_retryable_status(response.status_code):
+                return response
+            delay = _retry_after_seconds(response)
+            if delay is not None and delay > RETRY_MAX_SECONDS:
+                return response  # 長い待ちはスケジューラーの再試行に任せる
+            if delay is None:
+                delay = backoff_seconds(attempt, RETRY_BASE_SECONDS, RETRY_MAX_SECONDS)
+        print(f"🔁 {delay:.1f} 秒後に再送信（{attempt + 1}/{RETRY_ATTEMPTS - 1}）: {url}")
+        time.sleep(delay)
+
+def error_from_response(response, action="投稿"):
+    return WordPressError(
+        f"{action}失敗: HTTP {response.status_code}",
+        status_code=response.status_code,
+        retryable=is_retryable_status(response.status_code),
+        retry_after=_retry_after_seconds(response),
+    )
 
 def ensure_trailing_slash(url):
     """URLの末尾に / がない場合に付与"""
     return url if url.endswith("/") else url + "/"
 
-def upload_featured_image(site_url, wp_username, wp_app_password, image_url):
+class ImageTransferError(Exception):
+    """画像の取得側の問題（取得失敗・画像でない・サイズ超過）。画像なしで投稿を続ける"""
+
+def detect_image_type(head, content_type=None):
+    """先頭バイト（なければ Content-Type）から画像の MIME タイプを判定する。画像でなければ None"""
+    for signature, mime_type in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return mime_type
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if content_type.startswith("image/"):
+        return content_type
+    return None
+
+def image_filename(image_url, mime_type):
+    """URL のファイル名を使い、拡張子は実際の形式に合わせる"""
+    name = posixpath.basename(urlparse(image_url).path) or "image"
+    extension = ".jpg" if mime_type == "image/jpeg" else mimetypes.guess_extension(mime_type) or ""
+    stem, current = posixpath.splitext(name)
+    if current.lower() in (".jpg", ".jpeg") and extension == ".jpg":
+        return name
+    return (stem or "image") + extension
+
+def _image_chunks(first_chunk, chunks, max_bytes):
+    """ダウンロード中の画像をそのまま流す。上限を超えたら途中で打ち切る"""
+    total = len(first_chunk)
+    yield first_chunk
+    try:
+        for chunk in chunks:
+            total += len(chunk)
+            if total > max_bytes:
+                raise ImageTransferError(f"画像が大きすぎます（{max_bytes} バイト超）")
+            yield chunk
+    except httpx.HTTPError as e:
+        raise ImageTransferError(f"画像の取得が中断しました: {e}")
+
+def stream_image_upload(media_url, image_url, auth_headers, max_bytes):
     """
-    画像URLをWordPressにアップロードし、media IDを取得
+    画像をダウンロードしながら WordPress のメディアAPIにアップロードする（1回分）。
+    ファイル全体をメモリに載せず、ダウンロードが終わる前にアップロードを始める。
+    戻り値: アップロードのレスポンス。画像側の問題は ImageTransferError
     """
+    client = get_client()
+    try:
+        source = client.send(client.build_request("GET", image_url, timeout=timeout(10)), stream=True)
+    except httpx.HTTPError as e:
+        raise ImageTransferError(f"画像の取得に失敗しました: {e}")
     try:
-        response_img = requests.get(image_url, timeout=10)
-        response_img.raise_for_status()
-        image_data = response_img.content
-        filename = image_url.split("/")[-1]
+        if source.status_code != 200:
+            raise ImageTransferError(f"画像の取得に失敗しました: HTTP {source.status_code}")
+        length = int(source.headers.get("Content-Length") or 0)
+        if length > max_bytes:
+            raise ImageTransferError(f"画像が大きすぎます（{length} バイト）")
 
-        token = base64.b64encode(f"{wp_username}:{wp_app_password}".encode()).decode('utf-8')
+        chunks = source.iter_bytes(IMAGE_CHUNK_BYTES)
+        try:
+            first_chunk = next(chunks, b"")
+        except httpx.HTTPError as e:
+            raise ImageTransferError(f"画像の取得に失敗しました: {e}")
+        mime_type = detect_image_type(first_chunk, source.headers.get("Content-Type"))
+        if not mime_type:
+            raise ImageTransferError(f"画像ではありません（{source.headers.get('Content-Type')}）")
+
+        filename = image_filename(image_url, mime_type)
         headers = {
-            'Authorization': f'Basic {token}',
-            'User-Agent': 'Mozilla/5.0 (compatible; AI-Posting-Bot/1.0)',
+            **auth_headers,
             'Content-Disposition': f'attachment; filename="{filename}"',
-            'Content-Type': 'image/jpeg',
-            'Accept': 'application/json'
+            'Content-Type': mime_type,
         }
+        # 長さが分かれば Content-Length で送る（chunked を受け付けないサーバーがあるため）
+        if length and source.headers.get("Content-Encoding", "identity") == "identity":
+            headers['Content-Length'] = str(length)
+
+        return client.post(media_url, headers=headers, content=_image_chunks(first_chunk, chunks, max_bytes), timeout=timeout(15))
+    finally:
+        source.close()
+
+def download_image(image_url, max_bytes, spool_bytes):
+    """
+    画像を一時ファイル（spool_bytes まではメモリ上）にダウンロードし、形式と SHA-256 を求める。
+    戻り値: (一時ファイル, MIME タイプ, SHA-256, バイト数)。画像側の問題は ImageTransferError
+    """
+    client = get_client()
+    try:
+        source = client.send(client.build_request("GET", image_url, timeout=timeout(10)), stream=True)
+    except httpx.HTTPError as e:
+        raise ImageTransferError(f"画像の取得に失敗しました: {e}")
+    file = tempfile.SpooledTemporaryFile(max_size=spool_bytes)
+    try:
+        if source.status_code != 200:
+            raise ImageTransferError(f"画像の取得に失敗しました: HTTP {source.status_code}")
+        if int(source.headers.get("Content-Length") or 0) > max_bytes:
+            raise ImageTransferError(f"画像が大きすぎます（{source.headers['Content-Length']} バイト）")
+
+        chunks = source.iter_bytes(IMAGE_CHUNK_BYTES)
+        first_chunk = next(chunks, b"")
+        mime_type = detect_image_type(first_chunk, source.headers.get("Content-Type"))
+        if not mime_type:
+            raise ImageTransferError(f"画像ではありません（{source.headers.get('Content-Type')}）")
+
+        digest = hashlib.sha256()
+        length = 0
+        for chunk in _image_chunks(first_chunk, chunks, max_bytes):
+            digest.update(chunk)
+            file.write(chunk)
+            length += len(chunk)
+        return file, mime_type, digest.hexdigest(), length
+    except httpx.HTTPError as e:
+        file.close()
+        raise ImageTransferError(f"画像の取得に失敗しました: {e}")
+    except Exception:
+        file.close()
+        raise
+    finally:
+        source.close()
+
+def upload_image_file(media_url, image_url, auth_headers, file, mime_type, length):
+    """download_image で受けた画像をアップロードする（1回分。再試行のたびに先頭から読み直す）"""
+    file.seek(0)
+    headers = {
+        **auth_headers,
+        'Content-Disposition': f'attachment; filename="{image_filename(image_url, mime_type)}"',
+        'Content-Type': mime_type,
+        'Content-Length': str(length),
+    }
+    return get_client().post(media_url, headers=headers, content=iter(lambda: file.read(IMAGE_CHUNK_BYTES), b""), timeout=timeout(15))
+
+def _invalid_featured_media(status_code, body):
+    """投稿が featured_media の無効で断られたか（キャッシュしたメディアが WordPress 側で削除されていた）"""
+    return status_code == 400 and isinstance(body, dict) and body.get("code") == "rest_invalid_featured_media"
+
+def _response_body(response):
+    try:
+        return response.json()
+    except ValueError:
+        return None
+
+def _forget_deleted_media(site_url, media_id):
+    print(f"🗑 WordPress 側で削除されたメディアの記録を削除: {media_id}")
+    forget_media(site_url, media_id)
+
+def _send_post(site_url, wp_username, wp_app_password, post_url, headers, data, image_url):
+    """
+    投稿を作成・更新する。キャッシュしたアイキャッチが WordPress 側で削除されていて断られたときだけ、
+    記録を消して画像をアップロードし直し、もう一度送る
+    """
+    response = send_with_retry("post", post_url, headers=headers, content=json.dumps(data), timeout=timeout(20))
+    media_id = data.get('featured_media')
+    if media_id and _invalid_featured_media(response.status_code, _response_body(response)):
+        _forget_deleted_media(site_url, media_id)
+        data.pop('featured_media')
+        featured_image_id = upload_featured_image(site_url, wp_username, wp_app_password, image_url)
+        if featured_image_id:
+            data['featured_media'] = featured_image_id
+        response = send_with_retry("post", post_url, headers=headers, content=json.dumps(data), timeout=timeout(20))
+    return response
+
+def upload_featured_image(site_url, wp_username, wp_app_password, image_url):
+    """
+    画像URLをWordPressにアップロードし、media IDを取得
+    - 同じサイトへアップロード済みの画像（画像URL、MEDIA_DEDUP_BY_HASH なら内容のハッシュが一致）はそのメディアIDを使う
+      （WordPress 側に残っているかは確かめず、投稿で断られたときに _send_post がアップロードし直す）
+    - MEDIA_DEDUP_BY_HASH=false ならダウンロードしながらストリームでアップロードする
+    画像なしでも投稿は続けるので失敗時は None を返すが、サイト側の一時的なエラー・認証エラーは
+    投稿も失敗するため WordPressError を送出する
+    """
+    try:
+        site_url = ensure_trailing_slash(site_url)
+        headers = build_auth_headers(wp_username, wp_app_password)
+        del headers['Content-Type']
+
+        media_id = find_media(site_url, source_url=image_url)
+        if media_id:
+            print(f"♻️ アップロード済みの画像を使用: {image_url}（media ID: {media_id}）")
+            return media_id
 
-        media_url = ensure_trailing_slash(site_url) + "wp-json/wp/v2/media"
-        response = requests.post(media_url, headers=headers, data=image_data, timeout=15)
+        config = current_app.config
+        media_url = site_url + "wp-json/wp/v2/media"
+        content_hash = None
+        if config["MEDIA_DEDUP_BY_HASH"]:
+            file, mime_type, content_hash, length = download_image(image_url, config["IMAGE_MAX_BYTES"], config["MEDIA_SPOOL_BYTES"])
+            try:
+                media_id = find_media(site_url, content_hash=content_hash)
+                if media_id:
+                    remember_media(site_url, image_url, media_id, content_hash)
+                    print(f"♻️ アップロード済みの同じ画像を使用: {image_url}（media ID: {media_id}）")
+                    return media_id
+                response = retry_transient(
+                    lambda: upload_image_file(media_url, image_url, headers, file, mime_type, length), media_url
+                )
+            finally:
+                file.close()
+        else:
+            response = retry_transient(
+                lambda: stream_image_upload(media_url, image_url, headers, config["IMAGE_MAX_BYTES"]), media_url
+            )
 
         if response.status_code == 201:
-            print(f"✅ 画像アップロード成功: {filename}")
-            return response.json().get('id')
+            print(f"✅ 画像アップロード成功: {image_url}")
+            media_id = response.json().get('id')
+            if media_id:
+                remember_media(site_url, image_url, media_id, content_hash)
+            return media_id
         else:
             print(f"❌ 画像アップロード失敗: {response.status_code}")
-            response.encoding = response.apparent_encoding
             print("📄 レスポンス内容:", response.text)
             log_upload_error(site_url, image_url, response)
+            if is_retryable_status(response.status_code) or response.status_code in (401, 403):
+                raise error_from_response(response, "画像アップロード")
             return None
 
+    except WordPressError:
+        raise
+    except ImageTransferError as e:
+        print(f"⚠️ 画像をアップロードせずに投稿します: {e}（{image_url}）")
+        return None
     except Exception as e:
         print(f"❌ 画像アップロード中に例外発生: {e}")
         return None
@@ -48,6 +332,7 @@ def upload_featured_image(site_url, wp_username, wp_app_password, image_url):
 def post_to_wordpress(site_url, wp_username, wp_app_password, title, content, images=None):
     """
     WordPressへ記事を投稿（オプションでアイキャッチ画像含む）
+    戻り値: True。失敗時は WordPressError を送出する（retryable で再試行するかを判断）
     """
     site_url = ensure_trailing_slash(site_url)
 
@@ -73,24 +358,198 @@ def post_to_wordpress(site_url, wp_username, wp_app_password, title, content, im
 
     try:
         post_url = site_url + "wp-json/wp/v2/posts"
-        response = requests.post(post_url, headers=headers, data=json.dumps(data), timeout=20)
+        response = _send_post(site_url, wp_username, wp_app_password, post_url, headers, data, images and images[0])
 
         if response.status_code == 201:
             print(f"✅ 投稿成功: {title}")
             return True
         else:
             print(f"❌ 投稿失敗: {response.status_code}")
-            response.encoding = response.apparent_encoding
             print("📄 レスポンス内容:", response.text)
             log_post_error(site_url, title, response)
-            return False
+            raise error_from_response(response)
+
+    except WordPressError:
+        raise
+    except Exception as e:
+        print(f"❌ 投稿処理中に例外発生: {e}")
+        raise WordPressError(str(e))
+
+def to_wp_date_gmt(scheduled_time):
+    """scheduled_time（JST、タイムゾーンなしはJSTとみなす）を WordPress の date_gmt（UTC）形式に変換"""
+    if scheduled_time.tzinfo is None:
+        scheduled_time = pytz.timezone("Asia/Tokyo").localize(scheduled_time)
+    return scheduled_time.astimezone(pytz.utc).strftime("%Y-%m-%dT%H:%M:%S")
+
+def build_auth_headers(wp_username, wp_app_password):
+    token = base64.b64encode(f"{wp_username}:{wp_app_password}".encode()).decode('utf-8')
+    return {
+        'Content-Type': 'application/json',
+        'Authorization': f'Basic {token}',
+        'User-Agent': 'Mozilla/5.0 (compatible; AI-Posting-Bot/1.0)',
+        'Accept': 'application/json'
+    }
+
+def build_post_data(title, content, featured_image_id=None, scheduled_time=None):
+    """投稿APIに送る本文。scheduled_time が未来なら予約投稿（status=future）にする"""
+    data = {
+        'title': title[:150],
+        'content': content,
+        'status': 'publish'
+    }
+    if scheduled_time:
+        data['date_gmt'] = to_wp_date_gmt(scheduled_time)
+        if data['date_gmt'] > datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S"):
+            data['status'] = 'future'
+    if featured_image_id:
+        data['featured_media'] = featured_image_id
+    return data
+
+def push_to_wordpress(site_url, wp_username, wp_app_password, title, content, images=None, scheduled_time=None, wp_post_id=None):
+    """
+    WordPressへ予約投稿（status=future, date_gmt=scheduled_time）として送り、公開はWordPress側に任せる。
+    - wp_post_id があれば新規作成せずその投稿を更新する（編集内容の反映）
+    - scheduled_time がない・過ぎている場合は即時公開（status=publish）
+    戻り値: {"id": WordPressの投稿ID, "status": "future" / "publish"}。失敗時は WordPressError を送出する
+    """
+    site_url = ensure_trailing_slash(site_url)
+    headers = build_auth_headers(wp_username, wp_app_password)
+
+    featured_image_id = None
+    if images and images[0]:
+        featured_image_id = upload_featured_image(site_url, wp_username, wp_app_password, images[0])
+
+    data = build_post_data(title, content, featured_image_id, scheduled_time)
+
+    try:
+        post_url = site_url + "wp-json/wp/v2/posts"
+        if wp_post_id:
+            post_url += f"/{wp_post_id}"
+        response = _send_post(site_url, wp_username, wp_app_password, post_url, headers, data, images and images[0])
+
+        if response.status_code in (200, 201):
+            result = response.json()
+            print(f"✅ {'予約投稿' if data['status'] == 'future' else '投稿'}{'更新' if wp_post_id else ''}成功: {title}（WP ID: {result.get('id')}）")
+            return {"id": result.get("id"), "status": result.get("status", data['status'])}
+        else:
+            print(f"❌ 投稿失敗: {response.status_code}")
+            print("📄 レスポンス内容:", response.text)
+            log_post_error(site_url, title, response)
+            raise error_from_response(response)
 
+    except WordPressError:
+        raise
     except Exception as e:
         print(f"❌ 投稿処理中に例外発生: {e}")
+        raise WordPressError(str(e))
+
+def cached_batch_support(site_url):
+    """判定済みのバッチ対応状況を返す（未判定・期限切れは None）。通信はしない"""
+    cached = _batch_support.get(ensure_trailing_slash(site_url))
+    if not cached or time.monotonic() - cached[1] > BATCH_SUPPORT_TTL_SECONDS:
+        return None
+    return cached[0]
+
+def detect_batch_support(site_url, wp_username, wp_app_password):
+    """
+    サイトが /wp-json/batch/v1 に対応しているかを判定してキャッシュする（WordPress 5.6+）。
+    判定済みならキャッシュを返す。通信エラー・5xx は判定せず False を返す（次回また確認する）。
+    """
+    site_url = ensure_trailing_slash(site_url)
+    cached = cached_batch_support(site_url)
+    if cached is not None:
+        return cached
+    try:
+        response = get_client().options(
+            site_url + "wp-json/batch/v1",
+            headers=build_auth_headers(wp_username, wp_app_password),
+            timeout=timeout(10)
+        )
+    except Exception as e:
+        print(f"❌ バッチ対応の確認中に例外発生: {e}")
+        return False
+    if response.status_code >= 500:
         return False
+    supported = response.status_code == 200
+    _batch_support[site_url] = (supported, time.monotonic())
+    print(f"🔎 バッチ投稿{'対応' if supported else '非対応'}: {site_url}")
+    return supported
+
+def push_batch_to_wordpress(site_url, wp_username, wp_app_password, items):
+    """
+    同じサイトへの複数の投稿を /wp-json/batch/v1 でまとめて作成・更新する（1リクエスト最大 BATCH_MAX_REQUESTS 件）。
+    items: push_to_wordpress と同じ引数（title, content, images, scheduled_time, wp_post_id）の dict のリスト
+    戻り値: items と同じ順の結果のリスト（各要素は成功なら {"id", "status"}、失敗なら WordPressError）。
+    サイトがバッチに対応していなかった場合は None を返すので、呼び出し側で1件ずつの投稿に切り替える。
+    """
+    site_url = ensure_trailing_slash(site_url)
+    headers = build_auth_headers(wp_username, wp_app_password)
+
+    requests_data = []
+    for item in items:
+        images = item.get("images")
+        featured_image_id = None
+        if images and images[0]:
+            featured_image_id = upload_featured_image(site_url, wp_username, wp_app_password, images[0])
+        path = "/wp/v2/posts"
+        if item.get("wp_post_id"):
+            path += f"/{item['wp_post_id']}"
+        requests_data.append({
+            "method": "POST",
+            "path": path,
+            "body": build_post_data(item["title"], item["content"], featured_image_id, item.get("scheduled_time")),
+        })
+
+    results = []
+    for start in range(0, len(requests_data), BATCH_MAX_REQUESTS):
+        chunk = requests_data[start:start + BATCH_MAX_REQUESTS]
+        try:
+            response = send_with_retry(
+                "post",
+                site_url + "wp-json/batch/v1",
+                headers=headers,
+                content=json.dumps({"validation": "normal", "requests": chunk}),
+                timeout=timeout(20 + 5 * len(chunk))
+            )
+        except WordPressError as e:
+            print(f"❌ バッチ投稿中に例外発生: {e}")
+            results.extend([e] * len(chunk))
+            continue
+
+        if response.status_code not in (200, 207):
+            print(f"❌ バッチ投稿失敗: {response.status_code}")
+            print("📄 レスポンス内容:", response.text)
+            log_post_error(site_url, f"バッチ投稿（{len(chunk)} 件）", response)
+            if response.status_code in (404, 405) and not results:
+                _batch_support[site_url] = (False, time.monotonic())  # 非対応になった（プラグイン等で無効化）
+                return None
+            results.extend([error_from_response(response, "バッチ投稿")] * len(chunk))
+            continue
+
+        responses = response.json().get("responses") or []
+        for index, request_data in enumerate(chunk):
+            item_response = responses[index] if index < len(responses) else {}
+            body = item_response.get("body") or {}
+            title = request_data["body"]["title"]
+            status_code = item_response.get("status") or 0
+            if status_code in (200, 201) and body.get("id"):
+                print(f"✅ バッチ{'予約投稿' if request_data['body']['status'] == 'future' else '投稿'}成功: {title}（WP ID: {body['id']}）")
+                results.append({"id": body["id"], "status": body.get("status", request_data["body"]["status"])})
+            else:
+                print(f"❌ バッチ投稿失敗: {title} → {status_code} {body.get('message', '')}")
+                stale_media = _invalid_featured_media(status_code, body)
+                if stale_media:
+                    # 記録を消したので、次の試行では画像をアップロードし直す
+                    _forget_deleted_media(site_url, request_data["body"]["featured_media"])
+                results.append(WordPressError(
+                    f"投稿失敗: HTTP {status_code} {body.get('message', '')}".strip(),
+                    status_code=status_code,
+                    retryable=stale_media or is_retryable_status(status_code),
+                ))
+
+    return results
 
 def log_upload_error(site_url, image_url, response):
-    response.encoding = response.apparent_encoding
     log_entry = (
         f"[{datetime.utcnow()}] 画像アップロード失敗\n"
         f"画像URL: {image_url}\n"
@@ -102,7 +561,6 @@ def log_upload_error(site_url, image_url, response):
         log_file.write(log_entry)
 
 def log_post_error(site_url, title, response):
-    response.encoding = response.apparent_encoding
     log_entry = (
         f"[{datetime.utcnow()}] 投稿失敗\n"
         f"サイト: {site_url}\n"
@@ -1,6 +1,7 @@
 # config.py
 
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -16,3 +17,113 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
     PIXABAY_API_KEY = os.getenv("PIXABAY_API_KEY")
+
+    # 記事生成ワーカー設定
+    # WORKER_MODE: sync（従来）/ async（AsyncOpenAI で同時生成）/ pipeline（ステージ並列）
+    WORKER_MODE = os.getenv("WORKER_MODE", "sync")
+    WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "10"))
+    WORKER_ASYNC_BATCH_SIZE = int(os.getenv("WORKER_ASYNC_BATCH_SIZE", "50"))
+    WORKER_IDLE_SECONDS = int(os.getenv("WORKER_IDLE_SECONDS", "30"))
+    PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "10"))  # ステージ間キューの上限
+    OUTLINE_SECTION_CONCURRENCY = int(os.getenv("OUTLINE_SECTION_CONCURRENCY", "6"))  # outline モードの同期版セクション並列数
+    TITLE_PREPASS_GROUPS = int(os.getenv("TITLE_PREPASS_GROUPS", "10"))  # 1サイクルでタイトル一括生成するキーワード数（0で無効）
+
+    # 外部APIのレート制限（全ワーカーで共有するトークンバケット、値は1分あたり）
+    # RATE_LIMIT_BACKEND: auto（PostgreSQLならdb、それ以外はfile）/ db / file / memory
+    RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "auto")
+    RATE_LIMIT_FILE = os.getenv("RATE_LIMIT_FILE", os.path.join(tempfile.gettempdir(), "ai-posting-ratelimit.json"))
+    RATE_LIMIT_MAX_RETRIES = int(os.getenv("RATE_LIMIT_MAX_RETRIES", "5"))  # 429 を受けた際の待機・再送回数
+    OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))  # OpenAI の 5xx・タイムアウト・接続エラーの再送回数
+    OPENAI_RPM = int(os.getenv("OPENAI_RPM", "500"))
+    OPENAI_TPM = int(os.getenv("OPENAI_TPM", "300000"))
+    PIXABAY_RPM = int(os.getenv("PIXABAY_RPM", "100"))
+
+    # 投稿確保のリース設定（ハートビートで延長、期限切れはリーパーが再キュー）
+    CLAIM_LEASE_SECONDS = int(os.getenv("CLAIM_LEASE_SECONDS", "300"))
+    WORKER_HEARTBEAT_SECONDS = int(os.getenv("WORKER_HEARTBEAT_SECONDS", "60"))
+    LEASE_REAPER_INTERVAL_SECONDS = int(os.getenv("LEASE_REAPER_INTERVAL_SECONDS", "120"))
+    MAX_JOB_ATTEMPTS = int(os.getenv("MAX_JOB_ATTEMPTS", "3"))
+
+    # 外部サービス（WordPress・Pixabay・画像）への HTTP 接続プール（app/http_client.py）
+    HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))  # プロセス全体の同時接続数
+    HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))  # 再利用のために残しておく接続数
+    HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))  # 使われていない接続を閉じるまでの秒数
+    HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+    HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "20"))  # 呼び出し側で指定しない場合の読み書きのタイムアウト
+    HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "true").lower() == "true"  # h2 パッケージがある場合のみ有効
+    IMAGE_MAX_BYTES = int(os.getenv("IMAGE_MAX_BYTES", str(10 * 1024 * 1024)))  # アイキャッチ画像の上限（超えたら画像なしで投稿）
+    # アップロード済み画像の再利用（wp_media）。画像URLが一致すればダウンロードもしない。
+    # 既定では照合はURLのみで、ダウンロードしながらそのままアップロードする。
+    # MEDIA_DEDUP_BY_HASH=true なら内容のハッシュでも照合する（一時ファイルに受けてからアップロードするので1回分遅くなる）
+    MEDIA_DEDUP_BY_HASH = os.getenv("MEDIA_DEDUP_BY_HASH", "false").lower() == "true"
+    MEDIA_SPOOL_BYTES = int(os.getenv("MEDIA_SPOOL_BYTES", str(1024 * 1024)))  # これを超える画像は一時ファイルをディスクに置く
+    # Pixabay の検索結果キャッシュ（image_search_cache、全ワーカーで共有）。TTL を 0 にすると無効
+    PIXABAY_CACHE_TTL_SECONDS = int(os.getenv("PIXABAY_CACHE_TTL_SECONDS", str(24 * 60 * 60)))
+    PIXABAY_CACHE_MAX_ENTRIES = int(os.getenv("PIXABAY_CACHE_MAX_ENTRIES", "5000"))  # 超えたら最後に使われたのが古いものから削除
+    PIXABAY_CACHE_RESULTS = int(os.getenv("PIXABAY_CACHE_RESULTS", "20"))  # 1回の検索で取得する件数（ヒットのたびに順番に返す）
+    # 画像キーワードの辞書変換（app/image_keywords.py）。タイトルを辞書で覆えた割合がこれ未満なら LLM で生成する
+    IMAGE_KEYWORD_MIN_CONFIDENCE = float(os.getenv("IMAGE_KEYWORD_MIN_CONFIDENCE", "0.6"))
+    IMAGE_KEYWORD_DICT_PATH = os.getenv("IMAGE_KEYWORD_DICT_PATH")  # 追加の辞書（JSON: {"日本語": "english"}、null で除外語）
+    # OpenAI の応答キャッシュ（app/llm_cache.py）。同じリクエストの応答を再利用する呼び出し元（カンマ区切り）
+    # image_keyword / outline / section / title / body / structured。既定はなし（image_keyword の結果は image_keywords に
+    # タイトルごとに保存するので二重に持たない。outline 等は temperature > 0 で兄弟投稿が同じプロンプトから別の記事を
+    # 作るため、対象にすると同じ内容になる）。管理画面からの再生成はキャッシュを使わない
+    LLM_CACHE_CALL_SITES = os.getenv("LLM_CACHE_CALL_SITES", "")
+    LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(24 * 60 * 60)))  # 0 で無効
+    LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))  # 超えたら最後に使われたのが古いものから削除
+
+    # WordPress への投稿の再試行（タイムアウト・429・5xx など一時的なエラーのみ。401/403 は再試行しない）
+    PUBLISH_MAX_ATTEMPTS = int(os.getenv("PUBLISH_MAX_ATTEMPTS", "5"))  # これを超えたら投稿失敗
+    PUBLISH_RETRY_BASE_SECONDS = int(os.getenv("PUBLISH_RETRY_BASE_SECONDS", "60"))  # 再試行の間隔（回数ごとに倍、ジッターあり）
+    PUBLISH_RETRY_MAX_SECONDS = int(os.getenv("PUBLISH_RETRY_MAX_SECONDS", "3600"))
+
+    # サイトごとのサーキットブレーカー（一時的なエラーが続いたサイトへの投稿を止め、間隔をあけて1件ずつ試す）
+    CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))  # 連続失敗がこの回数で停止
+    CIRCUIT_OPEN_SECONDS = int(os.getenv("CIRCUIT_OPEN_SECONDS", "300"))  # 停止時間（続けて停止するたびに倍）
+    CIRCUIT_MAX_OPEN_SECONDS = int(os.getenv("CIRCUIT_MAX_OPEN_SECONDS", "3600"))
+
+    # 生成順序（投稿予定時刻が近い順）と生成開始のタイミング
+    GENERATION_LEAD_HOURS = int(os.getenv("GENERATION_LEAD_HOURS", "48"))  # 投稿予定の何時間前から生成するか（0で制限なし）
+    GENERATION_EXPECTED_SECONDS = int(os.getenv("GENERATION_EXPECTED_SECONDS", "120"))  # 1記事の生成見込み（実測前の初期値）
+
+    # 生成枠の公平配分（FAIR_SHARE_MODE: user / site / off）
+    FAIR_SHARE_MODE = os.getenv("FAIR_SHARE_MODE", "user")
+    FAIR_SHARE_WEIGHTS = os.getenv("FAIR_SHARE_WEIGHTS", "")  # "ユーザー（サイト）ID:重み" のカンマ区切り、未指定は1
+    FAIR_SHARE_MAX_IN_FLIGHT = int(os.getenv("FAIR_SHARE_MAX_IN_FLIGHT", "0"))  # 1テナントの同時生成数上限（0で無制限）
+    FAIR_SHARE_QUOTAS = os.getenv("FAIR_SHARE_QUOTAS", "")  # 上限の個別指定 "ID:件数"
+
+    # 定期処理スケジューラー（Procfile の scheduler・render.yaml の ai-posting-scheduler が app/scheduler_worker.py で起動する。
+    # web プロセスの中で起動する場合は SCHEDULER_ENABLED=true）
+    # 複数プロセスで起動しても、DBのリースを保持したリーダー1つだけが処理する
+    SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "false").lower() == "true"
+    SCHEDULER_LEASE_SECONDS = int(os.getenv("SCHEDULER_LEASE_SECONDS", "30"))
+    SCHEDULER_LEASE_RENEW_SECONDS = int(os.getenv("SCHEDULER_LEASE_RENEW_SECONDS", "10"))
+    SCHEDULER_TICK_SECONDS = int(os.getenv("SCHEDULER_TICK_SECONDS", "60"))  # 生成・投稿の振り分け間隔
+    SCHEDULER_GENERATE_WORKERS = int(os.getenv("SCHEDULER_GENERATE_WORKERS", "3"))  # 生成プールのスレッド数
+    SCHEDULER_PUBLISH_WORKERS = int(os.getenv("SCHEDULER_PUBLISH_WORKERS", "8"))  # 投稿プールのスレッド数（全サイト合計の同時投稿数）
+    SCHEDULER_METRICS_REPORT_TICKS = int(os.getenv("SCHEDULER_METRICS_REPORT_TICKS", "60"))  # 何 tick ごとにメトリクスを出力するか
+
+    # WordPress への投稿方式
+    # publish: 投稿予定時刻にスケジューラーが公開（従来）
+    # future: 生成完了の時点で予約投稿（status=future）として送り、公開は WordPress に任せる
+    WP_PUBLISH_MODE = os.getenv("WP_PUBLISH_MODE", "publish")
+    WP_PUBLISH_MAX_PER_HOST = int(os.getenv("WP_PUBLISH_MAX_PER_HOST", "2"))  # 同じホストへの同時投稿数
+    # WP_BATCH_ENABLED=true なら /wp-json/batch/v1（WordPress 5.6+）に対応したサイトへは WP_BATCH_SIZE 件（最大25）ずつまとめて送る
+    # （既定は1件ずつ。バッチは全件を1リクエストで送るので、遅いサイトでは1件の失敗・タイムアウトが全件に及ぶ）
+    WP_BATCH_ENABLED = os.getenv("WP_BATCH_ENABLED", "false").lower() == "true"
+    WP_BATCH_SIZE = int(os.getenv("WP_BATCH_SIZE", "25"))
+
+    # 即時投稿・再生成の優先レーン（ワーカープロセス内で一括生成とは別スレッドで処理）
+    PRIORITY_LANE_THREADS = int(os.getenv("PRIORITY_LANE_THREADS", "2"))
+    PRIORITY_POLL_SECONDS = int(os.getenv("PRIORITY_POLL_SECONDS", "2"))
+    PRIORITY_JOB_TIMEOUT_SECONDS = int(os.getenv("PRIORITY_JOB_TIMEOUT_SECONDS", "900"))  # これを過ぎた実行中ジョブは失敗扱い
+
+    # OpenAI Batch API による一括生成（投稿予定が BATCH_MIN_LEAD_HOURS 以上先の記事が対象）
+    BATCH_API_ENABLED = os.getenv("BATCH_API_ENABLED", "false").lower() == "true"
+    BATCH_MIN_LEAD_HOURS = int(os.getenv("BATCH_MIN_LEAD_HOURS", "36"))  # 24時間の完了枠 + 画像取得・投稿の余裕
+    BATCH_MAX_POSTS = int(os.getenv("BATCH_MAX_POSTS", "1000"))  # 1バッチあたりの投稿数
+    BATCH_LEASE_HOURS = int(os.getenv("BATCH_LEASE_HOURS", "26"))  # バッチが確保した投稿のリース
+    BATCH_POLL_SECONDS = int(os.getenv("BATCH_POLL_SECONDS", "600"))
+    BATCH_APPLY_LEASE_SECONDS = int(os.getenv("BATCH_APPLY_LEASE_SECONDS", "600"))  # 結果の反映中のリース（1件反映するごとに延長）
+    OPENAI_BATCH_BASE_URL = os.getenv("OPENAI_BATCH_BASE_URL")  # フェイクエンドポイント等に向ける場合のみ
+    BATCH_TRANSPORT = os.getenv("BATCH_TRANSPORT")  # "module:Class" 形式で通信部分を差し替え
@@ -0,0 +1,67 @@
+"""Add composite and partial indexes for scheduler, worker and admin log queries
+
+Revision ID: d2a9c6e4f817
+Revises: 5e0b8f3a7c21
+Create Date: 2026-10-18 22:06:14.583120
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2a9c6e4f817'
+down_revision = '5e0b8f3a7c21'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 行数の多い scheduled_posts への書き込みを止めないよう、PostgreSQL では CONCURRENTLY で作成する
+    # （CONCURRENTLY はトランザクション内で実行できないため autocommit_block の中で作る）
+    concurrently = op.get_bind().dialect.name == "postgresql"
+    with op.get_context().autocommit_block():
+        with op.batch_alter_table('articles', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_articles_site_id'), ['site_id'], unique=False, postgresql_concurrently=concurrently)
+
+        with op.batch_alter_table('priority_jobs', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_priority_jobs_post_id'), ['post_id'], unique=False, postgresql_concurrently=concurrently)
+            batch_op.create_index('ix_priority_jobs_user_created_at', ['user_id', 'created_at'], unique=False, postgresql_concurrently=concurrently)
+
+        with op.batch_alter_table('prompt_templates', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_prompt_templates_user_id'), ['user_id'], unique=False, postgresql_concurrently=concurrently)
+
+        with op.batch_alter_table('scheduled_posts', schema=None) as batch_op:
+            batch_op.create_index('ix_scheduled_posts_batch_id', ['batch_id'], unique=False, postgresql_where=sa.text('batch_id IS NOT NULL'), sqlite_where=sa.text('batch_id IS NOT NULL'), postgresql_concurrently=concurrently)
+            batch_op.create_index('ix_scheduled_posts_claimed', ['claimed_by', 'lease_expires_at'], unique=False, postgresql_where=sa.text('claimed_by IS NOT NULL'), sqlite_where=sa.text('claimed_by IS NOT NULL'), postgresql_concurrently=concurrently)
+            batch_op.create_index('ix_scheduled_posts_site_user_status', ['site_id', 'user_id', 'status', 'created_at'], unique=False, postgresql_concurrently=concurrently)
+            batch_op.create_index('ix_scheduled_posts_status_scheduled_time', ['status', 'scheduled_time'], unique=False, postgresql_concurrently=concurrently)
+            batch_op.create_index('ix_scheduled_posts_user_status', ['user_id', 'status'], unique=False, postgresql_concurrently=concurrently)
+
+        with op.batch_alter_table('sites', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_sites_user_id'), ['user_id'], unique=False, postgresql_concurrently=concurrently)
+
+
+def downgrade():
+    # ### commands auto generated by Alembic - please adjust! ###
+    with op.batch_alter_table('sites', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_sites_user_id'))
+
+    with op.batch_alter_table('scheduled_posts', schema=None) as batch_op:
+        batch_op.drop_index('ix_scheduled_posts_user_status')
+        batch_op.drop_index('ix_scheduled_posts_status_scheduled_time')
+        batch_op.drop_index('ix_scheduled_posts_site_user_status')
+        batch_op.drop_index('ix_scheduled_posts_claimed', postgresql_where=sa.text('claimed_by IS NOT NULL'), sqlite_where=sa.text('claimed_by IS NOT NULL'))
+        batch_op.drop_index('ix_scheduled_posts_batch_id', postgresql_where=sa.text('batch_id IS NOT NULL'), sqlite_where=sa.text('batch_id IS NOT NULL'))
+
+    with op.batch_alter_table('prompt_templates', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_prompt_templates_user_id'))
+
+    with op.batch_alter_table('priority_jobs', schema=None) as batch_op:
+        batch_op.drop_index('ix_priority_jobs_user_created_at')
+        batch_op.drop_index(batch_op.f('ix_priority_jobs_post_id'))
+
+    with op.batch_alter_table('articles', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_articles_site_id'))
+
+    # ### end Alembic commands ###
@@ -0,0 +1,190 @@
+# 📄 scripts/index_benchmark.py
+
+import os
+import sys
+import time
+import random
+import tempfile
+import statistics
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, select, insert, inspect, func, or_, text
+
+# 🔧 Render環境対応のパス追加
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.models import db, User, Site, ScheduledPost
+
+# scheduled_posts の索引（d2a9c6e4f817）の効果を測るベンチマーク。
+# 空のDBにテーブルを作って投稿を ROWS 件入れ、スケジューラー・ワーカー・投稿ログ画面と同じ形のクエリの
+# 実行計画と所要時間（中央値）を、索引なし → 索引あり の順に出力する。
+#   python scripts/index_benchmark.py [DATABASE_URL] [ROWS]
+# DATABASE_URL を省略すると一時ファイルの SQLite を使う。本番のDBには向けないこと
+# （scheduled_posts が既にあるDBでは実行しない）。
+
+ROWS = 1_000_000
+USERS = 1000
+SITES_PER_USER = 3
+REPEAT = 5
+INSERT_CHUNK = 50_000
+
+# ほとんどは投稿済みで、ポーリング対象のステータスはごく一部という実運用に近い分布
+STATUS_WEIGHTS = {
+    "投稿済み": 90,
+    "予約済み": 3,
+    "生成完了": 2,
+    "生成中": 2,
+    "生成待ち": 2,
+    "投稿失敗": 0.5,
+    "生成失敗": 0.5,
+}
+ACTIVE_STATUSES = ("予約済み", "生成完了", "生成中", "生成待ち")  # これから処理・公開される投稿
+
+def _posts(count, now):
+    statuses = random.choices(list(STATUS_WEIGHTS), weights=list(STATUS_WEIGHTS.values()), k=count)
+    for status in statuses:
+        user_id = random.randint(1, USERS)
+        site_id = (user_id - 1) * SITES_PER_USER + random.randint(1, SITES_PER_USER)
+        if status in ACTIVE_STATUSES:
+            scheduled_time = now + timedelta(minutes=random.randint(-60, 43_200))  # 直近1時間〜30日後
+        else:
+            scheduled_time = now - timedelta(minutes=random.randint(0, 525_600))  # 過去1年
+        claimed = status == "生成中" and random.random() < 0.05
+        yield dict(
+            keyword=f"kw{random.randint(1, 50_000)}",
+            title="生成中...",
+            status=status,
+            scheduled_time=scheduled_time,
+            created_at=scheduled_time - timedelta(days=random.randint(1, 30)),
+            generation_mode="standard",
+            claimed_by="bench:1" if claimed else None,
+            claimed_at=now if claimed else None,
+            lease_expires_at=now + timedelta(seconds=random.randint(-600, 300)) if claimed else None,
+            attempts=0,
+            site_url=f"https://site{site_id}.example.com/",
+            username="bench",
+            app_password="bench",
+            user_id=user_id,
+            site_id=site_id,
+        )
+
+def load(engine, rows):
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(insert(User.__table__), [
+            dict(id=i, email=f"u{i}@example.com", username=f"u{i}", password_hash="x", is_active_flag=True)
+            for i in range(1, USERS + 1)
+        ])
+        conn.execute(insert(Site.__table__), [
+            dict(id=i, site_url=f"https://site{i}.example.com/", wp_username="bench", wp_app_password="bench",
+                 user_id=(i - 1) // SITES_PER_USER + 1)
+            for i in range(1, USERS * SITES_PER_USER + 1)
+        ])
+    posts = _posts(rows, now)
+    for offset in range(0, rows, INSERT_CHUNK):
+        chunk = [next(posts) for _ in range(min(INSERT_CHUNK, rows - offset))]
+        with engine.begin() as conn:
+            conn.execute(insert(ScheduledPost.__table__), chunk)
+        print(f"📥 {offset + len(chunk):,} / {rows:,} 件")
+
+def queries(now):
+    """本体と同じ形のクエリ（名前 → SELECT）"""
+    unclaimed = ScheduledPost.claimed_by.is_(None)
+    return {
+        # scheduler.dispatch_generation: 生成開始時刻を過ぎた生成待ち
+        "scheduler 生成待ち": select(ScheduledPost.id)
+            .where(ScheduledPost.status == "生成待ち", ScheduledPost.scheduled_time <= now, unclaimed)
+            .order_by(ScheduledPost.scheduled_time).limit(50),
+        # scheduler._dispatch_publish: 投稿予定時刻を過ぎた生成完了（ホストごと）
+        "scheduler 投稿": select(ScheduledPost.site_url, func.min(ScheduledPost.scheduled_time))
+            .where(
+                ScheduledPost.status == "生成完了", ScheduledPost.scheduled_time <= now, unclaimed,
+                or_(ScheduledPost.next_attempt_at.is_(None), ScheduledPost.next_attempt_at <= now),
+            )
+            .group_by(ScheduledPost.site_url).order_by(func.min(ScheduledPost.scheduled_time)),
+        # scheduler: WordPress 側で公開されたはずの予約済み
+        "scheduler 予約済み": select(ScheduledPost.id)
+            .where(ScheduledPost.status == "予約済み", ScheduledPost.scheduled_time <= now),
+        # article_worker: 生成期間に入った生成中（締め切り順）
+        "worker 生成中": select(ScheduledPost.id)
+            .where(
+                ScheduledPost.status == "生成中", unclaimed,
+                or_(ScheduledPost.scheduled_time.is_(None), ScheduledPost.scheduled_time <= now + timedelta(hours=24)),
+            )
+            .order_by(ScheduledPost.scheduled_time, ScheduledPost.created_at).limit(50),
+        # fair_share.queue_depths: ユーザーごとのキュー深さ
+        "worker キュー深さ": select(ScheduledPost.user_id, func.count())
+            .where(ScheduledPost.status == "生成中").group_by(ScheduledPost.user_id),
+        # job_queue.reap_expired_leases: リース期限切れの確保
+        "reaper 期限切れ": select(ScheduledPost.id)
+            .where(ScheduledPost.claimed_by.isnot(None), ScheduledPost.lease_expires_at < now),
+        # routes.admin_log: サイトの投稿一覧（ステータス指定なし・あり）
+        "投稿ログ": select(ScheduledPost.id)
+            .where(ScheduledPost.site_id == 2, ScheduledPost.user_id == 1)
+            .order_by(ScheduledPost.created_at.desc()),
+        "投稿ログ（ステータス）": select(ScheduledPost.id)
+            .where(ScheduledPost.site_id == 2, ScheduledPost.user_id == 1, ScheduledPost.status == "投稿済み")
+            .order_by(ScheduledPost.created_at.desc()),
+    }
+
+def _sql(engine, stmt):
+    return str(stmt.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+
+def plan(engine, stmt):
+    prefix = "EXPLAIN QUERY PLAN " if engine.dialect.name == "sqlite" else "EXPLAIN "
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(prefix + _sql(engine, stmt)).all()
+    return [row[-1] for row in rows]
+
+def latency_ms(engine, stmt):
+    timings = []
+    with engine.connect() as conn:
+        for _ in range(REPEAT):
+            started = time.perf_counter()
+            conn.execute(stmt).all()
+            timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+def measure(engine, now, label):
+    print(f"\n===== {label} =====")
+    results = {}
+    for name, stmt in queries(now).items():
+        results[name] = latency_ms(engine, stmt)
+        print(f"\n▶ {name}: {results[name]:.1f} ms")
+        for line in plan(engine, stmt):
+            print(f"    {line}")
+    return results
+
+def main():
+    url = sys.argv[1] if len(sys.argv) > 1 else "sqlite:///" + os.path.join(tempfile.mkdtemp(), "index_benchmark.db")
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else ROWS
+    engine = create_engine(url)
+    if inspect(engine).has_table(ScheduledPost.__tablename__):
+        sys.exit("❌ scheduled_posts が既にあるDBでは実行できません（空のDBを指定してください）")
+
+    print(f"🧪 索引ベンチマーク: {engine.url.render_as_string(hide_password=True)} / {rows:,} 件")
+    random.seed(0)
+    db.metadata.create_all(engine)
+    indexes = sorted(ScheduledPost.__table__.indexes, key=lambda index: index.name)
+    for index in indexes:
+        index.drop(engine)
+    load(engine, rows)
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+
+    now = datetime.utcnow()
+    before = measure(engine, now, "索引なし")
+
+    for index in indexes:
+        started = time.perf_counter()
+        index.create(engine)
+        print(f"🔧 {index.name} 作成: {time.perf_counter() - started:.1f}s")
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+    after = measure(engine, now, "索引あり")
+
+    print("\n===== まとめ（中央値） =====")
+    for name in before:
+        print(f"{name:<16} {before[name]:>9.1f} ms → {after[name]:>8.1f} ms（{before[name] / max(after[name], 0.001):.0f}倍）")
+
+if __name__ == "__main__":
+    main()
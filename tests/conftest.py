@@ -0,0 +1,62 @@
+# 📄 tests/conftest.py
+
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+import pytest
+
+# config.py は import 時に環境変数を読むので、app より先に設定する
+_db_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(_db_dir, "test.db")
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+os.environ["SCHEDULER_ENABLED"] = "false"
+os.environ["RATE_LIMIT_BACKEND"] = "memory"
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app import create_app
+from app.models import db, User, Site, ScheduledPost
+
+@pytest.fixture
+def app():
+    app = create_app(start_scheduler=False)
+    app.config["TESTING"] = True
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def site(app):
+    user = User(email="user@example.com", username="user", password_hash="x")
+    db.session.add(user)
+    db.session.commit()
+    site = Site(site_url="https://example.com", wp_username="wp", wp_app_password="pass", user_id=user.id)
+    db.session.add(site)
+    db.session.commit()
+    return site
+
+@pytest.fixture
+def make_post(site):
+    """ScheduledPost を1件作って返す（指定しない列はテスト用の値）"""
+    def make(**values):
+        post = ScheduledPost(**{
+            "keyword": "キーワード",
+            "title": "タイトル",
+            "body": "",
+            "status": "生成中",
+            "scheduled_time": datetime.utcnow(),
+            "site_url": site.site_url,
+            "username": site.wp_username,
+            "app_password": site.wp_app_password,
+            "user_id": site.user_id,
+            "site_id": site.id,
+            **values,
+        })
+        db.session.add(post)
+        db.session.commit()
+        return post
+    return make
@@ -0,0 +1,164 @@
+# 📄 tests/test_batch_generation.py
+
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import batch_generation
+from app.models import db, ScheduledPost, GenerationBatch
+from app.article_generator import TITLE_PLACEHOLDER
+from app.batch_generation import submit_batch, poll_batches, batch_worker_id, realtime_filters
+from app.job_queue import now_jst
+
+BODY = "<h2>見出し</h2>" + "本文" * 150
+
+class FakeTransport:
+    """OpenAIBatchTransport の代わり（BATCH_TRANSPORT に指定する）。状態はクラス変数に持ち、インスタンスをまたいで共有する"""
+    files = {}
+    batches = {}
+
+    def upload_file(self, filename, content):
+        file_id = f"file-{len(self.files)}"
+        self.files[file_id] = content.decode("utf-8")
+        return file_id
+
+    def create_batch(self, input_file_id, metadata=None):
+        batch_id = f"batch_{len(self.batches)}"
+        self.batches[batch_id] = {"id": batch_id, "status": "validating", "input_file_id": input_file_id}
+        return dict(self.batches[batch_id])
+
+    def retrieve_batch(self, provider_batch_id):
+        return dict(self.batches[provider_batch_id])
+
+    def download_file(self, file_id):
+        return self.files[file_id]
+
+    @classmethod
+    def finish(cls, provider_batch_id, status="completed", failed=()):
+        """入力の各行に答えた出力ファイルを作る。failed の custom_id はエラー行にする"""
+        batch = cls.batches[provider_batch_id]
+        lines = []
+        for line in cls.files[batch["input_file_id"]].splitlines():
+            custom_id = json.loads(line)["custom_id"]
+            if custom_id in failed:
+                lines.append(json.dumps({"custom_id": custom_id, "response": {"status_code": 500, "body": {}}, "error": None}))
+                continue
+            content = json.dumps({"title": f"生成 {custom_id}", "body": BODY, "image_keywords": "tea"})
+            message = {"message": {"content": content}}
+            lines.append(json.dumps({"custom_id": custom_id, "response": {"status_code": 200, "body": {"choices": [message]}}}))
+        cls.files[f"out-{provider_batch_id}"] = "\n".join(lines)
+        batch.update(
+            status=status,
+            output_file_id=f"out-{provider_batch_id}",
+            request_counts={"completed": len(lines) - len(failed), "failed": len(failed)},
+        )
+
+@pytest.fixture
+def batch_app(app, monkeypatch):
+    app.config["BATCH_API_ENABLED"] = True
+    app.config["BATCH_TRANSPORT"] = f"{__name__}:FakeTransport"
+    monkeypatch.setattr(FakeTransport, "files", {})
+    monkeypatch.setattr(FakeTransport, "batches", {})
+    monkeypatch.setattr(batch_generation, "search_images", lambda keywords, num_images=1: [f"https://img.example/{keywords}.jpg"])
+    return app
+
+@pytest.fixture
+def make_batch_post(make_post):
+    def make(**values):
+        return make_post(**{
+            "title": TITLE_PLACEHOLDER,
+            "prompt_title": "タイトルを作って",
+            "prompt_body": "本文を書いて",
+            "scheduled_time": now_jst() + timedelta(days=5),
+            **values,
+        })
+    return make
+
+def _posts():
+    db.session.expire_all()
+    return ScheduledPost.query.order_by(ScheduledPost.id).all()
+
+def test_submit_poll_and_apply(batch_app, make_batch_post):
+    posts = [make_batch_post() for _ in range(3)]
+    soon = make_batch_post(scheduled_time=now_jst() + timedelta(hours=1))
+
+    batch = submit_batch()
+
+    assert (batch.status, batch.post_count) == ("validating", 3)
+    assert all(post.batch_id == batch.id and post.claimed_by == batch_worker_id(batch.id) for post in _posts()[:3])
+    assert db.session.get(ScheduledPost, soon.id).batch_id is None
+    assert submit_batch() is None  # 対象が残っていなければバッチを作らない
+
+    poll_batches()
+    assert db.session.get(GenerationBatch, batch.id).status == "validating"
+
+    FakeTransport.finish(batch.provider_batch_id)
+    poll_batches()
+
+    batch = db.session.get(GenerationBatch, batch.id)
+    assert (batch.status, batch.succeeded_count, batch.applying_until) == ("applied", 3, None)
+    for post in _posts()[:3]:
+        assert (post.status, post.claimed_by) == ("生成完了", None)
+        assert post.title == f"生成 post-{post.id}"
+        assert post.featured_image == "https://img.example/tea.jpg"
+    assert {post.id for post in posts} == {post.id for post in _posts() if post.status == "生成完了"}
+
+def test_partially_failed_output_returns_posts_to_realtime(batch_app, make_batch_post):
+    first, failed, missing = make_batch_post(), make_batch_post(), make_batch_post()
+    batch = submit_batch()
+    FakeTransport.finish(batch.provider_batch_id, failed=(f"post-{failed.id}",))
+    # 出力に行がない投稿（途中で失効した等）
+    output = FakeTransport.files[f"out-{batch.provider_batch_id}"].splitlines()
+    FakeTransport.files[f"out-{batch.provider_batch_id}"] = "\n".join(
+        line for line in output if json.loads(line)["custom_id"] != f"post-{missing.id}"
+    )
+
+    poll_batches()
+
+    batch = db.session.get(GenerationBatch, batch.id)
+    assert (batch.status, batch.succeeded_count, batch.failed_count) == ("applied", 1, 1)
+    posts = {post.id: post for post in _posts()}
+    assert posts[first.id].status == "生成完了"
+    for post_id in (failed.id, missing.id):
+        # 確保を外して通常生成に回す（batch_id は残るので再びバッチには載らない）
+        assert (posts[post_id].status, posts[post_id].claimed_by, posts[post_id].batch_id) == ("生成中", None, batch.id)
+    realtime = ScheduledPost.query.filter(ScheduledPost.status == "生成中", *realtime_filters()).all()
+    assert {post.id for post in realtime} == {failed.id, missing.id}
+
+def _crash_while_applying(batch, applied_post, lease_left):
+    """1件反映したところで落ちた状態にする"""
+    applied_post = db.session.get(ScheduledPost, applied_post.id)
+    applied_post.status = "生成完了"
+    applied_post.claimed_by = None
+    applied_post.lease_expires_at = None
+    batch.status = "applying"
+    batch.succeeded_count = 1
+    batch.applying_until = datetime.utcnow() + lease_left
+    db.session.commit()
+
+def test_applying_resumes_after_lease_expires(batch_app, make_batch_post):
+    done, rest = make_batch_post(), make_batch_post()
+    batch = submit_batch()
+    FakeTransport.finish(batch.provider_batch_id)
+    _crash_while_applying(batch, done, timedelta(seconds=-1))
+
+    poll_batches()
+
+    batch = db.session.get(GenerationBatch, batch.id)
+    assert (batch.status, batch.succeeded_count) == ("applied", 2)
+    posts = {post.id: post for post in _posts()}
+    assert posts[done.id].title == TITLE_PLACEHOLDER  # 反映済みの投稿はやり直さない
+    assert (posts[rest.id].status, posts[rest.id].title) == ("生成完了", f"生成 post-{rest.id}")
+
+def test_applying_is_left_alone_while_lease_is_live(batch_app, make_batch_post):
+    done, rest = make_batch_post(), make_batch_post()
+    batch = submit_batch()
+    FakeTransport.finish(batch.provider_batch_id)
+    _crash_while_applying(batch, done, timedelta(minutes=5))
+
+    poll_batches()
+
+    batch = db.session.get(GenerationBatch, batch.id)
+    assert (batch.status, batch.succeeded_count) == ("applying", 1)
+    assert db.session.get(ScheduledPost, rest.id).claimed_by == batch_worker_id(batch.id)
@@ -0,0 +1,128 @@
+# 📄 tests/test_caches.py
+
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from app.models import db, LlmCache, ImageSearchCache
+from app.db_cache import upsert, evict
+from app import image_cache, llm_cache
+
+def _keys(model):
+    db.session.expire_all()
+    return {row.cache_key for row in db.session.query(model).all()}
+
+def _llm_row(key, expires_in, used_ago):
+    now = datetime.utcnow()
+    return dict(call_site="image_keyword", content=key, expires_at=now + timedelta(seconds=expires_in),
+                last_used_at=now - timedelta(seconds=used_ago))
+
+def test_upsert_inserts_then_overwrites(app):
+    table = LlmCache.__table__
+    upsert(table, dict(cache_key="a"), _llm_row("first", 60, 0))
+    upsert(table, dict(cache_key="a"), _llm_row("second", 60, 0))
+
+    assert [row.content for row in LlmCache.query.all()] == ["second"]
+
+def test_evict_drops_expired_then_least_recently_used(app):
+    table = LlmCache.__table__
+    upsert(table, dict(cache_key="expired"), _llm_row("expired", -1, 0))
+    upsert(table, dict(cache_key="oldest"), _llm_row("oldest", 60, 30))
+    upsert(table, dict(cache_key="older"), _llm_row("older", 60, 20))
+    upsert(table, dict(cache_key="newest"), _llm_row("newest", 60, 10))
+
+    evict(table, datetime.utcnow(), max_entries=2)
+
+    assert _keys(LlmCache) == {"older", "newest"}
+
+def test_image_cache_rotates_and_expires(app):
+    params = {"q": "tea", "key": "secret", "per_page": 20}
+    assert image_cache.take_cached(params, 1) is None
+
+    assert image_cache.store_results(params, ["a", "b", "c"], 1) == ["a"]
+    # 兄弟投稿には続きの画像を返す（APIキーはキャッシュキーに含めない）
+    assert image_cache.take_cached(dict(params, key="other"), 1) == ["b"]
+    assert image_cache.take_cached(params, 2) == ["c", "a"]
+
+    # query 列が Model.query を隠すので db.session から操作する
+    db.session.query(ImageSearchCache).update({"expires_at": datetime.utcnow() - timedelta(seconds=1)})
+    db.session.commit()
+    assert image_cache.take_cached(params, 1) is None
+
+def test_image_cache_evicts_over_max_entries(app):
+    app.config["PIXABAY_CACHE_MAX_ENTRIES"] = 2
+    for query in ("a", "b", "c"):
+        image_cache.store_results({"q": query}, [f"https://img/{query}.jpg"], 1)
+
+    assert {row.query for row in db.session.query(ImageSearchCache).all()} == {"b", "c"}
+
+class _FakeCompletions:
+    def __init__(self):
+        self.calls = 0
+
+    def create(self, **request):
+        self.calls += 1
+        message = SimpleNamespace(content=f"answer {self.calls}")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason="stop")])
+
+class _FakeAsyncCompletions(_FakeCompletions):
+    async def create(self, **request):
+        return super().create(**request)
+
+def _client(completions):
+    return SimpleNamespace(chat=SimpleNamespace(completions=completions))
+
+@pytest.fixture
+def cached_app(app):
+    app.config["LLM_CACHE_CALL_SITES"] = "image_keyword"
+    return app
+
+def test_llm_cache_caches_nothing_by_default(app):
+    client = _client(_FakeCompletions())
+    request = dict(model="gpt-4-turbo", messages=[{"role": "user", "content": "東京"}], temperature=0.5)
+
+    # image_keyword は image_keywords テーブルに保存するので、既定では llm_cache に持たない
+    assert llm_cache.complete(client, "image_keyword", **request) == "answer 1"
+    assert llm_cache.complete(client, "image_keyword", **request) == "answer 2"
+
+def test_llm_cache_only_caches_configured_call_sites(cached_app):
+    completions = _FakeCompletions()
+    client = _client(completions)
+    request = dict(model="gpt-4-turbo", messages=[{"role": "user", "content": "東京"}], temperature=0.5)
+
+    assert llm_cache.complete(client, "image_keyword", **request) == "answer 1"
+    assert llm_cache.complete(client, "image_keyword", **request) == "answer 1"
+    # 挙げていない outline 等は対象外（兄弟投稿に同じ内容を返さない）
+    assert llm_cache.complete(client, "outline", **request) == "answer 2"
+    assert llm_cache.complete(client, "outline", **request) == "answer 3"
+
+def test_llm_cache_refreshing_bypasses_and_overwrites(cached_app):
+    completions = _FakeCompletions()
+    client = _client(completions)
+    request = dict(model="gpt-4-turbo", messages=[{"role": "user", "content": "東京"}])
+    llm_cache.complete(client, "image_keyword", **request)
+
+    with llm_cache.refreshing():
+        assert llm_cache.complete(client, "image_keyword", **request) == "answer 2"
+    assert llm_cache.complete(client, "image_keyword", **request) == "answer 2"
+
+def test_llm_cache_async_shares_entries(cached_app):
+    completions = _FakeAsyncCompletions()
+    client = _client(completions)
+    request = dict(model="gpt-4-turbo", messages=[{"role": "user", "content": "東京"}])
+
+    async def run():
+        return [await llm_cache.complete_async(client, "image_keyword", **request) for _ in range(2)]
+
+    assert asyncio.run(run()) == ["answer 1", "answer 1"]
+    assert completions.calls == 1
+
+def test_llm_cache_evicts_over_max_entries(cached_app):
+    cached_app.config["LLM_CACHE_MAX_ENTRIES"] = 1
+    client = _client(_FakeCompletions())
+    for content in ("a", "b"):
+        llm_cache.complete(client, "image_keyword", model="gpt-4-turbo", messages=[{"role": "user", "content": content}])
+
+    assert [row.content for row in LlmCache.query.all()] == ["answer 2"]
@@ -0,0 +1,48 @@
+# 📄 tests/test_fair_share.py
+
+from app.models import db, User, ScheduledPost
+from app.fair_share import allocate_slots, claim_fair_share, queue_depths
+
+def _depths(**tenants):
+    """_depths(a=(待ち, 生成中), ...) → queue_depths と同じ形"""
+    return {tenant: {"pending": pending, "in_flight": in_flight} for tenant, (pending, in_flight) in tenants.items()}
+
+def test_large_backlog_cannot_take_every_slot():
+    slots = allocate_slots(_depths(big=(5000, 0), small=(3, 0)), 4)
+
+    assert slots == {"big": 2, "small": 2}
+
+def test_unused_slots_go_to_the_others():
+    # small は1件しかないので、残りは big に回す（枠を空けたままにしない）
+    assert allocate_slots(_depths(big=(5000, 0), small=(1, 0)), 4) == {"big": 3, "small": 1}
+    # 生成待ちが0件のテナントには割り当てない
+    assert allocate_slots(_depths(big=(5000, 2), idle=(0, 1)), 3) == {"big": 3}
+
+def test_in_flight_counts_as_already_served():
+    slots = allocate_slots(_depths(big=(5000, 3), small=(10, 0)), 3)
+
+    assert slots == {"small": 3}
+
+def test_weights_and_quotas():
+    depths = _depths(a=(100, 0), b=(100, 0), c=(100, 0))
+
+    assert allocate_slots(depths, 8, weights={"a": 2}) == {"a": 4, "b": 2, "c": 2}
+    assert allocate_slots(depths, 6, weights={"c": 0}) == {"a": 3, "b": 3}
+    assert allocate_slots(depths, 6, quotas={"a": 1}, default_quota=2) == {"a": 1, "b": 2, "c": 2}
+
+def test_claim_fair_share_splits_slots_between_users(app, site, make_post):
+    other = User(email="other@example.com", username="other", password_hash="x")
+    db.session.add(other)
+    db.session.commit()
+    for _ in range(20):
+        make_post()  # site の持ち主の大量の生成待ち
+    small = make_post(user_id=other.id)
+
+    filters = [ScheduledPost.status == "生成中"]
+    claimed = claim_fair_share(filters, 4, worker_id="me:1")
+
+    owners = [post.user_id for post in claimed]
+    assert len(claimed) == 4
+    assert owners.count(other.id) == 1 and small.id in {post.id for post in claimed}
+    assert owners.count(site.user_id) == 3
+    assert queue_depths(filters) == {site.user_id: {"pending": 17, "in_flight": 3}, other.id: {"pending": 0, "in_flight": 1}}
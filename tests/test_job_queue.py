@@ -0,0 +1,94 @@
+# 📄 tests/test_job_queue.py
+
+from datetime import datetime, timedelta
+
+from app.models import db, ScheduledPost
+from app.job_queue import claim_posts, clear_claim, release_claim, renew_leases, reap_expired_leases, mark_generated
+
+def _reload(post_id):
+    db.session.expire_all()
+    return db.session.get(ScheduledPost, post_id)
+
+def _expire_lease(post_id):
+    db.session.get(ScheduledPost, post_id).lease_expires_at = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+
+def test_claim_posts_claims_only_unclaimed_posts_in_order(make_post):
+    later = make_post(scheduled_time=datetime.utcnow() + timedelta(hours=2))
+    sooner = make_post(scheduled_time=datetime.utcnow() + timedelta(hours=1))
+    taken = make_post()
+    claim_posts([ScheduledPost.id == taken.id], [ScheduledPost.id], worker_id="other:1")
+
+    claimed = claim_posts([ScheduledPost.status == "生成中"], [ScheduledPost.scheduled_time], worker_id="me:1")
+
+    assert [post.id for post in claimed] == [sooner.id, later.id]
+    assert all(post.claimed_by == "me:1" and post.lease_expires_at for post in claimed)
+    assert _reload(taken.id).claimed_by == "other:1"
+
+def test_claim_posts_respects_limit_and_lease(app, make_post):
+    for _ in range(3):
+        make_post()
+
+    claimed = claim_posts([ScheduledPost.status == "生成中"], [ScheduledPost.id], limit=2, worker_id="me:1", lease_seconds=60)
+
+    assert len(claimed) == 2
+    lease = claimed[0].lease_expires_at - claimed[0].claimed_at
+    assert lease == timedelta(seconds=60)
+    assert claim_posts([ScheduledPost.status == "生成中"], [ScheduledPost.id], worker_id="me:2")[0].id not in {p.id for p in claimed}
+
+def test_release_and_clear_claim(make_post):
+    first, second = make_post(), make_post()
+    claim_posts([ScheduledPost.id.in_([first.id, second.id])], [ScheduledPost.id], worker_id="me:1")
+
+    release_claim(first.id)
+    post = _reload(second.id)
+    mark_generated(post)
+    clear_claim(post)
+    db.session.commit()
+
+    first, second = _reload(first.id), _reload(second.id)
+    assert (first.claimed_by, first.lease_expires_at, first.status) == (None, None, "生成中")
+    assert (second.claimed_by, second.lease_expires_at, second.status) == (None, None, "生成完了")
+
+def test_renew_leases_extends_only_own_claims(make_post):
+    mine, theirs = make_post(), make_post()
+    claim_posts([ScheduledPost.id == mine.id], [ScheduledPost.id], worker_id="me:1")
+    claim_posts([ScheduledPost.id == theirs.id], [ScheduledPost.id], worker_id="other:1")
+    _expire_lease(mine.id)
+    _expire_lease(theirs.id)
+
+    assert renew_leases("me:1") == 1
+    assert _reload(mine.id).lease_expires_at > datetime.utcnow()
+    assert _reload(theirs.id).lease_expires_at < datetime.utcnow()
+
+def test_reap_requeues_expired_claims_and_leaves_live_ones(make_post):
+    expired, live = make_post(), make_post()
+    claim_posts([ScheduledPost.id.in_([expired.id, live.id])], [ScheduledPost.id], worker_id="dead:1")
+    _expire_lease(expired.id)
+
+    assert reap_expired_leases() == (1, 0)
+
+    expired, live = _reload(expired.id), _reload(live.id)
+    assert (expired.claimed_by, expired.status, expired.attempts) == (None, "生成中", 1)
+    assert live.claimed_by == "dead:1"
+
+def test_reap_fails_posts_that_ran_out_of_attempts(app, make_post):
+    max_attempts = app.config["MAX_JOB_ATTEMPTS"]
+    generating = make_post(attempts=max_attempts - 1)
+    publishing = make_post(status="生成完了", attempts=max_attempts - 1)
+    claim_posts([ScheduledPost.id.in_([generating.id, publishing.id])], [ScheduledPost.id], worker_id="dead:1")
+    _expire_lease(generating.id)
+    _expire_lease(publishing.id)
+
+    assert reap_expired_leases() == (0, 2)
+    assert _reload(generating.id).status == "生成失敗"
+    assert _reload(publishing.id).status == "投稿失敗"
+    assert _reload(publishing.id).claimed_by is None
+
+def test_mark_generated_resets_reaper_attempts(make_post):
+    post = make_post(attempts=2)
+
+    mark_generated(post)
+    db.session.commit()
+
+    assert (_reload(post.id).status, _reload(post.id).attempts) == ("生成完了", 0)
@@ -0,0 +1,78 @@
+# 📄 tests/test_leader_election.py
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import scheduler
+from app.models import db, SchedulerLease
+from app.leader_election import try_acquire_leadership, release_leadership, current_leader
+from app.scheduler import LEADER_LEASE_NAME, renew_leadership, resign_leadership
+
+@pytest.fixture
+def leadership(monkeypatch):
+    monkeypatch.setitem(scheduler.leadership, "holder", None)
+    monkeypatch.setitem(scheduler.leadership, "is_leader", False)
+
+    def as_process(app, holder):
+        """holder のプロセスとして renew_leadership を呼ぶ"""
+        scheduler.leadership.update(holder=holder, is_leader=holder == current_leader(LEADER_LEASE_NAME))
+        return renew_leadership(app)
+    return as_process
+
+def _lease():
+    db.session.expire_all()
+    return db.session.get(SchedulerLease, LEADER_LEASE_NAME)
+
+def _expire_lease():
+    _lease().expires_at = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+
+def test_no_takeover_while_lease_is_live(app, leadership):
+    assert leadership(app, "host-a:1") is True
+    assert leadership(app, "host-b:1") is False
+    assert _lease().holder == "host-a:1"
+
+def test_takeover_after_lease_expires(app, leadership):
+    leadership(app, "host-a:1")
+    _expire_lease()
+
+    assert leadership(app, "host-b:1") is True
+    assert _lease().holder == "host-b:1"
+    # 落ちていた元のリーダーが戻ってきてもリーダーにはならない
+    assert leadership(app, "host-a:1") is False
+
+def test_renewal_extends_own_lease(app, leadership):
+    leadership(app, "host-a:1")
+    acquired_at, expires_at = _lease().acquired_at, _lease().expires_at
+    _lease().expires_at = datetime.utcnow() + timedelta(seconds=1)
+    db.session.commit()
+
+    assert leadership(app, "host-a:1") is True
+    lease = _lease()
+    assert lease.acquired_at == acquired_at
+    assert lease.expires_at >= expires_at
+
+def test_resign_lets_another_process_take_over_at_once(app, leadership):
+    leadership(app, "host-a:1")
+    resign_leadership(app)
+
+    assert scheduler.is_leader() is False
+    assert current_leader(LEADER_LEASE_NAME) is None
+    assert leadership(app, "host-b:1") is True
+
+def test_database_error_steps_down(app, leadership, monkeypatch):
+    leadership(app, "host-a:1")
+
+    def fail(*args):
+        raise RuntimeError("database is locked")
+    monkeypatch.setattr(scheduler, "try_acquire_leadership", fail)
+
+    assert renew_leadership(app) is False
+    assert scheduler.is_leader() is False
+
+def test_release_only_drops_own_lease(app):
+    assert try_acquire_leadership(LEADER_LEASE_NAME, "host-a:1", 30)
+    release_leadership(LEADER_LEASE_NAME, "host-b:1")
+
+    assert current_leader(LEADER_LEASE_NAME) == "host-a:1"
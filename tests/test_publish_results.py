@@ -0,0 +1,95 @@
+# 📄 tests/test_publish_results.py
+
+from datetime import datetime, timedelta
+
+from app.models import db, SiteCircuit
+from app.scheduler import _apply_publish_result, _record_circuit
+from app.circuit_breaker import site_host
+from app.wordpress_post import WordPressError
+
+def _circuit(host):
+    db.session.expire_all()
+    return db.session.get(SiteCircuit, host)
+
+def test_retryable_error_schedules_retry_with_own_budget(app, make_post):
+    post = make_post(status="生成完了", attempts=2)
+
+    _apply_publish_result(post, WordPressError("503", status_code=503, retryable=True))
+
+    assert post.status == "生成完了"
+    assert post.publish_attempts == 1
+    assert post.attempts == 2  # リーパーの回数には触れない
+    delay = post.next_attempt_at - datetime.utcnow()
+    assert timedelta(0) < delay <= timedelta(seconds=app.config["PUBLISH_RETRY_BASE_SECONDS"])
+
+def test_retryable_error_fails_after_max_attempts(app, make_post):
+    post = make_post(status="生成完了", publish_attempts=app.config["PUBLISH_MAX_ATTEMPTS"] - 1)
+
+    _apply_publish_result(post, WordPressError("timeout", retryable=True))
+
+    assert post.status == "投稿失敗"
+    assert post.next_attempt_at is None
+
+def test_permanent_error_fails_without_retry(make_post):
+    post = make_post(status="生成完了")
+
+    _apply_publish_result(post, WordPressError("forbidden", status_code=403))
+
+    assert post.status == "投稿失敗"
+    assert post.publish_attempts == 0
+
+def test_success_resets_retry_counters_and_releases_claim(make_post):
+    post = make_post(status="生成完了", attempts=1, publish_attempts=3,
+                     next_attempt_at=datetime.utcnow(), claimed_by="me:1", claimed_at=datetime.utcnow())
+
+    _apply_publish_result(post, {"id": 10, "status": "future", "link": "https://example.com/?p=10"})
+
+    assert (post.status, post.wp_post_id) == ("予約済み", 10)
+    assert (post.attempts, post.publish_attempts, post.next_attempt_at) == (0, 0, None)
+    assert post.claimed_by is None
+
+def test_permanent_error_closes_half_open_circuit(app, site):
+    host = site_host(site.site_url)
+    db.session.add(SiteCircuit(host=host, state="half_open", failure_count=3, trips=1))
+    db.session.commit()
+
+    _record_circuit(site.site_url, [WordPressError("forbidden", status_code=403)])
+
+    assert (_circuit(host).state, _circuit(host).failure_count) == ("closed", 0)
+
+def test_retryable_errors_open_circuit_at_threshold(app, site):
+    host = site_host(site.site_url)
+    for _ in range(app.config["CIRCUIT_FAILURE_THRESHOLD"] - 1):
+        _record_circuit(site.site_url, [WordPressError("502", status_code=502, retryable=True)])
+        assert _circuit(host).state == "closed"
+
+    _record_circuit(site.site_url, [WordPressError("502", status_code=502, retryable=True)])
+
+    assert _circuit(host).state == "open"
+    assert _circuit(host).retry_at > datetime.utcnow()
+
+def test_retryable_error_reopens_half_open_circuit(site):
+    host = site_host(site.site_url)
+    db.session.add(SiteCircuit(host=host, state="half_open", failure_count=0, trips=1))
+    db.session.commit()
+
+    _record_circuit(site.site_url, [WordPressError("429", status_code=429, retryable=True)])
+
+    assert (_circuit(host).state, _circuit(host).trips) == ("open", 2)
+
+def test_any_success_in_batch_closes_circuit(site):
+    host = site_host(site.site_url)
+    db.session.add(SiteCircuit(host=host, state="closed", failure_count=2, trips=0))
+    db.session.commit()
+
+    _record_circuit(site.site_url, [WordPressError("timeout", retryable=True), {"id": 1, "status": "publish"}])
+
+    assert _circuit(host).failure_count == 0
+
+def test_retry_waits_at_least_retry_after(app, make_post):
+    post = make_post(status="生成完了")
+
+    _apply_publish_result(post, WordPressError("429", status_code=429, retryable=True, retry_after=600))
+
+    delay = post.next_attempt_at - datetime.utcnow()
+    assert timedelta(seconds=590) < delay <= timedelta(seconds=600)
@@ -0,0 +1,166 @@
+# 📄 tests/test_rate_limiter.py
+
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app import rate_limiter
+from app.rate_limiter import (
+    MemoryBucketStore,
+    RateLimitedTransport,
+    AsyncRateLimitedTransport,
+    parse_duration,
+    try_acquire,
+    sync_from_headers,
+    block,
+)
+
+@pytest.fixture
+def store(app):
+    store = MemoryBucketStore()
+    rate_limiter._state["store"] = store
+    app.config.update(OPENAI_RPM=60, OPENAI_TPM=100000, RATE_LIMIT_MAX_RETRIES=2, OPENAI_MAX_RETRIES=2)
+    return store
+
+@pytest.fixture
+def no_sleep(monkeypatch):
+    """再送の待機を短くする（待機秒数は記録する）"""
+    slept = []
+    sleep = rate_limiter.time.sleep
+
+    def record(seconds):
+        slept.append(seconds)
+        sleep(min(seconds, 0.01))
+    monkeypatch.setattr(rate_limiter.time, "sleep", record)
+    monkeypatch.setattr(rate_limiter.random, "uniform", lambda a, b: b)
+    return slept
+
+@pytest.mark.parametrize("value, seconds", [
+    ("1s", 1.0),
+    ("6m0s", 360.0),
+    ("1m30s", 90.0),
+    ("250ms", 0.25),
+    ("1.5s", 1.5),
+    ("20", 20.0),
+    ("2h", 7200.0),
+])
+def test_parse_duration(value, seconds):
+    assert parse_duration(value) == pytest.approx(seconds)
+
+def test_parse_duration_missing_header():
+    assert parse_duration(None) is None
+
+def test_try_acquire_takes_tokens_until_empty(store):
+    # 容量 60/分 = 毎秒1回復
+    assert try_acquire("openai:requests", 59) == 0
+    assert try_acquire("openai:requests", 1) == 0
+    wait = try_acquire("openai:requests", 2)
+    assert 1.5 < wait <= 2.0
+
+def test_try_acquire_passes_requests_larger_than_capacity(store):
+    assert try_acquire("openai:requests", 1000) == 0
+    assert try_acquire("openai:requests", 1) > 0
+
+def test_sync_from_headers_lowers_capacity_and_remaining(store):
+    sync_from_headers("openai:requests", limit=10, remaining=3)
+
+    state = store._data["openai:requests"]
+    assert state["capacity"] == 10
+    assert state["tokens"] == pytest.approx(3, abs=0.01)
+
+def test_sync_from_headers_ignores_limit_above_config(store):
+    sync_from_headers("openai:requests", limit=10000, remaining=None)
+
+    assert store._data["openai:requests"]["capacity"] == 60
+
+def test_sync_from_headers_blocks_when_exhausted(store):
+    sync_from_headers("openai:requests", remaining=0, reset_seconds=parse_duration("6m0s"))
+
+    assert 359 < try_acquire("openai:requests") <= 360
+
+def test_block_stops_bucket(store):
+    block("openai:requests", 5)
+
+    assert 4 < try_acquire("openai:requests") <= 5
+
+def _chat_request():
+    body = json.dumps({"messages": [{"role": "user", "content": "こんにちは"}], "max_tokens": 10}).encode()
+    return httpx.Request("POST", "https://api.openai.com/v1/chat/completions", content=body)
+
+def _transport(responses):
+    """responses を順に返す（例外なら送出する）フェイク"""
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        response = responses[len(calls) - 1]
+        if isinstance(response, Exception):
+            raise response
+        return response
+    return httpx.MockTransport(handler), calls
+
+def test_transport_retries_429_after_block(app, store, no_sleep):
+    app.config["OPENAI_RPM"] = 6000  # block で空になったバケットがすぐ回復するように
+    mock, calls = _transport([
+        httpx.Response(429, headers={"retry-after": "0.01"}),
+        httpx.Response(200, json={"ok": True}),
+    ])
+
+    response = RateLimitedTransport(transport=mock).handle_request(_chat_request())
+
+    assert response.status_code == 200
+    assert len(calls) == 2
+    assert store._data["openai:requests"]["blocked_until"] > 0
+
+def test_transport_returns_429_when_budget_runs_out(app, store, no_sleep):
+    app.config["OPENAI_RPM"] = 6000
+    mock, calls = _transport([httpx.Response(429, headers={"retry-after": "0.01"})] * 3)
+
+    response = RateLimitedTransport(transport=mock).handle_request(_chat_request())
+
+    assert response.status_code == 429
+    assert len(calls) == 3  # 初回 + RATE_LIMIT_MAX_RETRIES
+
+def test_transport_retries_server_errors_with_backoff(store, no_sleep):
+    mock, calls = _transport([httpx.Response(502), httpx.Response(500), httpx.Response(200)])
+
+    response = RateLimitedTransport(transport=mock).handle_request(_chat_request())
+
+    assert response.status_code == 200
+    assert no_sleep == [0.5, 1.0]
+
+def test_transport_raises_connection_error_after_budget(store, no_sleep):
+    error = httpx.ConnectError("refused")
+    mock, calls = _transport([error, error, error])
+
+    with pytest.raises(httpx.ConnectError):
+        RateLimitedTransport(transport=mock).handle_request(_chat_request())
+    assert len(calls) == 3
+
+def test_transport_does_not_retry_client_errors(store, no_sleep):
+    mock, calls = _transport([httpx.Response(400), httpx.Response(200)])
+
+    assert RateLimitedTransport(transport=mock).handle_request(_chat_request()).status_code == 400
+    assert len(calls) == 1
+
+def test_transport_takes_tokens_per_attempt(store, no_sleep):
+    mock, _ = _transport([httpx.Response(503), httpx.Response(200)])
+
+    RateLimitedTransport(transport=mock).handle_request(_chat_request())
+
+    # 再送した分も要求枠を使う
+    assert store._data["openai:requests"]["tokens"] == pytest.approx(58, abs=0.1)
+
+def test_async_transport_retries_429_and_server_errors(app, store, monkeypatch):
+    app.config["OPENAI_RPM"] = 6000
+    async def no_sleep(seconds):
+        pass
+    monkeypatch.setattr(rate_limiter.asyncio, "sleep", no_sleep)
+    responses = iter([httpx.Response(429, headers={"retry-after": "0.01"}), httpx.Response(503), httpx.Response(200)])
+    mock = httpx.MockTransport(lambda request: next(responses))
+
+    response = asyncio.run(AsyncRateLimitedTransport(transport=mock).handle_async_request(_chat_request()))
+
+    assert response.status_code == 200
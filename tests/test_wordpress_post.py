@@ -0,0 +1,144 @@
+# 📄 tests/test_wordpress_post.py
+
+import json
+
+import httpx
+import pytest
+
+from app import http_client, wordpress_post
+from app.media_cache import find_media, remember_media
+from app.wordpress_post import WordPressError, push_to_wordpress, push_batch_to_wordpress
+
+SITE = "https://example.com/"
+IMAGE = "https://images.example.net/photo.jpg"
+JPEG = b"\xff\xd8\xff\xe0" + b"0" * 100
+
+@pytest.fixture
+def wordpress(app, monkeypatch, tmp_path):
+    """
+    共有の HTTP クライアントを httpx.MockTransport に差し替える。
+    routes に (メソッド, パス) → レスポンスを返す関数 を入れ、届いたリクエストは requests に残る
+    """
+    monkeypatch.chdir(tmp_path)  # wp_post_errors.log の書き出し先
+    routes = {}
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return routes[(request.method, request.url.path)](request)
+
+    monkeypatch.setitem(http_client._client, "sync", httpx.Client(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(wordpress_post, "_batch_support", {})
+    return routes, requests
+
+def test_cached_media_is_trusted_without_checking(wordpress):
+    routes, requests = wordpress
+    remember_media(SITE, IMAGE, 10)
+    routes[("POST", "/wp-json/wp/v2/posts")] = lambda request: httpx.Response(201, json={"id": 1, "status": "publish"})
+
+    push_to_wordpress(SITE, "wp", "pass", "タイトル", "本文", images=[IMAGE])
+
+    assert [(r.method, r.url.path) for r in requests] == [("POST", "/wp-json/wp/v2/posts")]
+    assert json.loads(requests[0].content)["featured_media"] == 10
+
+def test_deleted_cached_media_is_uploaded_again(wordpress):
+    routes, requests = wordpress
+    remember_media(SITE, IMAGE, 10)
+
+    def create_post(request):
+        if json.loads(request.content)["featured_media"] == 10:
+            return httpx.Response(400, json={"code": "rest_invalid_featured_media", "message": "Invalid featured media ID."})
+        return httpx.Response(201, json={"id": 1, "status": "publish"})
+
+    routes[("POST", "/wp-json/wp/v2/posts")] = create_post
+    routes[("GET", "/photo.jpg")] = lambda request: httpx.Response(200, content=JPEG, headers={"Content-Type": "image/jpeg"})
+    routes[("POST", "/wp-json/wp/v2/media")] = lambda request: httpx.Response(201, json={"id": 11})
+
+    result = push_to_wordpress(SITE, "wp", "pass", "タイトル", "本文", images=[IMAGE])
+
+    assert result == {"id": 1, "status": "publish"}
+    assert json.loads(requests[-1].content)["featured_media"] == 11
+    assert find_media(SITE, source_url=IMAGE) == 11
+
+def test_long_retry_after_is_left_to_the_scheduler(wordpress, monkeypatch):
+    routes, requests = wordpress
+    sleeps = []
+    monkeypatch.setattr(wordpress_post.time, "sleep", sleeps.append)
+    routes[("POST", "/wp-json/wp/v2/posts")] = lambda request: httpx.Response(429, headers={"Retry-After": "120"})
+
+    with pytest.raises(WordPressError) as error:
+        push_to_wordpress(SITE, "wp", "pass", "タイトル", "本文")
+
+    assert len(requests) == 1 and sleeps == []
+    assert error.value.retryable and error.value.retry_after == 120
+
+def test_in_request_backoff_stays_short(wordpress, monkeypatch):
+    routes, requests = wordpress
+    sleeps = []
+    monkeypatch.setattr(wordpress_post.time, "sleep", sleeps.append)
+    routes[("POST", "/wp-json/wp/v2/posts")] = lambda request: httpx.Response(503)
+
+    with pytest.raises(WordPressError):
+        push_to_wordpress(SITE, "wp", "pass", "タイトル", "本文")
+
+    assert len(requests) == wordpress_post.RETRY_ATTEMPTS
+    assert sum(sleeps) <= wordpress_post.RETRY_MAX_SECONDS * (wordpress_post.RETRY_ATTEMPTS - 1)
+
+def test_batch_maps_mixed_responses_to_each_post(wordpress):
+    routes, requests = wordpress
+    routes[("POST", "/wp-json/batch/v1")] = lambda request: httpx.Response(207, json={"responses": [
+        {"status": 201, "body": {"id": 1, "status": "future"}},
+        {"status": 400, "body": {"code": "rest_invalid_param", "message": "Invalid parameter(s): date_gmt"}},
+        {"status": 200, "body": {"id": 3, "status": "publish"}},
+        {"status": 503, "body": {"message": "Service Unavailable"}},
+    ]})
+    items = [{"title": f"タイトル{n}", "content": "本文"} for n in range(5)]
+    items[2]["wp_post_id"] = 3
+
+    results = push_batch_to_wordpress(SITE, "wp", "pass", items)
+
+    paths = [request["path"] for request in json.loads(requests[0].content)["requests"]]
+    assert paths == ["/wp/v2/posts", "/wp/v2/posts", "/wp/v2/posts/3", "/wp/v2/posts", "/wp/v2/posts"]
+    assert results[0] == {"id": 1, "status": "future"}
+    assert isinstance(results[1], WordPressError) and results[1].status_code == 400 and not results[1].retryable
+    assert results[2] == {"id": 3, "status": "publish"}
+    assert isinstance(results[3], WordPressError) and results[3].retryable
+    # 応答が足りない分は失敗として扱う（成功にはしない）
+    assert isinstance(results[4], WordPressError)
+
+def test_batch_splits_into_chunks_and_keeps_order(wordpress, monkeypatch):
+    routes, requests = wordpress
+    monkeypatch.setattr(wordpress_post, "BATCH_MAX_REQUESTS", 2)
+
+    def batch(request):
+        chunk = json.loads(request.content)["requests"]
+        if len(requests) == 1:
+            return httpx.Response(207, json={"responses": [
+                {"status": 201, "body": {"id": 1, "status": "publish"}},
+                {"status": 403, "body": {"message": "Sorry, you are not allowed to create posts."}},
+            ]})
+        return httpx.Response(200, json={"responses": [{"status": 201, "body": {"id": 3, "status": "publish"}}] * len(chunk)})
+
+    routes[("POST", "/wp-json/batch/v1")] = batch
+
+    results = push_batch_to_wordpress(SITE, "wp", "pass", [{"title": f"タイトル{n}", "content": "本文"} for n in range(3)])
+
+    assert len(requests) == 2
+    assert results[0] == {"id": 1, "status": "publish"}
+    assert isinstance(results[1], WordPressError) and results[1].status_code == 403
+    assert results[2] == {"id": 3, "status": "publish"}
+
+def test_batch_whole_request_failure_fails_every_post(wordpress):
+    routes, requests = wordpress
+    routes[("POST", "/wp-json/batch/v1")] = lambda request: httpx.Response(401, json={"code": "rest_not_logged_in"})
+
+    results = push_batch_to_wordpress(SITE, "wp", "pass", [{"title": "a", "content": ""}, {"title": "b", "content": ""}])
+
+    assert [(r.status_code, r.retryable) for r in results] == [(401, False), (401, False)]
+
+def test_batch_unsupported_site_falls_back(wordpress):
+    routes, requests = wordpress
+    routes[("POST", "/wp-json/batch/v1")] = lambda request: httpx.Response(404, json={"code": "rest_no_route"})
+
+    assert push_batch_to_wordpress(SITE, "wp", "pass", [{"title": "a", "content": ""}]) is None
+    assert wordpress_post.cached_batch_support(SITE) is False